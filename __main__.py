@@ -1,175 +1,289 @@
+import argparse
 import cv2
 import os
-import time
-import tkinter as tk
 import numpy as np
 from threading import Lock
 from input.camera_preview import CameraPreviewThread
-from input.voice_commands import VoiceCommandThread
-from preprocessing.preprocessor import Preprocessor
+from input.capture_backends import open_camera
+from input.replay import FrameRecorder, ReplayCapture, recording_paths
+from input.shared_frames import SharedFramePool
+from preprocessing.pipeline import collect_warped_frames, iter_warped_frames
+from preprocessing.quality import best_frame_indices, select_best_frames
 from code_detection.detector import Detector
+from code_detection.workers import DetectionWorkers
+from code_detection.ocr.registry import warm_up
 from code_detection.tokeniser import Tokeniser
 from code_detection.parser import Parser
 from execution.executor import Executor
+from execution.run_worker import RunWorker
+from execution.session_pool import SessionPool
+from execution.speculative import SpeculativeDetector
 from output.projector import Projector
-from input.settings_menu import SettingsMenu
+from output.results_server import ResultsServer
 from settings import settings, load_settings
 from fsm.states import SystemState, Event
 from fsm.state_machine import SystemFSM
+from sessions import BoardSession
+from tracing import tracer
+import batch
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Detection worker processes, if enabled. Warped frames are then passed
+# around as shared frame handles rather than arrays.
+detection_workers = None
+
+
+def frame_timeout(profile=settings):
+    # Allow a few frame intervals for each new frame before giving up
+    fps = profile["CAMERA_FPS"]
+    return max(1.0, 5.0 / fps) if fps > 0 else 1.0
+
+
+def open_capture(source, resolution, fps, profile=settings):
+    """Open a camera by index, or replay recorded footage given its path.
+
+    A FrameRecorder recording can be given by the base name it was recorded
+    to, without the stream or index extension. profile holds the capture
+    settings, see BoardSession.
+    """
+    if isinstance(source, str) and (
+        os.path.exists(source)
+        or all(os.path.exists(path) for path in recording_paths(source))
+    ):
+        return ReplayCapture(source, realtime=profile["REPLAY_REALTIME"], fps=fps)
+    return open_camera(
+        source,
+        resolution,
+        fps,
+        backend=profile["CAMERA_BACKEND"],
+        fourcc=profile["CAMERA_FOURCC"],
+    )
 
-def collect_valid_images(preview, num_required, max_attempts=50, interval=None):
-    """Collect valid images from the camera preview window."""
-    valid_images = []
-    attempts = 0
 
-    # Use CAMERA_FPS from settings to set interval if not provided
-    if interval is None:
-        interval = 1.0 / settings["CAMERA_FPS"] if settings["CAMERA_FPS"] > 0 else 0.1
+def collect_valid_images(preview, num_required, max_attempts=50, profile=settings):
+    """Collect the best valid images from a short burst of camera frames."""
+    timeout = frame_timeout(profile)
 
-    while len(valid_images) < num_required and attempts < max_attempts:
-        frame = preview.get_frame()
-        if frame is None:
-            time.sleep(interval)  # Only sleep if we need to retry
-            attempts += 1
-            continue
+    frame_pool = detection_workers.frame_pool if detection_workers else None
 
-        preprocessor = Preprocessor(frame)
-        warped_image = preprocessor.preprocess_image()
+    # Capture extra candidates and keep only the sharpest, most stable ones
+    num_candidates = max(num_required, profile["NUM_CANDIDATE_IMAGES"])
+    with tracer.span("capture"):
+        candidates = collect_warped_frames(
+            preview,
+            num_candidates,
+            max_attempts=max_attempts,
+            timeout=timeout,
+            frame_pool=frame_pool,
+            profile=profile,
+        )
+        if frame_pool is None:
+            return select_best_frames(candidates, num_required)
 
-        if warped_image is not None:
-            valid_images.append(warped_image)
-            print(f"Captured valid image {len(valid_images)} of {num_required}")
-            # Don't sleep if we got the last required image
-            if len(valid_images) == num_required:
-                break
-        else:
-            print(
-                f"Attempt {attempts + 1}/{max_attempts}: Not all corner markers detected."
-            )
+        # Score the shared frames in place and free the slots not kept
+        best = best_frame_indices(
+            [frame_pool.view(handle) for handle in candidates], num_required
+        )
+        release_frames([h for i, h in enumerate(candidates) if i not in best])
+        return [candidates[i] for i in best]
 
-        attempts += 1
-        time.sleep(interval)  # Sleep only if we need another frame
 
-    return valid_images
+def release_frames(warped_images):
+    """Give back the shared slots of frames from collect_valid_images."""
+    if detection_workers is not None:
+        for handle in warped_images:
+            detection_workers.frame_pool.release(handle)
 
 
-def process_images(warped_images):
-    """Process the images to detect code, tokenise, parse, and execute."""
+def analyse_images(warped_images, cancel_event=None):
+    """Detect, tokenise and parse the code in the images without running it.
+
+    Detection stops early once cancel_event is set.
+    """
+
+    with tracer.span("detect"):
+        if detection_workers is None:
+            detector = Detector(warped_images)
+            warped_image, boxes = detector.detect_code(cancel_event)
+        else:
+            try:
+                detector = Detector(warped_images, workers=detection_workers)
+                warped_image, boxes = detector.detect_code(cancel_event)
+                # Keep the image once its slot is given back
+                if warped_image is not None:
+                    warped_image = warped_image.copy()
+            finally:
+                release_frames(warped_images)
+    return analyse_boxes(warped_image, boxes)
+
+
+def analyse_camera_adaptively(preview, max_attempts=50, profile=settings):
+    """Detect code from camera frames as they arrive until detection is stable.
+
+    Clean boards stop after a couple of frames, noisy ones use up to
+    MAX_VALID_IMAGES. Returns the same tuple as analyse_images.
+    """
+    warped_frames = iter_warped_frames(
+        preview,
+        max_attempts=max_attempts,
+        timeout=frame_timeout(profile),
+        profile=profile,
+    )
+    with tracer.span("detect"):
+        detector = Detector([])
+        warped_image, boxes = detector.detect_code_adaptive(
+            (warped_image for _, warped_image in warped_frames),
+            max_images=profile["MAX_VALID_IMAGES"],
+        )
+    warped_frames.close()
+    return analyse_boxes(warped_image, boxes)
+
 
-    detector = Detector(warped_images)
-    warped_image, boxes = detector.detect_code()
+def analyse_boxes(warped_image, boxes):
+    """Tokenise and parse detected boxes.
+
+    Returns the image, boxes, Python code, error message, error box and the
+    board bounds of each line of the Python code.
+    """
     if warped_image is None or boxes is None:
-        return warped_image, boxes, None, "Error: Code detection failed", None
+        return warped_image, boxes, None, "Error: Code detection failed", None, []
 
-    tokeniser = Tokeniser(boxes)
-    tokens = tokeniser.tokenise()
+    with tracer.span("tokenise"):
+        tokeniser = Tokeniser(boxes)
+        tokens = tokeniser.tokenise()
     print(tokeniser.tokens_to_string())
     if tokens is None:
-        return warped_image, boxes, None, "Error: Tokenisation failed", None
+        return warped_image, boxes, None, "Error: Tokenisation failed", None, []
+
+    with tracer.span("parse"):
+        parser = Parser(tokens)
+        program, python_code, error_message, error_box = parser.parse()
+    return (
+        warped_image,
+        boxes,
+        python_code,
+        error_message,
+        error_box,
+        parser.line_bounds,
+    )
+
 
-    parser = Parser(tokens)
-    program, python_code, error_message, error_box = parser.parse()
-    if program is None or python_code is None:
+def run_analysis(analysis, job=None):
+    """Execute the code found by analyse_images, if it parsed."""
+    warped_image, boxes, python_code, error_message, error_box, line_bounds = analysis
+    if error_message is not None or python_code is None:
         return warped_image, boxes, python_code, error_message, error_box
 
-    executor = Executor(python_code)
-    code_output, error_message, python_code = executor.execute_in_sandbox()
+    # Catch syntax errors before paying for a container start
+    with tracer.span("validate"):
+        executor = Executor(python_code, line_bounds)
+        error_message = executor.validate()
+    if error_message is not None:
+        return warped_image, boxes, python_code, error_message, executor.error_box
+
+    if job is not None:
+        job.check_cancelled()
+        job.progress("Running code")
+
+    with tracer.span("sandbox"):
+        code_output, error_message, python_code = executor.execute_in_sandbox(
+            job.cancel_event if job is not None else None
+        )
     if error_message is not None:
         return warped_image, boxes, python_code, error_message, None
 
     return warped_image, boxes, python_code, code_output, error_box
 
 
-def detect_and_run_code(preview, fsm):
-    """Detect and run the whiteboard code"""
-    try:
-        # Display minimal projection
-        projector = Projector(
-            None,
-            None,
-            None,
-            None,
-            None,
-            output_size=tuple(settings["PROJECTION_RESOLUTION"]),
-            marker_size=settings["CORNER_MARKER_SIZE"],
-            debug_mode=False,
+def process_images(warped_images, job=None):
+    """Process the images to detect code, tokenise, parse, and execute."""
+    return run_analysis(analyse_images(warped_images), job)
+
+
+def error_projection(message, profile=settings):
+    """Render a projection showing only an error message."""
+    return Projector(
+        None,
+        None,
+        message,
+        None,
+        None,
+        output_size=tuple(profile["PROJECTION_RESOLUTION"]),
+        marker_size=profile["CORNER_MARKER_SIZE"],
+        debug_mode=profile["PROJECT_IMAGE"],
+    ).display_error_projection()
+
+
+def detect_and_run_code(job, preview, speculative=None, profile=settings):
+    """Detect and run the whiteboard code on the run worker thread.
+
+    profile holds the settings of the board being run, see BoardSession.
+    Returns the projection to display, the event to send to the FSM, the
+    generated Python code, the box the code was drawn in and the program's
+    output.
+    """
+    with tracer.run(profile.get("NAME", "run")):
+        # Reuse the speculative detection if the board hasn't changed since
+        analysis = None
+        if speculative is not None:
+            speculative.pause()
+            with tracer.span("speculative"):
+                analysis = speculative.validated_result()
+
+        if analysis is None and profile["ADAPTIVE_CAPTURE"]:
+            job.progress("Detecting code")
+            analysis = analyse_camera_adaptively(preview, profile=profile)
+        elif analysis is None:
+            # Collect valid images
+            job.progress("Capturing images")
+            valid_images = collect_valid_images(
+                preview, profile["NUM_VALID_IMAGES"], profile=profile
+            )
+            if len(valid_images) < profile["NUM_VALID_IMAGES"]:
+                release_frames(valid_images)
+                projection = error_projection(
+                    "Failed to capture enough valid images.", profile
+                )
+                return projection, Event.ERROR_OCCURRED, None, None, None
+            job.check_cancelled()
+
+            job.progress("Detecting code")
+            analysis = analyse_images(valid_images)
+        else:
+            job.progress("Using speculative detection")
+        job.check_cancelled()
+
+        # Execute code
+        image, boxes, python_code, code_output, error_box = run_analysis(
+            analysis, job
         )
-        minimal_projection = projector.display_minimal_projection()
-        cv2.imshow("Output", minimal_projection)
-        cv2.waitKey(1)
-
-        # Collect valid images
-        valid_images = collect_valid_images(preview, settings["NUM_VALID_IMAGES"])
-        if len(valid_images) < settings["NUM_VALID_IMAGES"]:
-            error_projection = Projector(
-                None,
-                None,
-                "Failed to capture enough valid images.",
-                None,
-                None,
-                output_size=tuple(settings["PROJECTION_RESOLUTION"]),
-                marker_size=settings["CORNER_MARKER_SIZE"],
-                debug_mode=settings["PROJECT_IMAGE"],
-            ).display_error_projection()
-            cv2.imshow("Output", error_projection)
-            fsm.transition(Event.ERROR_OCCURRED)
-            return None, None
-
-        # Detect and execute code
-        image, boxes, python_code, code_output, error_box = process_images(valid_images)
-        if code_output is None or python_code is None:
-            error_projection, code_box = Projector(
+        job.check_cancelled()
+
+        with tracer.span("render"):
+            projection, code_box = Projector(
                 image,
                 python_code,
                 code_output,
                 boxes,
                 error_box,
-                output_size=tuple(settings["PROJECTION_RESOLUTION"]),
-                marker_size=settings["CORNER_MARKER_SIZE"],
-                debug_mode=settings["PROJECT_IMAGE"],
+                output_size=tuple(profile["PROJECTION_RESOLUTION"]),
+                marker_size=profile["CORNER_MARKER_SIZE"],
+                debug_mode=profile["PROJECT_IMAGE"],
             ).display_full_projection()
-            cv2.imshow("Output", error_projection)
-            fsm.transition(Event.ERROR_OCCURRED)
-            return None, code_box
-
-        # Display full projection
-        projector = Projector(
-            image,
-            python_code,
-            code_output,
-            boxes,
-            error_box,
-            output_size=tuple(settings["PROJECTION_RESOLUTION"]),
-            marker_size=settings["CORNER_MARKER_SIZE"],
-            debug_mode=settings["PROJECT_IMAGE"],
-        )
-        projection, code_box = projector.display_full_projection()
-        cv2.imshow("Output", projection)
-        fsm.transition(Event.FINISH_RUN)
-        return python_code, code_box
 
-    except Exception as e:
-        error_projection = Projector(
-            None,
-            None,
-            str(e),
-            None,
-            None,
-            output_size=tuple(settings["PROJECTION_RESOLUTION"]),
-            marker_size=settings["CORNER_MARKER_SIZE"],
-            debug_mode=settings["PROJECT_IMAGE"],
-        ).display_error_projection()
-        cv2.imshow("Output", error_projection)
-        fsm.transition(Event.ERROR_OCCURRED)
-        return None, None
+        if code_output is None or python_code is None:
+            return projection, Event.ERROR_OCCURRED, None, code_box, code_output
+        return projection, Event.FINISH_RUN, python_code, code_box, code_output
 
 
 def show_settings_menu(camera_preview=None, voice_thread=None):
     """Display the settings menu."""
+    # Imported here so the headless batch command needs no GUI or audio
+    import tkinter as tk
+    from input.settings_menu import SettingsMenu
+
     root = tk.Tk()
     app = SettingsMenu(root, camera_preview, voice_thread)
     root.mainloop()
@@ -202,14 +316,90 @@ def save_code_to_file(python_code):
     print(f"Code saved to {full_path}")
 
 
+def print_session_metrics(pool):
+    for name, metrics in pool.metrics().items():
+        print(
+            f"{name}: {metrics['jobs']} runs, "
+            f"wait p50 {metrics['p50_wait_ms']} ms p95 {metrics['p95_wait_ms']} ms, "
+            f"total p50 {metrics['p50_total_ms']} ms p95 {metrics['p95_total_ms']} ms"
+        )
+
+
+def run_sessions(profiles):
+    """Drive several whiteboards from this machine, one BoardSession each.
+
+    Keys 1-9 start a run on that board, r runs every board, q clears every
+    board, m prints per-board latency metrics and ESC exits.
+    """
+    tracer.enabled = settings["TRACING"]
+    pool = SessionPool(workers=settings["SESSION_WORKERS"])
+    pool.start()
+
+    sessions = []
+    for i, profile in enumerate(profiles):
+        name = profile.get("NAME", f"Board {i + 1}")
+        sessions.append(
+            BoardSession(
+                name,
+                profile,
+                pool.session_worker(name),
+                detect_and_run_code,
+                open_capture,
+            )
+        )
+    for session in sessions:
+        session.start()
+
+    try:
+        while True:
+            running = [session.update() for session in sessions]
+            if not any(running):
+                break
+
+            key = cv2.waitKey(1) & 0xFF
+            if ord("1") <= key <= ord("9") and key - ord("1") < len(sessions):
+                sessions[key - ord("1")].fsm.post(Event.START_RUN)
+            elif key == ord("r"):
+                for session in sessions:
+                    session.fsm.post(Event.START_RUN)
+            elif key == ord("q"):
+                for session in sessions:
+                    session.fsm.post(Event.CLEAR)
+            elif key == ord("m"):
+                print_session_metrics(pool)
+            elif key == 27:  # ESC key
+                for session in sessions:
+                    session.fsm.post(Event.EXIT)
+    finally:
+        print_session_metrics(pool)
+        pool.stop()
+        if tracer.enabled and tracer.runs:
+            tracer.export_chrome_trace(settings["TRACE_FILE"])
+        for session in sessions:
+            session.stop()
+        cv2.destroyAllWindows()
+
+
 def main():
     """Main function to run the system."""
+    global detection_workers
     fsm = SystemFSM()
     load_settings()
 
+    # Start loading the OCR model while the settings menu is open
+    warm_up()
+
+    # Several whiteboards are driven from one loop without the settings menu
+    if settings["BOARD_SESSIONS"]:
+        run_sessions(settings["BOARD_SESSIONS"])
+        return
+
     # Initialise voice thread based on settings
     voice_thread = None
     try:
+        # Imported here so a missing audio library only disables voice commands
+        from input.voice_commands import VoiceCommandThread
+
         voice_thread = VoiceCommandThread(
             fsm=fsm,
             access_key=os.getenv("PORCUPINE_ACCESS_KEY"),
@@ -226,12 +416,18 @@ def main():
 
     # Display the settings menu
     show_settings_menu(voice_thread=voice_thread)
+    tracer.enabled = settings["TRACING"]
+    warm_up()  # In case a different OCR backend was selected
 
     # Initialise camera preview window
     preview = CameraPreviewThread(
         source=settings["CAMERA"],
         resolution=tuple(settings["CAMERA_RESOLUTION"]),
         fps=settings["CAMERA_FPS"],
+        capture_factory=open_capture,
+        recorder=FrameRecorder(settings["RECORD_PATH"])
+        if settings["RECORD_PATH"]
+        else None,
     )
     preview.start()
 
@@ -240,53 +436,158 @@ def main():
     cv2.namedWindow("Output", cv2.WINDOW_NORMAL)
     cv2.setWindowProperty("Output", cv2.WND_PROP_FULLSCREEN, cv2.WINDOW_FULLSCREEN)
 
-    python_code = None
-    code_box = None
+    # Optionally run detection in worker processes, passing frames through
+    # shared memory. Slots cover the largest warp and every candidate frame.
+    # Warps are never larger than the camera frame, which may not be the
+    # resolution asked for.
+    if settings["DETECTION_PROCESSES"] > 0:
+        width, height = settings["CAMERA_RESOLUTION"]
+        frame = preview.frames.wait_for_frame(timeout=2.0)
+        if frame is not None:
+            width = max(width, frame.image.shape[1])
+            height = max(height, frame.image.shape[0])
+        if settings["WARP_RESOLUTION"]:
+            width, height = settings["WARP_RESOLUTION"]
+        frame_pool = SharedFramePool(
+            slot_count=2 * settings["NUM_CANDIDATE_IMAGES"]
+            + settings["MAX_VALID_IMAGES"]
+            + 4,
+            slot_bytes=width * height * 3,
+        )
+        detection_workers = DetectionWorkers(
+            frame_pool, processes=settings["DETECTION_PROCESSES"]
+        )
+
+    # Optionally stream results to browsers, e.g. students' laptops
+    results_server = None
+    if settings["RESULTS_SERVER"]:
+        results_server = ResultsServer(
+            host=settings["RESULTS_SERVER_HOST"],
+            port=settings["RESULTS_SERVER_PORT"],
+            image_format=settings["RESULTS_IMAGE_FORMAT"],
+            quality=settings["RESULTS_IMAGE_QUALITY"],
+        ).start()
+        for state in SystemState:
+            fsm.on_enter(
+                state, lambda *_, state=state: results_server.publish(state=state.name)
+            )
+
+    # Shared with the FSM listeners below
+    run_state = {"python_code": None, "code_box": None}
+
+    # Detection and execution run in the background so the UI stays responsive
+    worker = RunWorker()
+    worker.start()
+
+    # Optionally detect and parse the board ahead of time while idle
+    speculative = None
+    if settings["SPECULATIVE_DETECTION"]:
+        speculative = SpeculativeDetector(
+            preview,
+            lambda: collect_valid_images(preview, settings["NUM_VALID_IMAGES"]),
+            analyse_images,
+            lambda: run_state["code_box"]
+            if run_state["code_box"] is not None
+            else blank_projector().default_code_box(),
+            tuple(settings["PROJECTION_RESOLUTION"]),
+            frame_pool=detection_workers.frame_pool if detection_workers else None,
+        )
+        speculative.start()
+
+    def blank_projector():
+        return Projector(
+            None,
+            None,
+            None,
+            None,
+            None,
+            output_size=tuple(settings["PROJECTION_RESOLUTION"]),
+            marker_size=settings["CORNER_MARKER_SIZE"],
+            debug_mode=False,
+        )
+
+    def show_output(projection):
+        cv2.imshow("Output", projection)
+        if results_server is not None:
+            results_server.publish(projection)
+
+    def show_idle(*_):
+        worker.cancel()  # In case a run was cleared before it finished
+        projection = blank_projector().display_idle_projection(run_state["code_box"])
+        show_output(projection)
+        if speculative is not None:
+            speculative.resume()
+
+    def start_run(*_):
+        # Show the corner markers while capturing
+        show_output(blank_projector().display_minimal_projection())
+        worker.submit(detect_and_run_code, preview, speculative)
+
+    fsm.on_enter(SystemState.IDLE, show_idle)
+    fsm.on_enter(SystemState.RUNNING, start_run)
+    show_idle()
 
     # Start the main loop
     try:
         while fsm.state != SystemState.EXITING:
             # Display camera feed
-            frame = preview.get_frame()
-            if frame is not None:
-                cv2.imshow("Camera Feed", frame)
+            with preview.lease_frame() as frame:
+                if frame is not None:
+                    cv2.imshow("Camera Feed", frame)
 
             if cv2.getWindowProperty("Output", cv2.WND_PROP_VISIBLE) < 1:
                 fsm.transition(Event.EXIT)
                 break
 
-            # Handle current state if necessary
-            if fsm.state == SystemState.IDLE:
-                projector = Projector(
-                    None,
-                    None,
-                    None,
-                    None,
-                    None,
-                    output_size=tuple(settings["PROJECTION_RESOLUTION"]),
-                    marker_size=settings["CORNER_MARKER_SIZE"],
-                    debug_mode=False,
-                )
-                minimal_projection = projector.display_idle_projection(code_box)
-                cv2.imshow("Output", minimal_projection)
-            elif fsm.state == SystemState.RUNNING:
-                python_code, code_box = detect_and_run_code(preview, fsm)
+            # Handle events posted by the voice thread and key inputs
+            fsm.process_events()
+
+            # Handle messages from the run worker
+            for kind, payload in worker.poll():
+                if kind == "progress":
+                    print(payload)
+                elif kind == "result":
+                    projection, event, python_code, code_box, code_output = payload
+                    run_state["python_code"] = python_code
+                    run_state["code_box"] = code_box
+                    show_output(projection)
+                    if results_server is not None:
+                        results_server.publish(code=python_code, output=code_output)
+                    fsm.transition(event)
+                else:
+                    show_output(error_projection(str(payload)))
+                    fsm.transition(Event.ERROR_OCCURRED)
 
             # Handle key inputs
             key = cv2.waitKey(1) & 0xFF
             if key == ord("q"):
-                fsm.transition(Event.CLEAR)
+                fsm.post(Event.CLEAR)
             elif key == ord("r"):
-                fsm.transition(Event.START_RUN)
+                fsm.post(Event.START_RUN)
             elif key == ord("s"):
                 show_settings_menu(preview, voice_thread)
+                tracer.enabled = settings["TRACING"]
+                if fsm.state == SystemState.IDLE:
+                    show_idle()
+            elif key == ord("t"):
+                tracer.export_chrome_trace(settings["TRACE_FILE"])
             elif key == ord("v"):
-                save_code_to_file(python_code)
+                save_code_to_file(run_state["python_code"])
             elif key == 27:  # ESC key
-                fsm.transition(Event.EXIT)
+                fsm.post(Event.EXIT)
 
     finally:
         # Clean up resources
+        if tracer.enabled and tracer.runs:
+            tracer.export_chrome_trace(settings["TRACE_FILE"])
+        worker.stop()
+        if results_server is not None:
+            results_server.stop()
+        if speculative is not None:
+            speculative.stop()
+        if detection_workers is not None:
+            detection_workers.shutdown()
+            detection_workers.frame_pool.close()
         preview.stop()
         preview.join()
         if voice_thread:
@@ -295,5 +596,20 @@ def main():
         cv2.destroyAllWindows()
 
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run code written on a whiteboard.")
+    subcommands = parser.add_subparsers(dest="command")
+    batch.add_arguments(
+        subcommands.add_parser(
+            "batch", help="process directories of recorded board images headlessly"
+        )
+    )
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    if args.command == "batch":
+        batch.run(args)
+    else:
+        main()
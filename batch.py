@@ -0,0 +1,214 @@
+"""Run the pipeline headlessly over directories of recorded board images.
+
+Each directory of images is one run, like a capture burst of K frames.
+A directory holding only subdirectories is expanded into one run per
+subdirectory, so a term of recorded sessions can be passed as one path.
+Runs are processed on a process pool and written as JSON lines with the
+generated code, its output and the time spent in each stage.
+
+    python . batch sessions/ --workers 8 --output results.jsonl
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import cv2
+from code_detection.detector import Detector
+from code_detection.ocr.registry import check_backend, get_backend
+from code_detection.parser import Parser
+from code_detection.tokeniser import Tokeniser
+from execution.executor import Executor
+from preprocessing.pipeline import create_preprocessor
+from settings import settings, load_settings
+from tracing import tracer
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff")
+
+
+def image_paths(directory):
+    return sorted(
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+
+
+def find_runs(directories):
+    """Every directory that directly holds images, searching subdirectories."""
+    runs = []
+    for directory in directories:
+        for root, subdirectories, _ in os.walk(directory):
+            subdirectories.sort()
+            if image_paths(root):
+                runs.append(root)
+    return runs
+
+
+def stage_timings(run):
+    """Total milliseconds spent in each named span of a traced run."""
+    timings = {}
+    for depth, span in run.walk():
+        if depth == 0 or span.end is None:
+            continue
+        timings[span.name] = timings.get(span.name, 0.0) + 1000 * span.duration
+    timings["total"] = 1000 * run.duration
+    return {name: round(ms, 3) for name, ms in timings.items()}
+
+
+def analyse_run(paths, execute):
+    """Push one run's images through every stage.
+
+    Returns the number of valid frames, the generated code, the code output
+    and any error message.
+    """
+    preprocessor = create_preprocessor()
+    warped_images = []
+    for path in paths:
+        with tracer.span("load"):
+            image = cv2.imread(path)
+        if image is None:
+            print(f"Could not read {path}")
+            continue
+        with tracer.span("warp"):
+            preprocessor.set_image(image)
+            warped_image = preprocessor.preprocess_image()
+        if warped_image is not None:
+            warped_images.append(warped_image)
+    if not warped_images:
+        return len(warped_images), None, None, "Error: No valid images"
+
+    with tracer.span("detect"):
+        warped_image, boxes = Detector(warped_images).detect_code()
+    if boxes is None:
+        return len(warped_images), None, None, "Error: Code detection failed"
+
+    with tracer.span("tokenise"):
+        tokens = Tokeniser(boxes).tokenise()
+    if tokens is None:
+        return len(warped_images), None, None, "Error: Tokenisation failed"
+
+    with tracer.span("parse"):
+        program, python_code, error_message, error_box = Parser(tokens).parse()
+    if error_message is not None or python_code is None or execute == "none":
+        return len(warped_images), python_code, None, error_message
+
+    with tracer.span("validate"):
+        executor = Executor(python_code)
+        error_message = executor.validate()
+    if error_message is not None:
+        return len(warped_images), python_code, None, error_message
+
+    with tracer.span("execute"):
+        if execute == "sandbox":
+            code_output, error_message, _ = executor.execute_in_sandbox()
+        else:
+            code_output, error_message = executor.execute_locally()
+    return len(warped_images), python_code, code_output, error_message
+
+
+def process_run(directory, execute="none"):
+    """Process one run directory and return its JSON lines record."""
+    paths = image_paths(directory)
+    try:
+        with tracer.run(directory) as run:
+            valid, python_code, code_output, error_message = analyse_run(
+                paths, execute
+            )
+    except Exception as e:
+        valid, python_code, code_output = 0, None, None
+        error_message = f"Error: {type(e).__name__}: {e}"
+
+    return {
+        "run": directory,
+        "frames": len(paths),
+        "valid_frames": valid,
+        "code": python_code,
+        "output": code_output,
+        "error": error_message,
+        "timings": stage_timings(run) if run is not None else {},
+    }
+
+
+def init_worker(worker_settings):
+    """Set up a pool process to match the parent's settings."""
+    settings.update(worker_settings)
+    tracer.enabled = True
+    # One process per core already, don't let OpenCV oversubscribe
+    cv2.setNumThreads(1)
+    # Keep pipeline progress messages out of the JSON lines on stdout.
+    # Done on the file descriptor since executed code restores sys.stdout.
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    # Load the OCR model up front so it isn't timed as part of the first run.
+    # Failures are reported with each run instead.
+    try:
+        get_backend()
+    except Exception as e:
+        print(f"Failed to load OCR backend: {e}")
+
+
+def run_batch(directories, workers=None, execute="none", output=None):
+    """Process every run found in directories, writing results as they finish.
+
+    Returns the number of runs that produced code without errors.
+    """
+    runs = find_runs(directories)
+    if not runs:
+        print("No image directories found.", file=sys.stderr)
+        return 0
+    print(f"Processing {len(runs)} runs", file=sys.stderr)
+
+    out = open(output, "w") if output else sys.stdout
+    succeeded = 0
+    start = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=init_worker, initargs=(dict(settings),)
+        ) as pool:
+            futures = [pool.submit(process_run, run, execute) for run in runs]
+            for done, future in enumerate(as_completed(futures), 1):
+                result = future.result()
+                succeeded += result["error"] is None and result["code"] is not None
+                out.write(json.dumps(result) + "\n")
+                out.flush()
+                print(f"{done}/{len(runs)} {result['run']}", file=sys.stderr)
+    finally:
+        if output:
+            out.close()
+
+    elapsed = time.perf_counter() - start
+    print(
+        f"{succeeded}/{len(runs)} runs succeeded in {elapsed:.1f} s", file=sys.stderr
+    )
+    return succeeded
+
+
+def add_arguments(parser):
+    parser.add_argument("directories", nargs="+", help="directories of board images")
+    parser.add_argument(
+        "--workers", type=int, default=None, help="processes to use (default: all cores)"
+    )
+    parser.add_argument(
+        "--execute",
+        choices=["none", "sandbox", "local"],
+        default="none",
+        help="run the generated code, in the Docker sandbox or in-process",
+    )
+    parser.add_argument("--output", help="write JSON lines to this file, not stdout")
+    parser.add_argument("--ocr", help="OCR backend to use instead of the settings")
+
+
+def run(args):
+    load_settings()
+    if args.ocr:
+        settings["OCR_BACKEND"] = args.ocr
+    check_backend(settings["OCR_BACKEND"])
+    run_batch(args.directories, args.workers, args.execute, args.output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    add_arguments(parser)
+    run(parser.parse_args())
@@ -0,0 +1,123 @@
+"""Check the label consensus against the original pairwise implementation.
+
+Run from the repository root:
+
+    python -m benchmarks.consensus_check --sets 3000
+
+With equal confidences, find_consensus_label must pick the same label as
+the pairwise clustering it replaced. Random label sets are built from a
+few base words with small edits, so many pairs sit right at the
+similarity threshold. Exits with status 1 if any set differs.
+"""
+
+import argparse
+import json
+import sys
+from collections import defaultdict
+import numpy as np
+from Levenshtein import distance as lev_dist
+from code_detection.consensus import find_consensus_label
+
+ALPHABET = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789 "
+
+# Label sets that once disagreed, checked on every run
+KNOWN_CASES = [
+    ["ABCDE", "ABCD", "ABCD", "XYZW", "XYZW", "XYZW"],
+]
+
+
+def baseline_consensus_label(labels, similarity_threshold=0.8):
+    """The consensus as computed before code_detection/consensus.py."""
+    label_groups = defaultdict(list)
+
+    exact_counts = defaultdict(int)
+    for lbl in labels:
+        exact_counts[lbl] += 1
+
+    for label in exact_counts.keys():
+        matched = False
+        for existing in label_groups:
+            similarity = 1 - (
+                lev_dist(label, existing) / max(len(label), len(existing))
+            )
+            if similarity >= similarity_threshold:
+                label_groups[existing].append(label)
+                matched = True
+                break
+        if not matched:
+            label_groups[label] = [label]
+
+    best_group = max(
+        label_groups.items(), key=lambda x: sum(exact_counts[lbl] for lbl in x[1])
+    )
+    return max(best_group[1], key=lambda x: exact_counts[x])
+
+
+def mutate(word, rng):
+    """Apply one random insertion, deletion or substitution."""
+    chars = list(word)
+    position = int(rng.integers(len(chars) + 1))
+    edit = rng.integers(3)
+    character = ALPHABET[rng.integers(len(ALPHABET))]
+    if edit == 0 or len(chars) <= 1:
+        chars.insert(position, character)
+    elif edit == 1:
+        del chars[min(position, len(chars) - 1)]
+    else:
+        chars[min(position, len(chars) - 1)] = character
+    return "".join(chars)
+
+
+def random_labels(rng):
+    words = [
+        "".join(ALPHABET[i] for i in rng.integers(26, size=rng.integers(2, 9)))
+        for _ in range(rng.integers(1, 4))
+    ]
+    labels = []
+    for _ in range(rng.integers(1, 10)):
+        label = words[rng.integers(len(words))]
+        for _ in range(rng.integers(3)):
+            label = mutate(label, rng)
+        labels.append(label)
+    return labels
+
+
+def run_check(sets, thresholds, seed):
+    rng = np.random.default_rng(seed)
+    cases = [(labels, 0.8) for labels in KNOWN_CASES]
+    cases += [
+        (random_labels(rng), thresholds[i % len(thresholds)]) for i in range(sets)
+    ]
+
+    mismatches = []
+    for labels, threshold in cases:
+        expected = baseline_consensus_label(labels, threshold)
+        actual = find_consensus_label(labels, similarity_threshold=threshold)
+        if actual != expected:
+            mismatches.append(
+                {
+                    "labels": labels,
+                    "threshold": threshold,
+                    "expected": expected,
+                    "actual": actual,
+                }
+            )
+    return {"sets": len(cases), "mismatches": mismatches}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--sets", type=int, default=3000)
+    parser.add_argument(
+        "--thresholds", type=float, nargs="+", default=[0.8, 0.75, 0.6, 0.5]
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    report = run_check(args.sets, args.thresholds, args.seed)
+    print(json.dumps(report, indent=2))
+    sys.exit(1 if report["mismatches"] else 0)
+
+
+if __name__ == "__main__":
+    main()
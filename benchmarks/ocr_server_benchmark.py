@@ -0,0 +1,121 @@
+"""Run the shared OCR server and several clients on one machine.
+
+Run from the repository root:
+
+    python -m benchmarks.ocr_server_benchmark --clients 6 --requests 20
+
+The server serves the synthetic OCR stub on loopback with a random key, so
+no model or network is needed. Each client thread sends synthetic board
+frames through its own RemoteOCRBackend, and every result is checked
+against the stub run directly. Meanwhile one extra connection stays silent
+and another uses the wrong key, to check that neither holds anyone up.
+Exits with status 1 if a result is wrong or a client hangs.
+"""
+
+import argparse
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import numpy as np
+from multiprocessing import AuthenticationError
+from benchmarks.stub_ocr import SyntheticOCRBackend
+from benchmarks.synthetic import make_scene
+from code_detection.ocr.remote import RemoteOCRBackend
+from code_detection.ocr.server import OCRServer
+
+
+def same_results(a, b):
+    return len(a) == len(b) and all(
+        x.texts == y.texts
+        and np.allclose(x.boxes, y.boxes)
+        and np.allclose(x.confidences, y.confidences)
+        for x, y in zip(a, b)
+    )
+
+
+def run_client(server, authkey, frames, expected, requests, compress, failures):
+    backend = RemoteOCRBackend(server.address, authkey=authkey, compress=compress)
+    for i in range(requests):
+        index = i % len(frames)
+        result = backend.detect_and_recognise([frames[index]])
+        if not same_results(result, expected[index]):
+            failures.append(f"request {i} returned a wrong result")
+
+
+def run_benchmark(clients, requests, timeout, compress, seed):
+    scene = make_scene(4, seed=seed)
+    stub = SyntheticOCRBackend(scene.items)
+    frames = list(scene.frames)
+    expected = [stub.detect_and_recognise([frame]) for frame in frames]
+
+    authkey = os.urandom(16)
+    server = OCRServer(stub, ("127.0.0.1", 0), authkey=authkey).start()
+    failures = []
+    try:
+        # A client that connects and never answers the key exchange
+        silent = socket.create_connection(server.address)
+
+        try:
+            RemoteOCRBackend(server.address, authkey=b"wrong").metrics()
+            failures.append("a client with the wrong key was accepted")
+        except (AuthenticationError, EOFError, OSError):
+            pass
+
+        threads = [
+            threading.Thread(
+                target=run_client,
+                args=(server, authkey, frames, expected, requests, compress, failures),
+                daemon=True,
+            )
+            for _ in range(clients)
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        deadline = start + timeout
+        for thread in threads:
+            thread.join(max(0.0, deadline - time.perf_counter()))
+        elapsed = time.perf_counter() - start
+
+        hung = sum(thread.is_alive() for thread in threads)
+        if hung:
+            failures.append(f"{hung} of {clients} clients hung for over {timeout} s")
+        silent.close()
+        metrics = server.metrics()
+    finally:
+        server.stop()
+
+    return {
+        "clients": clients,
+        "requests_per_client": requests,
+        "seconds": round(elapsed, 3),
+        "images_per_second": round(clients * requests / elapsed, 1),
+        "mean_batch_size": round(metrics["mean_batch_size"], 2),
+        "batch_sizes": metrics["batch_sizes"],
+        "p50_latency_ms": round(metrics["p50_latency_ms"], 1),
+        "p95_latency_ms": round(metrics["p95_latency_ms"], 1),
+        "failures": failures,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--clients", type=int, default=6)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--compress", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    report = run_benchmark(
+        args.clients, args.requests, args.timeout, args.compress, args.seed
+    )
+    print(json.dumps(report, indent=2))
+    sys.exit(1 if report["failures"] else 0)
+
+
+if __name__ == "__main__":
+    main()
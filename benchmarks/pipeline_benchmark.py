@@ -0,0 +1,203 @@
+"""Benchmark the detection pipeline on synthetic whiteboards.
+
+Run from the repository root:
+
+    python -m benchmarks.pipeline_benchmark --runs 20 --output bench.json
+    python -m benchmarks.pipeline_benchmark --compare bench.json
+
+By default the synthetic OCR stub is used, so no models or network are
+needed. Pass --ocr paddleocr (or any registered backend) to include a
+real OCR engine.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import time
+import tracemalloc
+import numpy as np
+from benchmarks.stub_ocr import SyntheticOCRBackend
+from benchmarks.synthetic import make_scene
+from code_detection.detector import Detector
+from code_detection.ocr.registry import get_backend, register_backend
+from code_detection.parser import Parser
+from code_detection.tokeniser import Tokeniser
+from output.projector import Projector
+from preprocessing.preprocessor import Preprocessor
+from settings import settings
+
+STAGES = ["preprocess", "detect", "tokenise", "parse", "emit"]
+
+
+class StageTimer:
+    """Collects the duration, and optionally peak memory, of each stage."""
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.durations = {}
+        self.peaks = {}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.durations[name] = time.perf_counter() - start
+            if self.trace_memory:
+                peak = tracemalloc.get_traced_memory()[1]
+                self.peaks[name] = peak - baseline
+
+
+def run_pipeline(frames, timer):
+    """Run one capture through every stage, returning whether code was produced."""
+    with timer.stage("preprocess"):
+        preprocessor = Preprocessor(None)
+        warped_images = []
+        for frame in frames:
+            preprocessor.set_image(frame)
+            warped_image = preprocessor.preprocess_image()
+            if warped_image is not None:
+                warped_images.append(warped_image)
+    if not warped_images:
+        return False
+
+    with timer.stage("detect"):
+        image, boxes = Detector(warped_images).detect_code()
+    if boxes is None:
+        return False
+
+    with timer.stage("tokenise"):
+        tokens = Tokeniser(boxes).tokenise()
+
+    with timer.stage("parse"):
+        _, python_code, _, error_box = Parser(tokens).parse()
+
+    with timer.stage("emit"):
+        Projector(
+            image,
+            python_code,
+            "",
+            boxes,
+            error_box,
+            output_size=tuple(settings["PROJECTION_RESOLUTION"]),
+            marker_size=settings["CORNER_MARKER_SIZE"],
+        ).display_full_projection()
+
+    return python_code is not None
+
+
+def percentiles(values):
+    values = np.asarray(values) * 1000
+    return {
+        "mean_ms": round(float(values.mean()), 3),
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p90_ms": round(float(np.percentile(values, 90)), 3),
+        "p99_ms": round(float(np.percentile(values, 99)), 3),
+    }
+
+
+def run_benchmark(runs, frames_per_run, seed, ocr_name, error_rate):
+    if ocr_name == "synthetic":
+        stub = SyntheticOCRBackend(error_rate=error_rate, seed=seed)
+        register_backend("synthetic", lambda: stub)
+    settings["OCR_BACKEND"] = ocr_name
+    backend = get_backend()
+
+    scenes = [make_scene(frames_per_run, seed=seed + i) for i in range(runs)]
+    durations = {name: [] for name in STAGES + ["total"]}
+    successes = 0
+
+    # The pipeline prints its progress, keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        # Warm up caches and lazy initialisation outside the measurements
+        if ocr_name == "synthetic":
+            backend.set_scene(scenes[0].items)
+        run_pipeline(scenes[0].frames, StageTimer())
+
+        for scene in scenes:
+            if ocr_name == "synthetic":
+                backend.set_scene(scene.items)
+            timer = StageTimer()
+            start = time.perf_counter()
+            successes += run_pipeline(scene.frames, timer)
+            durations["total"].append(time.perf_counter() - start)
+            for name, duration in timer.durations.items():
+                durations[name].append(duration)
+
+        # Measure memory in a separate pass, tracemalloc slows everything down
+        tracemalloc.start()
+        timer = StageTimer(trace_memory=True)
+        if ocr_name == "synthetic":
+            backend.set_scene(scenes[0].items)
+        run_pipeline(scenes[0].frames, timer)
+        tracemalloc.stop()
+
+    stages = {}
+    for name, values in durations.items():
+        if not values:
+            continue
+        stages[name] = percentiles(values)
+        if name in timer.peaks:
+            stages[name]["peak_kb"] = round(timer.peaks[name] / 1024, 1)
+
+    return {
+        "config": {
+            "runs": runs,
+            "frames_per_run": frames_per_run,
+            "seed": seed,
+            "ocr": ocr_name,
+            "error_rate": error_rate,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+        },
+        "success_rate": successes / runs,
+        "stages": stages,
+    }
+
+
+def compare(results, baseline):
+    """Print the change in median latency of each stage against a baseline."""
+    print(f"{'stage':<12}{'baseline p50':>14}{'current p50':>14}{'change':>10}")
+    for name, current in results["stages"].items():
+        previous = baseline["stages"].get(name)
+        if previous is None:
+            continue
+        change = (current["p50_ms"] / previous["p50_ms"] - 1) * 100
+        print(
+            f"{name:<12}{previous['p50_ms']:>14.2f}{current['p50_ms']:>14.2f}"
+            f"{change:>+9.1f}%"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--frames", type=int, default=settings["NUM_VALID_IMAGES"])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--ocr", default="synthetic")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="baseline JSON file to compare against")
+    args = parser.parse_args()
+
+    results = run_benchmark(
+        args.runs, args.frames, args.seed, args.ocr, args.error_rate
+    )
+    print(json.dumps(results, indent=4))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=4)
+    if args.compare:
+        with open(args.compare, "r") as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import cv2
+import numpy as np
+from code_detection.ocr.backend import BaseOCRBackend, OCRResult, to_boxes
+
+# Margin added by Preprocessor.warp_image around the corner markers
+WARP_MARGIN = 0.01
+
+
+class SyntheticOCRBackend(BaseOCRBackend):
+    """OCR stand-in for benchmarks on synthetic boards, needs no model.
+
+    Text regions are found with thresholding and morphology, so detection
+    costs real image work. Each region is then labelled with the rendered
+    text whose ground truth box contains its centre, optionally corrupted
+    at error_rate to exercise the consensus code.
+    """
+
+    name = "synthetic"
+
+    def __init__(self, items=None, error_rate=0.0, seed=None):
+        self.items = items or []
+        self.error_rate = error_rate
+        self.rng = np.random.default_rng(seed)
+
+    def set_scene(self, items):
+        self.items = items
+
+    def detect(self, images):
+        boxes = []
+        for image in images:
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            _, binary = cv2.threshold(
+                gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU
+            )
+            # Join the characters of a line into one region
+            kernel = cv2.getStructuringElement(
+                cv2.MORPH_RECT, (max(3, image.shape[1] // 60), 3)
+            )
+            binary = cv2.dilate(binary, kernel)
+            contours, _ = cv2.findContours(
+                binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE
+            )
+
+            image_boxes = []
+            for contour in contours:
+                x, y, w, h = cv2.boundingRect(contour)
+                if h < 5 or w < 5:
+                    continue
+                image_boxes.append([[x, y], [x + w, y], [x + w, y + h], [x, y + h]])
+            boxes.append(to_boxes(image_boxes))
+        return boxes
+
+    def _to_image(self, box, shape):
+        # Map a normalised board box into warped image coordinates
+        height, width = shape[:2]
+        scale = np.array([width, height], dtype=np.float32)
+        return WARP_MARGIN * scale + box * (1 - 2 * WARP_MARGIN) * scale
+
+    def _corrupt(self, text):
+        if self.error_rate <= 0 or self.rng.random() >= self.error_rate:
+            return text
+        i = self.rng.integers(len(text))
+        return text[:i] + chr(int(self.rng.integers(97, 123))) + text[i + 1 :]
+
+    def recognise(self, crops):
+        raise NotImplementedError("The synthetic OCR backend needs box positions")
+
+    def detect_and_recognise(self, images):
+        results = []
+        for image, boxes in zip(images, self.detect(images)):
+            targets = [self._to_image(item.box, image.shape) for item in self.items]
+            found = {}
+            for box in boxes:
+                centre = box.mean(axis=0)
+                for index, target in enumerate(targets):
+                    low, high = target.min(axis=0), target.max(axis=0)
+                    if np.all(centre >= low) and np.all(centre <= high):
+                        found.setdefault(index, []).append(box)
+                        break
+
+            result_boxes, texts = [], []
+            for index, parts in found.items():
+                points = np.concatenate(parts)
+                x_min, y_min = points.min(axis=0)
+                x_max, y_max = points.max(axis=0)
+                result_boxes.append(
+                    [[x_min, y_min], [x_max, y_min], [x_max, y_max], [x_min, y_max]]
+                )
+                texts.append(self._corrupt(self.items[index].text))
+
+            if not texts:
+                results.append(OCRResult.empty())
+                continue
+            results.append(
+                OCRResult(
+                    to_boxes(result_boxes),
+                    texts,
+                    np.full(len(texts), 0.9, dtype=np.float32),
+                )
+            )
+        return results
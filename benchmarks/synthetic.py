@@ -0,0 +1,180 @@
+import cv2
+import numpy as np
+from collections import namedtuple
+from code_detection.markers.keywords import ALL_KEYWORDS, get_keyword
+
+# Marker labels by ID, read from the keyword table the detector uses. The
+# markers come from DICT_6X6_50, so IDs run from 0 to 49.
+MARKER_IDS = {
+    get_keyword(marker_id): marker_id
+    for marker_id in range(50)
+    if get_keyword(marker_id) != "UNKNOWN"
+}
+
+# Marker IDs used by the keyword cards and the output markers
+KEYWORD_IDS = {
+    label: marker_id
+    for label, marker_id in MARKER_IDS.items()
+    if label in ALL_KEYWORDS or label in ("PYTHON", "RESULTS")
+}
+
+# Corner marker IDs, in the order top left, top right, bottom right, bottom left
+CORNER_IDS = [
+    MARKER_IDS[label]
+    for label in ("Top Left", "Top Right", "Bottom Right", "Bottom Left")
+]
+
+FONTS = [
+    cv2.FONT_HERSHEY_SIMPLEX,
+    cv2.FONT_HERSHEY_DUPLEX,
+    cv2.FONT_HERSHEY_COMPLEX,
+    cv2.FONT_HERSHEY_SCRIPT_SIMPLEX,
+]
+
+# Whiteboard programs, one list per line. Upper case entries are keyword
+# cards, everything else is handwritten text
+PROGRAMS = [
+    [["x = 3"], ["PRINT", "x + 1"]],
+    [["FOR", "i", "FROM", "0", "TO", "3"], ["DO", "PRINT", "i"], ["END"]],
+    [["y = 5"], ["IF", "y > 2"], ["THEN", "PRINT", "y"], ["END"]],
+    [["n = 0"], ["WHILE", "n < 3"], ["DO", "n = n + 1"], ["END"], ["PRINT", "n"]],
+]
+
+# A piece of handwritten text with its box in board coordinates normalised
+# to the area between the outer corners of the corner markers
+TextItem = namedtuple("TextItem", ["text", "box"])
+
+Scene = namedtuple("Scene", ["frames", "items", "program"])
+
+
+def _draw_marker(board, marker_id, x, y, size, aruco_dict):
+    marker = cv2.aruco.generateImageMarker(aruco_dict, marker_id, size)
+    board[y : y + size, x : x + size] = marker[..., None]
+
+
+def render_board(program, size=(1600, 1000), marker_size=48, rng=None):
+    """Render a whiteboard holding program as keyword cards and text.
+
+    Returns the board image and the handwritten text items.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    width, height = size
+    aruco_dict = cv2.aruco.getPredefinedDictionary(cv2.aruco.DICT_6X6_50)
+    board = np.full((height, width, 3), 255, dtype=np.uint8)
+
+    # Corner markers, inset like the projected ones
+    margin = int(0.01 * width)
+    corner_positions = [
+        (margin, margin),
+        (width - marker_size - margin, margin),
+        (width - marker_size - margin, height - marker_size - margin),
+        (margin, height - marker_size - margin),
+    ]
+    for marker_id, (x, y) in zip(CORNER_IDS, corner_positions):
+        _draw_marker(board, marker_id, x, y, marker_size, aruco_dict)
+
+    x0, y0 = corner_positions[0]
+    x1, y1 = corner_positions[2][0] + marker_size, corner_positions[2][1] + marker_size
+
+    # Output markers on the right hand side of the board
+    for label, y in [("PYTHON", 0.1), ("RESULTS", 0.55)]:
+        _draw_marker(
+            board,
+            KEYWORD_IDS[label],
+            int(0.75 * width),
+            int(y * height),
+            marker_size,
+            aruco_dict,
+        )
+
+    font = FONTS[rng.integers(len(FONTS))]
+    font_scale = cv2.getFontScaleFromHeight(font, int(marker_size * 0.6), 2)
+    items = []
+
+    y = int(0.1 * height)
+    for line in program:
+        x = int(0.06 * width)
+        for token in line:
+            if token in KEYWORD_IDS:
+                _draw_marker(board, KEYWORD_IDS[token], x, y, marker_size, aruco_dict)
+                # Cards are five markers wide
+                x += int(marker_size * 5.5)
+                continue
+
+            (text_width, text_height), baseline = cv2.getTextSize(
+                token, font, font_scale, 2
+            )
+            origin = (x, y + (marker_size + text_height) // 2)
+            cv2.putText(
+                board, token, origin, font, font_scale, (20, 20, 20), 2, cv2.LINE_AA
+            )
+
+            box = np.array(
+                [
+                    [x, origin[1] - text_height],
+                    [x + text_width, origin[1] - text_height],
+                    [x + text_width, origin[1] + baseline],
+                    [x, origin[1] + baseline],
+                ],
+                dtype=np.float32,
+            )
+            box = (box - [x0, y0]) / [x1 - x0, y1 - y0]
+            items.append(TextItem(token, box))
+            x += text_width + marker_size
+        y += int(marker_size * 1.8)
+
+    return board, items
+
+
+def camera_homography(board_size, camera_size=(1920, 1080), warp=0.04, rng=None):
+    """Random homography placing the board in a camera frame at a slight angle."""
+    rng = rng if rng is not None else np.random.default_rng()
+    board_width, board_height = board_size
+    camera_width, camera_height = camera_size
+
+    # Place the board in the centre of the frame, then jitter each corner
+    scale = 0.85 * min(camera_width / board_width, camera_height / board_height)
+    offset_x = (camera_width - board_width * scale) / 2
+    offset_y = (camera_height - board_height * scale) / 2
+    src = np.array(
+        [[0, 0], [board_width, 0], [board_width, board_height], [0, board_height]],
+        dtype=np.float32,
+    )
+    dst = src * scale + [offset_x, offset_y]
+    dst += rng.uniform(-warp, warp, size=(4, 2)) * [camera_width, camera_height]
+    return cv2.getPerspectiveTransform(src, dst.astype(np.float32))
+
+
+def capture_board(board, H, camera_size=(1920, 1080), noise=4.0, rng=None):
+    """Simulate a camera frame of the board seen through homography H."""
+    rng = rng if rng is not None else np.random.default_rng()
+    frame = cv2.warpPerspective(
+        board, H, camera_size, borderValue=(90, 90, 90), flags=cv2.INTER_LINEAR
+    )
+
+    if noise > 0:
+        grain = rng.normal(0, noise, size=frame.shape)
+        frame = np.clip(frame + grain, 0, 255).astype(np.uint8)
+    return frame
+
+
+def make_scene(
+    num_frames=3,
+    program_index=None,
+    seed=None,
+    camera_size=(1920, 1080),
+    warp=0.04,
+    noise=4.0,
+):
+    """Render one board and num_frames noisy captures from a fixed camera."""
+    rng = np.random.default_rng(seed)
+    if program_index is None:
+        program_index = int(rng.integers(len(PROGRAMS)))
+    program = PROGRAMS[program_index]
+
+    board, items = render_board(program, rng=rng)
+    H = camera_homography(board.shape[1::-1], camera_size, warp, rng=rng)
+    frames = [
+        capture_board(board, H, camera_size, noise, rng=rng) for _ in range(num_frames)
+    ]
+    return Scene(frames, items, program)
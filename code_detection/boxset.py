@@ -0,0 +1,137 @@
+import numpy as np
+
+
+class BoxSet:
+    """Columnar store of detected boxes shared by every pipeline stage.
+
+    Corners are held in one (N, 4, 2) float32 array, with extents, centres
+    and areas computed once up front. Text, source, image id and confidence
+    are parallel arrays. Iterating yields (corners, text) pairs, so code
+    written for the older list of tuples keeps working. Indexing with a
+    slice, index array or boolean mask returns a new BoxSet.
+    """
+
+    def __init__(
+        self, corners, texts, sources=None, image_ids=None, confidences=None
+    ):
+        self.corners = np.asarray(corners, dtype=np.float32).reshape(-1, 4, 2)
+        count = len(self.corners)
+
+        self.texts = np.empty(count, dtype=object)
+        self.texts[:] = list(texts)
+        self.sources = np.empty(count, dtype=object)
+        self.sources[:] = list(sources) if sources is not None else ["ocr"] * count
+        self.image_ids = (
+            np.asarray(image_ids, dtype=np.int32)
+            if image_ids is not None
+            else np.zeros(count, dtype=np.int32)
+        )
+        self.confidences = (
+            np.asarray(confidences, dtype=np.float32)
+            if confidences is not None
+            else np.ones(count, dtype=np.float32)
+        )
+
+        self.mins = self.corners.min(axis=1)
+        self.maxs = self.corners.max(axis=1)
+        self.centres = (self.mins + self.maxs) / 2
+        self.sizes = self.maxs - self.mins
+        self.areas = self.sizes[:, 0] * self.sizes[:, 1]
+
+    @classmethod
+    def from_records(cls, records):
+        """Build a BoxSet from (corners, text[, source, image_id, confidence]) tuples."""
+        if isinstance(records, BoxSet):
+            return records
+        records = list(records)
+        if not records:
+            return cls.empty()
+
+        corners = [np.asarray(record[0], dtype=np.float32) for record in records]
+        texts = [str(record[1]) for record in records]
+        sources = [record[2] if len(record) > 2 else "ocr" for record in records]
+        image_ids = [record[3] if len(record) > 3 else 0 for record in records]
+        confidences = [record[4] if len(record) > 4 else 1.0 for record in records]
+        return cls(corners, texts, sources, image_ids, confidences)
+
+    @classmethod
+    def empty(cls):
+        return cls(np.zeros((0, 4, 2), dtype=np.float32), [])
+
+    @classmethod
+    def concatenate(cls, box_sets):
+        box_sets = [box_set for box_set in box_sets if len(box_set) > 0]
+        if not box_sets:
+            return cls.empty()
+        return cls(
+            np.concatenate([box_set.corners for box_set in box_sets]),
+            np.concatenate([box_set.texts for box_set in box_sets]),
+            np.concatenate([box_set.sources for box_set in box_sets]),
+            np.concatenate([box_set.image_ids for box_set in box_sets]),
+            np.concatenate([box_set.confidences for box_set in box_sets]),
+        )
+
+    def __len__(self):
+        return len(self.corners)
+
+    def __iter__(self):
+        return zip(self.corners, self.texts)
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            return self.corners[index], self.texts[index]
+        return BoxSet(
+            self.corners[index],
+            self.texts[index],
+            self.sources[index],
+            self.image_ids[index],
+            self.confidences[index],
+        )
+
+    def __repr__(self):
+        return f"BoxSet({len(self)} boxes)"
+
+    def record(self, index):
+        """The full (corners, text, source, image_id, confidence) tuple of a box."""
+        return (
+            self.corners[index],
+            self.texts[index],
+            self.sources[index],
+            int(self.image_ids[index]),
+            float(self.confidences[index]),
+        )
+
+    def records(self):
+        return [self.record(i) for i in range(len(self))]
+
+    @property
+    def extents(self):
+        """(N, 4) array of min_x, min_y, max_x, max_y for each box."""
+        return np.concatenate([self.mins, self.maxs], axis=1)
+
+    def filter(self, mask):
+        return self[np.asarray(mask, dtype=bool)]
+
+    def with_texts(self, texts, exclude=False):
+        """Boxes whose text is (or, with exclude, is not) one of texts."""
+        mask = np.isin(self.texts, list(texts))
+        return self.filter(~mask if exclude else mask)
+
+    def find(self, text):
+        """Corners of the first box with the given text, or None."""
+        matches = np.flatnonzero(self.texts == text)
+        return self.corners[matches[0]] if len(matches) else None
+
+    def scaled(self, scale_x, scale_y):
+        """A copy with corners scaled and truncated to whole pixels."""
+        corners = np.trunc(self.corners * np.float32([scale_x, scale_y]))
+        return BoxSet(
+            corners, self.texts, self.sources, self.image_ids, self.confidences
+        )
+
+
+def as_boxset(boxes):
+    """Convert a list of box tuples to a BoxSet, passing BoxSets and None through."""
+    if boxes is None or isinstance(boxes, BoxSet):
+        return boxes
+    return BoxSet.from_records(boxes)
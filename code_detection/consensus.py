@@ -0,0 +1,125 @@
+import math
+from collections import defaultdict
+from Levenshtein import distance as lev_dist
+
+
+def similarity(label, other):
+    # Normalised similarity (0-1)
+    longest = max(len(label), len(other))
+    if longest == 0:
+        return 1.0
+    return 1 - lev_dist(label, other) / longest
+
+
+class BKTree:
+    """Burkhard-Keller tree of labels for finding near matches quickly.
+
+    Each child edge holds the edit distance to its parent, so a search only
+    visits subtrees within range of the query instead of every label.
+    """
+
+    def __init__(self):
+        self.root = None
+
+    def add(self, label):
+        if self.root is None:
+            self.root = (label, {})
+            return
+
+        node = self.root
+        while True:
+            node_label, children = node
+            d = lev_dist(label, node_label)
+            if d == 0:
+                return
+            if d not in children:
+                children[d] = (label, {})
+                return
+            node = children[d]
+
+    def search(self, label, max_distance):
+        """Return all labels within max_distance edits of label."""
+        if self.root is None:
+            return []
+
+        matches = []
+        stack = [self.root]
+        while stack:
+            node_label, children = stack.pop()
+            d = lev_dist(label, node_label)
+            if d <= max_distance:
+                matches.append(node_label)
+            for edge, child in children.items():
+                if d - max_distance <= edge <= d + max_distance:
+                    stack.append(child)
+        return matches
+
+
+class LabelConsensus:
+    """Confidence-weighted vote between the OCR readings of one box.
+
+    Readings are clustered with the first earlier reading that is at least
+    similarity_threshold similar. The cluster with the highest summed
+    confidence wins, and within it the reading with the highest summed
+    confidence. Readings can be added one at a time as frames arrive.
+    """
+
+    def __init__(self, similarity_threshold=0.8):
+        self.similarity_threshold = similarity_threshold
+        self.tree = BKTree()
+        self.order = {}  # Cluster representative -> insertion order
+        self.cluster_of = {}  # Label -> cluster representative
+        self.label_weights = defaultdict(float)
+        self.cluster_weights = defaultdict(float)
+
+    def _find_cluster(self, label):
+        # Any label within the threshold is at most this many edits away. The
+        # small margin keeps float error from rounding an exact bound down.
+        threshold = self.similarity_threshold
+        if threshold > 0:
+            max_distance = math.floor((1 - threshold) * len(label) / threshold + 1e-9)
+        else:
+            max_distance = len(label) + max(map(len, self.order), default=0)
+        candidates = [
+            existing
+            for existing in self.tree.search(label, max_distance)
+            if similarity(label, existing) >= threshold
+        ]
+        if not candidates:
+            return None
+        return min(candidates, key=self.order.get)
+
+    def add(self, label, confidence=1.0):
+        cluster = self.cluster_of.get(label)
+        if cluster is None:
+            cluster = self._find_cluster(label)
+            if cluster is None:
+                cluster = label
+                self.order[label] = len(self.order)
+                self.tree.add(label)
+            self.cluster_of[label] = cluster
+
+        self.label_weights[label] += confidence
+        self.cluster_weights[cluster] += confidence
+
+    def best(self):
+        """Return the winning label, or None if nothing has been added."""
+        if not self.cluster_weights:
+            return None
+        best_cluster = max(self.cluster_weights, key=self.cluster_weights.get)
+        members = [
+            label
+            for label, cluster in self.cluster_of.items()
+            if cluster == best_cluster
+        ]
+        return max(members, key=self.label_weights.get)
+
+
+def find_consensus_label(labels, confidences=None, similarity_threshold=0.8):
+    """Return the consensus of a list of labels, weighted by confidence."""
+    consensus = LabelConsensus(similarity_threshold)
+    if confidences is None:
+        confidences = [1.0] * len(labels)
+    for label, confidence in zip(labels, confidences):
+        consensus.add(label, confidence)
+    return consensus.best()
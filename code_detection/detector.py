@@ -1,11 +1,18 @@
-from typing import List
+import threading
 import cv2
 import numpy as np
 from collections import defaultdict
-from Levenshtein import distance as lev_dist
-from code_detection.markers.aruco import detect_aruco_markers, create_aruco_mask
-from code_detection.ocr.paddleocr import detect_paddleocr_text
+from code_detection.boxset import BoxSet, as_boxset
+from code_detection.consensus import LabelConsensus, find_consensus_label
+from code_detection.markers.aruco import detect_aruco_markers, marker_rectangles
+from code_detection.markers.card_geometry import card_size, text_boxes_to_cards
+from code_detection.ocr.backend import blend_rectangles
+from code_detection.ocr.registry import get_backend
 from code_detection.markers.keywords import get_keyword, ALL_KEYWORDS
+from tracing import tracer
+
+# Per-thread image buffer the markers are blended out of before OCR
+_local = threading.local()
 
 
 def compute_iou(box1, box2):
@@ -41,88 +48,145 @@ def compute_intersection_area(box1, box2):
     return intersection
 
 
+def boxes_overlap(box1, box2):
+    # Boxes overlap if most of either one lies inside the other
+    inter_area = compute_intersection_area(box1[0], box2[0])
+    box1_area = cv2.contourArea(np.array(box1[0]))
+    box2_area = cv2.contourArea(np.array(box2[0]))
+    return inter_area / box1_area > 0.8 or inter_area / box2_area > 0.8
+
+
+class OverlapGroups:
+    """Groups of overlapping boxes, kept up to date as boxes are added.
+
+    The extents of all boxes are kept in one array, so each new box is only
+    tested exactly against the boxes whose bounding rectangles it touches.
+    """
+
+    def __init__(self):
+        self.boxes = []
+        self.parents = []
+        self.extents = np.empty((0, 4), dtype=np.float32)
+
+    def find(self, u):
+        while self.parents[u] != u:
+            self.parents[u] = self.parents[self.parents[u]]  # Path compression
+            u = self.parents[u]
+        return u
+
+    def add(self, box, extent=None):
+        if extent is None:
+            corners = np.asarray(box[0], dtype=np.float32)
+            extent = np.concatenate([corners.min(axis=0), corners.max(axis=0)])
+
+        # Grow the extents array geometrically
+        new = len(self.boxes)
+        if new == len(self.extents):
+            grown = np.empty((max(16, 2 * new), 4), dtype=np.float32)
+            grown[:new] = self.extents
+            self.extents = grown
+        self.extents[new] = extent
+        self.boxes.append(box)
+        self.parents.append(new)
+
+        # Only boxes whose bounding rectangles intersect can overlap
+        earlier = self.extents[:new]
+        candidates = np.flatnonzero(
+            (earlier[:, 0] <= extent[2])
+            & (earlier[:, 2] >= extent[0])
+            & (earlier[:, 1] <= extent[3])
+            & (earlier[:, 3] >= extent[1])
+        )
+
+        # Union the new box with every earlier box it overlaps
+        for i in candidates:
+            if boxes_overlap(self.boxes[i], box):
+                root_i = self.find(i)
+                root_new = self.find(new)
+                if root_i != root_new:
+                    self.parents[root_new] = root_i
+
+    def add_set(self, box_set):
+        extents = box_set.extents
+        for i in range(len(box_set)):
+            self.add(box_set.record(i), extents[i])
+
+    def groups(self):
+        # Group boxes by their root parent
+        groups = {}
+        for i in range(len(self.boxes)):
+            groups.setdefault(self.find(i), []).append(self.boxes[i])
+        return list(groups.values())
+
+
 class Detector:
-    def __init__(self, images, aruco_dict_type=cv2.aruco.DICT_6X6_50):
+    def __init__(
+        self,
+        images,
+        aruco_dict_type=cv2.aruco.DICT_6X6_50,
+        stability_tolerance=0.01,
+        workers=None,
+    ):
+        # With DetectionWorkers, images are shared frame handles and each is
+        # detected in a worker process
+        self.workers = workers
+        self.handles = None
+        if workers is not None:
+            self.handles = list(images)
+            images = [workers.frame_pool.view(handle) for handle in self.handles]
+
         self.images = images
         self.aruco_dict_type = aruco_dict_type
         self.all_boxes = []
 
+        # State for adding images one at a time
+        self.stability_tolerance = stability_tolerance
+        self.overlap_groups = OverlapGroups()
+        self.detected_boxes = []
+        self.final_boxes = []
+        self.previous_boxes = None
+        self.unconfirmed_groups = 0
+
+        # Label votes of each OCR group, reused as more images are added
+        self.consensus_cache = {}
+
     def text_box_to_card(self, box, aruco_boxes):
         if not aruco_boxes:
             raise ValueError("No ArUco boxes provided for scaling reference.")
-
-        # Get the text box centre (in image coordinates)
-        text_centre_x = (box[0][0] + box[2][0]) / 2
-        text_centre_y = (box[0][1] + box[2][1]) / 2
-
-        # Check if the first ArUco box is transformed (card) or raw (marker)
-        aruco_sample = aruco_boxes[0][0]  # Take the first box
-        aruco_width = abs(aruco_sample[1][0] - aruco_sample[0][0])
-        aruco_height = abs(aruco_sample[2][1] - aruco_sample[1][1])
-
-        # Criteria to detect transformed boxes (cards are much wider than tall)
-        is_transformed = (aruco_width / aruco_height) > 3.0
-
-        if is_transformed:
-            # If already a card box, use its dimensions directly
-            card_width = aruco_width
-            card_height = aruco_height
-        else:
-            # If raw ArUco box, scale it to card dimensions (10.0 × 2.6 units)
-            card_width = (
-                aruco_width * (10.0 / 2.0) * 0.8
-            )  # Card is 10 units wide (8.7 - (-1.3))
-            card_height = aruco_height * (
-                2.6 / 2.0
-            )  # Card is 2.6 units tall (1.3 - (-1.3))
-
-        # Compute card position (accounting for text offset)
-        # Text is at (4.8, 0) relative to card's (-1.3, -1.3) to (8.7, 1.3)
-        # So, text is 6.1 units from the left edge (4.8 - (-1.3))
-        # Card's left edge = text_centre_x - (6.1 / 10.0) * card_width
-        card_left = text_centre_x - (6.1 / 10.0) * card_width
-        card_top = (
-            text_centre_y - (1.3 / 2.6) * card_height
-        )  # Text is vertically centred
-
-        # Compute card corners
-        top_left = (card_left, card_top)
-        top_right = (card_left + card_width, card_top)
-        bottom_left = (card_left, card_top + card_height)
-        bottom_right = (card_left + card_width, card_top + card_height)
-
-        # Create new box with card corners
-        new_box = np.array(
-            [
-                [top_left[0], top_left[1]],
-                [top_right[0], top_right[1]],
-                [bottom_right[0], bottom_right[1]],
-                [bottom_left[0], bottom_left[1]],
-            ],
-            dtype=np.float32,
-        )
-
-        return new_box
+        card_width, card_height = card_size(aruco_boxes[0])
+        return text_boxes_to_cards([box], card_width, card_height)[0]
 
     def detect_from_image(self, image, image_id):
-        # Detect ArUco markers in the image
-        image, aruco_corners, ids = detect_aruco_markers(image, self.aruco_dict_type)
-        if image is None:
-            return [], []
-
-        # Create a mask for the detected ArUco markers
-        mask = create_aruco_mask(image, aruco_corners)
-
-        # Detect text using PaddleOCR
-        image, text = detect_paddleocr_text(image, mask)
+        with tracer.span("aruco"):
+            # Detect ArUco markers in the image
+            image, aruco_corners, ids = detect_aruco_markers(
+                image, self.aruco_dict_type
+            )
+            if image is None:
+                return BoxSet.empty()
+
+            # Hide the detected ArUco markers from OCR, reusing this
+            # thread's buffer instead of allocating a new image per frame
+            rectangles = marker_rectangles(image.shape, aruco_corners)
+            blended_image = _local.ocr_buffer = blend_rectangles(
+                image, rectangles, out=getattr(_local, "ocr_buffer", None)
+            )
+
+        with tracer.span("ocr"):
+            # Detect text using the OCR backend selected in settings. It can
+            # be shared with other boards' runs, so hold its lock.
+            backend = get_backend()
+            with backend.lock:
+                result = backend.detect_and_recognise([blended_image])[0]
 
         boxes = []
+        keyword_indices = []
 
         # Add detected text boxes to list of boxes
-        if text and text[0]:
-            for line in text[0]:
-                box, prediction = line
-                text_val, _ = prediction
+        if result.texts:
+            for box, text_val, confidence in zip(
+                result.boxes, result.texts, result.confidences
+            ):
                 startX, startY = int(box[0][0]), int(box[0][1])
                 endX, endY = int(box[2][0]), int(box[2][1])
                 corners = np.array(
@@ -138,65 +202,42 @@ class Detector:
                     "PYTHON",
                     "RESULTS",
                 ]:
-                    corners = self.text_box_to_card(corners, aruco_corners)
+                    # Card corners are computed for all keywords below
+                    keyword_indices.append(len(boxes))
                     if upper_text_val == "ELSEIF":
                         upper_text_val = "ELSE IF"
-                    boxes.append((corners, str(upper_text_val), "aruco", image_id))
+                    boxes.append(
+                        (corners, str(upper_text_val), "aruco", image_id, 1.0)
+                    )
                 else:
-                    boxes.append((corners, str(text_val), "ocr", image_id))
+                    boxes.append(
+                        (corners, str(text_val), "ocr", image_id, float(confidence))
+                    )
+
+        # Transform the keyword text boxes to card coordinates in one pass
+        if keyword_indices:
+            if not aruco_corners:
+                raise ValueError("No ArUco boxes provided for scaling reference.")
+            card_width, card_height = card_size(aruco_corners[0])
+            cards = text_boxes_to_cards(
+                [boxes[i][0] for i in keyword_indices], card_width, card_height
+            )
+            for i, card in zip(keyword_indices, cards):
+                boxes[i] = (card, *boxes[i][1:])
 
         # Add detected ArUco boxes to list of boxes
         if ids is not None:
             for i in range(len(aruco_corners)):
-                marker_corners = aruco_corners[i][0]
-                box_corners = np.array(
-                    [
-                        [marker_corners[0][0], marker_corners[0][1]],
-                        [marker_corners[1][0], marker_corners[1][1]],
-                        [marker_corners[2][0], marker_corners[2][1]],
-                        [marker_corners[3][0], marker_corners[3][1]],
-                    ]
-                )
+                box_corners = np.asarray(aruco_corners[i][0]).reshape(4, 2)
                 text_val = get_keyword(ids[i][0])
-                boxes.append((box_corners, str(text_val), "aruco", image_id))
+                boxes.append((box_corners, str(text_val), "aruco", image_id, 1.0))
 
-        return boxes
+        return BoxSet.from_records(boxes)
 
     def group_boxes_by_overlap(self, boxes):
-        # Initialise each box as its own group
-        parents = [i for i in range(len(boxes))]
-
-        def find(u):
-            while parents[u] != u:
-                parents[u] = parents[parents[u]]  # Path compression
-                u = parents[u]
-            return u
-
-        # Union boxes that overlap
-        for i in range(len(boxes)):
-            for j in range(i + 1, len(boxes)):
-                box1 = boxes[i]
-                box2 = boxes[j]
-
-                inter_area = compute_intersection_area(box1[0], box2[0])
-                box1_area = cv2.contourArea(np.array(box1[0]))
-                box2_area = cv2.contourArea(np.array(box2[0]))
-
-                if inter_area / box1_area > 0.8 or inter_area / box2_area > 0.8:
-                    root_i = find(i)
-                    root_j = find(j)
-                    if root_i != root_j:
-                        parents[root_j] = root_i
-
-        # Group boxes by their root parent
-        groups = {}
-        for i in range(len(boxes)):
-            root = find(i)
-            if root not in groups:
-                groups[root] = []
-            groups[root].append(boxes[i])
-
-        return list(groups.values())
+        groups = OverlapGroups()
+        groups.add_set(as_boxset(boxes))
+        return groups.groups()
 
     def filter_boxes(self, boxes):
         # Filter boxes based on their type and the number of images
@@ -251,8 +292,9 @@ class Detector:
         merged_label = " ".join([box[1] for box in boxes])
         # Create a new box that encompasses all the boxes in the group
         merged_box = self.get_overall_box(boxes)
-        # Create a new box with the merged label
-        merged_box = (merged_box, str(merged_label), "ocr", boxes[0][3])
+        # Create a new box with the merged label and mean confidence
+        confidence = float(np.mean([box[4] for box in boxes]))
+        merged_box = (merged_box, str(merged_label), "ocr", boxes[0][3], confidence)
         return merged_box
 
     def merge_ocr_group(self, group):
@@ -273,42 +315,35 @@ class Detector:
 
         return merged_boxes
 
-    def find_consensus_label(self, labels: List[str], similarity_threshold=0.8):
-        # Group similar labels
-        label_groups = defaultdict(list)
-
-        # First pass: group by exact matches
-        exact_counts = defaultdict(int)
-        for lbl in labels:
-            exact_counts[lbl] += 1
-
-        # Second pass: fuzzy match remaining
-        for label in exact_counts.keys():
-            matched = False
-            for existing in label_groups:
-                # Normalised similarity (0-1)
-                similarity = 1 - (
-                    lev_dist(label, existing) / max(len(label), len(existing))
-                )
-                if similarity >= similarity_threshold:
-                    label_groups[existing].append(label)
-                    matched = True
-                    break
-            if not matched:
-                label_groups[label] = [label]
-
-        # Find the group with highest total count
-        best_group = max(
-            label_groups.items(), key=lambda x: sum(exact_counts[lbl] for lbl in x[1])
-        )
+    def find_consensus_label(self, labels, similarity_threshold=0.8):
+        return find_consensus_label(labels, similarity_threshold=similarity_threshold)
+
+    def group_consensus(self, group):
+        # Votes for a group are kept between calls, so adding an image only
+        # adds its own readings. A group is recounted if any earlier image's
+        # reading changed, e.g. when two groups merge.
+        votes = {box[3]: box[1] for box in group}
+        first = min(group, key=lambda box: box[3])
+        centre = np.round(np.mean(first[0], axis=0)).astype(int)
+        key = (first[3], first[1], *centre)
+        cached = self.consensus_cache.get(key)
+        if cached is not None:
+            consensus, counted = cached
+            if any(votes.get(i) != label for i, label in counted.items()):
+                cached = None
+        if cached is None:
+            consensus, counted = LabelConsensus(), {}
+            self.consensus_cache[key] = (consensus, counted)
 
-        # Return the most frequent version in the best group
-        return max(best_group[1], key=lambda x: exact_counts[x])
+        for box in group:
+            if box[3] not in counted:
+                consensus.add(box[1], box[4])
+                counted[box[3]] = box[1]
+        return consensus.best()
 
     def combine_ocr_group(self, group):
-        # Find most common label in the group
-        labels = [box[1] for box in group]
-        best_label = self.find_consensus_label(labels)
+        # Find the label with the most confident support in the group
+        best_label = self.group_consensus(group)
 
         # Filter boxes with the best label
         filtered_boxes = [box for box in group if box[1] == best_label]
@@ -322,11 +357,18 @@ class Detector:
     def combine_boxes(self, all_detected_boxes):
         # Combine detected boxes from mutliple images into a single list
         if all_detected_boxes is None or len(all_detected_boxes) == 0:
-            return []
+            return BoxSet.empty()
 
+        return self.combine_groups(self.group_boxes_by_overlap(all_detected_boxes))
+
+    def combine_groups(self, grouped_boxes):
+        # Combine each group of overlapping boxes into a single box
         combined_boxes = []
+        self.all_boxes = []
 
-        grouped_boxes = self.group_boxes_by_overlap(all_detected_boxes)
+        # Count groups whose label the newest image does not agree with
+        latest_id = len(self.images) - 1 if self.images else 0
+        self.unconfirmed_groups = 0
 
         for group in grouped_boxes:
             filtered_boxes = self.filter_boxes(group)
@@ -342,29 +384,45 @@ class Detector:
                     box = self.combine_ocr_group(merged_boxes)
                     combined_boxes.append(box)
 
-        return combined_boxes
+                    latest = [b[1] for b in merged_boxes if b[3] == latest_id]
+                    if latest != [box[1]]:
+                        self.unconfirmed_groups += 1
+
+        return BoxSet.from_records(combined_boxes)
 
     def strip_boxes(self, boxes):
-        # Strip boxes to only contain the coordinates and label
-        stripped_boxes = []
-        for box, label, _, _ in boxes:
-            stripped_boxes.append((box, label))
-        return stripped_boxes
+        # A BoxSet iterates as (coordinates, label) pairs
+        return as_boxset(boxes)
 
-    def detect_code(self):
+    def detect_code(self, cancel_event=None):
+        """Detect and combine the code in every image.
+
+        Stops between images once cancel_event is set, returning None, None.
+        """
         if not self.images:
             print("Error: No images provided")
             return None, None
 
         # Detect code in the images
-        all_detected_boxes = []
-        for i, img in enumerate(self.images):
-            boxes = self.detect_from_image(img, i)
-            all_detected_boxes.extend(boxes)
+        if self.workers is not None:
+            with tracer.span("workers"):
+                detected = self.workers.detect(self.handles, cancel_event)
+        else:
+            detected = []
+            for i, img in enumerate(self.images):
+                if cancel_event is not None and cancel_event.is_set():
+                    detected = None
+                    break
+                detected.append(self.detect_from_image(img, i))
+        if detected is None:
+            print("Detection cancelled")
+            return None, None
+        all_detected_boxes = BoxSet.concatenate(detected)
 
         if len(self.images) > 1:
             # If multiple images, combine boxes from all images
-            final_boxes = self.combine_boxes(all_detected_boxes)
+            with tracer.span("grouping"):
+                final_boxes = self.combine_boxes(all_detected_boxes)
         else:
             # If only one image, use the detected boxes directly
             final_boxes = self.strip_boxes(all_detected_boxes)
@@ -373,5 +431,81 @@ class Detector:
             final_boxes,
         )  # Return one of the processed images and combined boxes
 
+    def add_image(self, image):
+        """Detect boxes in one more image and update the combined boxes.
+
+        Only the new boxes are compared against the existing groups, so the
+        cost of each image does not grow with the number of images before it.
+        Returns the current combined boxes.
+        """
+        if self.images is None:
+            self.images = []
+        image_id = len(self.images)
+        self.images.append(image)
+
+        boxes = self.detect_from_image(image, image_id)
+        self.detected_boxes.extend(boxes.records())
+        self.overlap_groups.add_set(boxes)
+
+        self.previous_boxes = self.final_boxes
+        with tracer.span("grouping"):
+            if len(self.images) > 1:
+                self.final_boxes = self.combine_groups(self.overlap_groups.groups())
+            else:
+                self.final_boxes = self.strip_boxes(self.detected_boxes)
+        return self.final_boxes
+
+    def is_stable(self):
+        """Whether the last image agreed with the combined labels and boxes.
+
+        The newest image must read every text group the same as the
+        consensus, and the combined boxes must be unchanged, moving by up to
+        stability_tolerance of the image width.
+        """
+        if not self.final_boxes or self.previous_boxes is None:
+            return False
+        if self.unconfirmed_groups > 0:
+            return False
+        if len(self.final_boxes) != len(self.previous_boxes):
+            return False
+
+        tolerance = self.stability_tolerance * self.images[0].shape[1]
+        previous = sorted(
+            self.previous_boxes, key=lambda box: (box[1], *np.mean(box[0], axis=0))
+        )
+        current = sorted(
+            self.final_boxes, key=lambda box: (box[1], *np.mean(box[0], axis=0))
+        )
+        for (old_box, old_label), (new_box, new_label) in zip(previous, current):
+            if old_label != new_label:
+                return False
+            shift = np.abs(np.asarray(old_box, float) - np.asarray(new_box, float))
+            if shift.max() > tolerance:
+                return False
+        return True
+
+    def detect_code_adaptive(self, images, min_images=2, max_images=6):
+        """Detect code from images as they arrive, stopping once stable.
+
+        images can be any iterable, e.g. a generator of warped camera frames.
+        Images are added until the combined boxes stop changing, or until
+        max_images have been used.
+        """
+        self.images = []
+        for image in images:
+            self.add_image(image)
+            count = len(self.images)
+            if count >= min_images and self.is_stable():
+                print(f"Detection stable after {count} images")
+                break
+            if count >= max_images:
+                print(f"Detection not stable after {count} images")
+                break
+
+        if not self.images:
+            print("Error: No images provided")
+            return None, None
+        return self.images[0], self.final_boxes
+
     def set_images(self, images):
         self.images = images
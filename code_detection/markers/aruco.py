@@ -1,89 +1,23 @@
 import cv2
 import cv2.aruco as aruco
 import numpy as np
+from code_detection.markers.card_geometry import (
+    as_corner_array,
+    card_polygons,
+    perspective_card_polygons,
+)
 from code_detection.markers.keywords import get_keyword
 from settings import settings
 
 
 def transform_bounding_boxes(bboxs):
-    ARUCO_COORDS = np.array([[-1, 1], [1, 1], [1, -1], [-1, -1]], dtype=np.float32)
-    CARD_COORDS = np.array(
-        [[-1.3, 1.3], [8.2, 1.3], [8.2, -1.3], [-1.3, -1.3]], dtype=np.float32
-    )
-
-    transformed_bboxs = []
-
-    for bbox in bboxs:
-        pixel_coords = np.array(bbox, dtype=np.float32).reshape(
-            1, 4, 2
-        )
-
-        # Compute transformation matrix from pixel coordinates to ARUCO_COORDS
-        transform_matrix = cv2.getPerspectiveTransform(
-            pixel_coords.reshape(4, 2), ARUCO_COORDS
-        )
-
-        # Compute inverse transformation matrix
-        inverse_matrix = np.linalg.inv(transform_matrix)
-
-        # Transform CARD_COORDS to new pixel coordinates
-        new_bbox = cv2.perspectiveTransform(
-            CARD_COORDS.reshape(1, 4, 2), inverse_matrix
-        )
-
-        transformed_bboxs.append(new_bbox)
-
-    return transformed_bboxs
-
-
-import numpy as np
-import cv2
+    # One homography per marker, solved for all markers together
+    return list(perspective_card_polygons(bboxs)[:, None])
 
 
 def transform_bounding_boxes_simple(bboxes, ignore=[]):
-    transformed_bboxes = []
-
-    for index, bbox in enumerate(bboxes):
-        if index in ignore:
-            transformed_bboxes.append(bbox)
-            continue
-
-        bbox = np.array(bbox, dtype=np.float32).reshape(4, 2)
-        if bbox.shape != (4, 2):
-            raise ValueError("Each bounding box must have 4 corner points (x, y).")
-
-        top_vector = (bbox[1] - bbox[0]) / 2
-        bottom_vector = (bbox[2] - bbox[3]) / 2
-        # Calculate the average horizontal vector
-        horizontal_vector = (top_vector + bottom_vector) / 2
-
-        left_vector = (bbox[3] - bbox[0]) / 2
-        right_vector = (bbox[2] - bbox[1]) / 2
-        # Calculate the average vertical vector
-        vertical_vector = (left_vector + right_vector) / 2
-
-        # Find the new corner points of the bounding box
-        top_left = bbox[0] - 0.3 * horizontal_vector - 0.3 * vertical_vector
-        top_right = top_left + 10 * horizontal_vector
-        bottom_left = top_left + 2.6 * vertical_vector
-        bottom_right = top_right + 2.6 * vertical_vector
-
-        # Construct the new bounding box
-        new_bbox = np.array(
-            [
-                [
-                    [top_left[0], top_left[1]],
-                    [top_right[0], top_right[1]],
-                    [bottom_right[0], bottom_right[1]],
-                    [bottom_left[0], bottom_left[1]],
-                ]
-            ],
-            dtype=np.float32,
-        )
-
-        transformed_bboxes.append(new_bbox)
-
-    return transformed_bboxes
+    # Card polygons for all markers in one vectorised pass
+    return list(card_polygons(bboxes, ignore)[:, None])
 
 
 # ArUco marker detection function
@@ -103,40 +37,36 @@ def detect_aruco_markers(image, dictionary=cv2.aruco.DICT_4X4_50):
     return image, corners, ids
 
 
-# Function to create a mask for ArUco markers
-def create_aruco_mask(image, bboxs, buffer=10):
-    mask = np.zeros(
-        image.shape[:2], dtype=np.uint8
-    )  # Create a blank mask of the same size as the image
+def marker_rectangles(image_shape, bboxs, buffer=10):
+    """Bounding rectangles of all markers, with a buffer, clipped to the image.
 
-    if bboxs is None:
-        return mask
+    Returns an (N, 4) int array of x_min, y_min, x_max, y_max.
+    """
+    if bboxs is None or len(bboxs) == 0:
+        return np.zeros((0, 4), dtype=np.int32)
 
-    for i in range(len(bboxs)):
-        box = bboxs[i][0]
-
-        # Convert box points to integers
-        box = np.int32(box)
+    corners = np.int32(as_corner_array(bboxs))
+    rectangles = np.concatenate(
+        [corners.min(axis=1) - buffer, corners.max(axis=1) + buffer], axis=1
+    )
 
-        # Create a bounding rectangle around the marker (with buffer)
-        x_min = min(box[:, 0]) - buffer
-        x_max = max(box[:, 0]) + buffer
-        y_min = min(box[:, 1]) - buffer
-        y_max = max(box[:, 1]) + buffer
+    # Ensure the coordinates are within the image bounds
+    height, width = image_shape[:2]
+    np.clip(rectangles, 0, [width, height, width, height], out=rectangles)
+    return rectangles
 
-        # Ensure the coordinates are within the image bounds
-        x_min = max(0, x_min)
-        x_max = min(image.shape[1], x_max)
-        y_min = max(0, y_min)
-        y_max = min(image.shape[0], y_max)
 
-        # Convert to integers to ensure proper indexing
-        x_min = int(x_min)
-        x_max = int(x_max)
-        y_min = int(y_min)
-        y_max = int(y_max)
+# Function to create a mask for ArUco markers
+def create_aruco_mask(image, bboxs, buffer=10, out=None):
+    # Reuse out as the mask if given, otherwise create a blank mask
+    if out is None or out.shape != image.shape[:2]:
+        mask = np.zeros(image.shape[:2], dtype=np.uint8)
+    else:
+        mask = out
+        mask.fill(0)
 
-        # Fill the region in the mask
+    # Fill the rectangle of each marker
+    for x_min, y_min, x_max, y_max in marker_rectangles(image.shape, bboxs, buffer):
         mask[y_min:y_max, x_min:x_max] = 255
 
     return mask
@@ -0,0 +1,129 @@
+import numpy as np
+
+# Marker and card corners in marker units, the marker spans -1 to 1
+ARUCO_COORDS = np.array([[-1, 1], [1, 1], [1, -1], [-1, -1]], dtype=np.float32)
+CARD_COORDS = np.array(
+    [[-1.3, 1.3], [8.2, 1.3], [8.2, -1.3], [-1.3, -1.3]], dtype=np.float32
+)
+
+
+def as_corner_array(bboxes):
+    """Stack marker corners from detectMarkers (or similar) into an (N, 4, 2) array."""
+    if len(bboxes) == 0:
+        return np.zeros((0, 4, 2), dtype=np.float32)
+    return np.asarray(bboxes, dtype=np.float32).reshape(-1, 4, 2)
+
+
+def card_polygons(bboxes, ignore=()):
+    """Card polygons for all markers at once, from the marker edge vectors.
+
+    Vectorised equivalent of transform_bounding_boxes_simple. Markers whose
+    index is in ignore keep their own corners. Returns an (N, 4, 2) array.
+    """
+    corners = as_corner_array(bboxes)
+
+    top_vector = (corners[:, 1] - corners[:, 0]) / 2
+    bottom_vector = (corners[:, 2] - corners[:, 3]) / 2
+    # Average horizontal vector of each marker
+    horizontal_vector = (top_vector + bottom_vector) / 2
+
+    left_vector = (corners[:, 3] - corners[:, 0]) / 2
+    right_vector = (corners[:, 2] - corners[:, 1]) / 2
+    # Average vertical vector of each marker
+    vertical_vector = (left_vector + right_vector) / 2
+
+    top_left = corners[:, 0] - 0.3 * horizontal_vector - 0.3 * vertical_vector
+    top_right = top_left + 10 * horizontal_vector
+    bottom_left = top_left + 2.6 * vertical_vector
+    bottom_right = top_right + 2.6 * vertical_vector
+
+    cards = np.stack([top_left, top_right, bottom_right, bottom_left], axis=1)
+    cards = cards.astype(np.float32, copy=False)
+    if len(ignore) > 0:
+        ignore = np.asarray(list(ignore), dtype=int)
+        cards[ignore] = corners[ignore]
+    return cards
+
+
+def perspective_card_polygons(bboxes):
+    """Card polygons for all markers at once, using each marker's homography.
+
+    Vectorised equivalent of transform_bounding_boxes: every marker to
+    pixel homography is solved in one batched linear solve and applied to
+    the card corners. Returns an (N, 4, 2) array.
+    """
+    corners = as_corner_array(bboxes).astype(np.float64)
+    count = len(corners)
+    if count == 0:
+        return np.zeros((0, 4, 2), dtype=np.float32)
+
+    # Build the 8x8 system mapping marker units to pixels for every marker
+    x = ARUCO_COORDS[:, 0].astype(np.float64)
+    y = ARUCO_COORDS[:, 1].astype(np.float64)
+    u, v = corners[:, :, 0], corners[:, :, 1]
+    A = np.zeros((count, 8, 8))
+    A[:, 0:8:2, 0] = x
+    A[:, 0:8:2, 1] = y
+    A[:, 0:8:2, 2] = 1
+    A[:, 0:8:2, 6] = -u * x
+    A[:, 0:8:2, 7] = -u * y
+    A[:, 1:8:2, 3] = x
+    A[:, 1:8:2, 4] = y
+    A[:, 1:8:2, 5] = 1
+    A[:, 1:8:2, 6] = -v * x
+    A[:, 1:8:2, 7] = -v * y
+    b = corners.reshape(count, 8)
+
+    h = np.linalg.solve(A, b[..., None])[..., 0]
+    homographies = np.concatenate([h, np.ones((count, 1))], axis=1).reshape(
+        count, 3, 3
+    )
+
+    # Apply each homography to the card corners
+    card = np.concatenate([CARD_COORDS, np.ones((4, 1), dtype=np.float32)], axis=1)
+    projected = homographies @ card.T.astype(np.float64)
+    cards = (projected[:, :2] / projected[:, 2:3]).transpose(0, 2, 1)
+    return cards.astype(np.float32)
+
+
+def card_size(aruco_boxes):
+    """Width and height of a keyword card, measured from the first marker.
+
+    If the first box is already a card (much wider than tall) its size is
+    used directly, otherwise the raw marker is scaled to card proportions.
+    """
+    sample = np.asarray(aruco_boxes[0], dtype=np.float32).reshape(4, 2)
+    width = abs(sample[1][0] - sample[0][0])
+    height = abs(sample[2][1] - sample[1][1])
+
+    if width / height > 3.0:
+        return width, height
+    # A card is 10 by 2.6 marker units
+    return width * (10.0 / 2.0) * 0.8, height * (2.6 / 2.0)
+
+
+def text_boxes_to_cards(text_boxes, card_width, card_height):
+    """Card polygons around the keyword text of all boxes at once.
+
+    The text sits 6.1 units from the left edge of a 10 unit wide card and is
+    vertically centred. Returns an (M, 4, 2) array.
+    """
+    boxes = np.asarray(text_boxes, dtype=np.float64).reshape(-1, 4, 2)
+    centres = (boxes[:, 0] + boxes[:, 2]) / 2
+
+    left = centres[:, 0] - (6.1 / 10.0) * card_width
+    top = centres[:, 1] - (1.3 / 2.6) * card_height
+    right = left + card_width
+    bottom = top + card_height
+
+    cards = np.stack(
+        [
+            np.stack([left, top], axis=1),
+            np.stack([right, top], axis=1),
+            np.stack([right, bottom], axis=1),
+            np.stack([left, bottom], axis=1),
+        ],
+        axis=1,
+    )
+    return cards.astype(np.float32)
+
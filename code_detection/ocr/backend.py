@@ -0,0 +1,170 @@
+import threading
+from contextlib import nullcontext
+from typing import ContextManager, List, NamedTuple, Protocol, Sequence, Tuple
+import cv2
+import numpy as np
+
+# Guards the lazy creation of each backend's inference lock
+_inference_locks_lock = threading.Lock()
+
+
+class OCRResult(NamedTuple):
+    """Text found in one image.
+
+    boxes is an (N, 4, 2) float32 array of corners ordered top-left,
+    top-right, bottom-right, bottom-left, with matching texts and
+    confidences (0-1).
+    """
+
+    boxes: np.ndarray
+    texts: List[str]
+    confidences: np.ndarray
+
+    @classmethod
+    def empty(cls):
+        return cls(np.zeros((0, 4, 2), dtype=np.float32), [], np.zeros(0, np.float32))
+
+
+class OCRBackend(Protocol):
+    """Interface shared by all OCR engines. Images are BGR numpy arrays."""
+
+    name: str
+    lock: ContextManager  # Held around inference by threads sharing a backend
+
+    def detect(self, images: Sequence[np.ndarray]) -> List[np.ndarray]:
+        """Find text boxes, returning an (N, 4, 2) array per image."""
+        ...
+
+    def recognise(self, crops: Sequence[np.ndarray]) -> Tuple[List[str], np.ndarray]:
+        """Read the text in each cropped box, returning texts and confidences."""
+        ...
+
+    def detect_and_recognise(self, images: Sequence[np.ndarray]) -> List[OCRResult]:
+        """Find and read all text, returning an OCRResult per image."""
+        ...
+
+
+def to_boxes(boxes):
+    """Convert a list of 4-point boxes to an (N, 4, 2) float32 array."""
+    if boxes is None or len(boxes) == 0:
+        return np.zeros((0, 4, 2), dtype=np.float32)
+    return np.asarray(boxes, dtype=np.float32).reshape(-1, 4, 2)
+
+
+def rect_to_box(x_min, y_min, x_max, y_max):
+    """Convert an axis-aligned rectangle to 4 corner points."""
+    return [[x_min, y_min], [x_max, y_min], [x_max, y_max], [x_min, y_max]]
+
+
+def crop_box(image, box):
+    """Cut a (possibly rotated) box out of an image as an upright crop."""
+    box = np.asarray(box, dtype=np.float32).reshape(4, 2)
+    width = int(max(np.linalg.norm(box[1] - box[0]), np.linalg.norm(box[2] - box[3])))
+    height = int(max(np.linalg.norm(box[3] - box[0]), np.linalg.norm(box[2] - box[1])))
+    width, height = max(width, 1), max(height, 1)
+
+    dst = np.array(
+        [[0, 0], [width - 1, 0], [width - 1, height - 1], [0, height - 1]],
+        dtype=np.float32,
+    )
+    H = cv2.getPerspectiveTransform(box, dst)
+    return cv2.warpPerspective(
+        image, H, (width, height), borderMode=cv2.BORDER_REPLICATE
+    )
+
+
+class BaseOCRBackend:
+    """Default batch behaviour for backends built from detect and recognise.
+
+    OCR engines generally cannot run inference on two threads at once, so
+    callers sharing a backend between threads hold its lock around each
+    call. Backends that are safe to share set thread_safe.
+    """
+
+    name = "base"
+    thread_safe = False
+
+    @property
+    def lock(self):
+        """Lock serialising inference on this instance."""
+        if self.thread_safe:
+            return nullcontext()
+        with _inference_locks_lock:
+            return self.__dict__.setdefault("_inference_lock", threading.Lock())
+
+    def detect(self, images):
+        raise NotImplementedError(f"{self.name} does not support text detection")
+
+    def recognise(self, crops):
+        raise NotImplementedError(f"{self.name} does not support text recognition")
+
+    def detect_and_recognise(self, images):
+        results = []
+        for image, boxes in zip(images, self.detect(images)):
+            if len(boxes) == 0:
+                results.append(OCRResult.empty())
+                continue
+            crops = [crop_box(image, box) for box in boxes]
+            texts, confidences = self.recognise(crops)
+            results.append(OCRResult(boxes, list(texts), confidences))
+        return results
+
+
+class CompositeBackend(BaseOCRBackend):
+    """Find text with one engine and read it with another."""
+
+    thread_safe = True  # Each engine is locked on its own
+
+    def __init__(self, detector, recogniser):
+        self.detector = detector
+        self.recogniser = recogniser
+        self.name = f"{detector.name}+{recogniser.name}"
+
+    def detect(self, images):
+        with self.detector.lock:
+            return self.detector.detect(images)
+
+    def recognise(self, crops):
+        with self.recogniser.lock:
+            return self.recogniser.recognise(crops)
+
+
+def _mean_colour(image):
+    # Mean colour truncated to whole values, as np.full into uint8 would
+    channels = 1 if image.ndim == 2 else image.shape[2]
+    return tuple(int(value) for value in cv2.mean(image)[:channels])
+
+
+def _copy_into(image, out):
+    # Reuse out as the destination if it has the right shape and type
+    if out is None or out.shape != image.shape or out.dtype != image.dtype:
+        return image.copy()
+    np.copyto(out, image)
+    return out
+
+
+def blend_mask(image, mask, out=None):
+    """Fill masked regions of an image with its mean colour.
+
+    The result is written into out if given, so a buffer can be reused
+    between frames.
+    """
+    colour = _mean_colour(image)
+    blended_image = _copy_into(image, out)
+    blended_image[mask == 255] = colour
+    return blended_image
+
+
+def blend_rectangles(image, rectangles, out=None):
+    """Fill rectangles (x_min, y_min, x_max, y_max) with the image's mean colour.
+
+    Like blend_mask for rectangular regions, but the rectangles are filled in
+    place and no full size mask is needed. The max edges are exclusive, as in
+    slicing.
+    """
+    colour = _mean_colour(image)
+    blended_image = _copy_into(image, out)
+    # Each rectangle is filled separately, so overlapping ones stay filled
+    for x_min, y_min, x_max, y_max in rectangles:
+        blended_image[max(y_min, 0) : y_max, max(x_min, 0) : x_max] = colour
+    return blended_image
@@ -1,10 +1,56 @@
 import cv2
 import cv2.aruco as aruco
 import numpy as np
-import easyocr
+from code_detection.ocr.backend import BaseOCRBackend, OCRResult, rect_to_box, to_boxes
+from code_detection.ocr.registry import get_backend
 
-# Initialize EasyOCR reader
-reader = easyocr.Reader(['en'])
+
+class EasyOCRBackend(BaseOCRBackend):
+    name = "easyocr"
+
+    def __init__(self):
+        import easyocr
+
+        self.reader = easyocr.Reader(["en"])
+
+    def detect(self, images):
+        boxes = []
+        for image in images:
+            horizontal_list, free_list = self.reader.detect(image)
+            image_boxes = [
+                rect_to_box(x_min, y_min, x_max, y_max)
+                for x_min, x_max, y_min, y_max in horizontal_list[0]
+            ]
+            image_boxes.extend(free_list[0])
+            boxes.append(to_boxes(image_boxes))
+        return boxes
+
+    def recognise(self, crops):
+        texts = []
+        confidences = []
+        for crop in crops:
+            gray_crop = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+            # Read the whole crop as a single line of text
+            height, width = gray_crop.shape
+            results = self.reader.recognize(
+                gray_crop, horizontal_list=[[0, width, 0, height]], free_list=[]
+            )
+            texts.append(" ".join(text for _, text, _ in results))
+            confidences.append(min((prob for _, _, prob in results), default=0.0))
+        return texts, np.array(confidences, dtype=np.float32)
+
+    def detect_and_recognise(self, images):
+        results = []
+        for image in images:
+            predictions = self.reader.readtext(image)
+            results.append(
+                OCRResult(
+                    to_boxes([bbox for bbox, _, _ in predictions]),
+                    [text for _, text, _ in predictions],
+                    np.array([prob for _, _, prob in predictions], dtype=np.float32),
+                )
+            )
+        return results
 
 # Function to detect handwritten text using EasyOCR
 def detect_easyocr_text(image, aruco_mask):
@@ -15,6 +61,7 @@ def detect_easyocr_text(image, aruco_mask):
     masked_image = cv2.bitwise_and(gray_image, gray_image, mask=~aruco_mask)
 
     # Perform OCR detection and recognition on the masked image
+    reader = get_backend("easyocr").reader
     results = reader.readtext(masked_image)
 
     # Draw bounding boxes and text on the image
@@ -31,6 +78,7 @@ def detect_easyocr_text(image, aruco_mask):
     return image, results
 
 def test_detection(image):
+    reader = get_backend("easyocr").reader
     results = reader.readtext(image)
     detected_text = ' '.join([result[1] for result in results])
     return detected_text
\ No newline at end of file
@@ -1,10 +1,43 @@
 import cv2
 import cv2.aruco as aruco
 import numpy as np
-import keras_ocr
+from code_detection.ocr.backend import BaseOCRBackend, OCRResult, to_boxes
+from code_detection.ocr.registry import get_backend
 
-# Initialize Keras-OCR pipeline
-pipeline = keras_ocr.pipeline.Pipeline()
+
+class KerasOCRBackend(BaseOCRBackend):
+    name = "kerasocr"
+
+    def __init__(self):
+        import keras_ocr
+
+        self.pipeline = keras_ocr.pipeline.Pipeline()
+
+    def detect(self, images):
+        # Keras-OCR expects RGB images and detects a whole batch at once
+        rgb_images = [cv2.cvtColor(image, cv2.COLOR_BGR2RGB) for image in images]
+        return [to_boxes(boxes) for boxes in self.pipeline.detector.detect(rgb_images)]
+
+    def recognise(self, crops):
+        texts = [
+            self.pipeline.recognizer.recognize(cv2.cvtColor(crop, cv2.COLOR_BGR2RGB))
+            for crop in crops
+        ]
+        # Keras-OCR does not report confidences
+        return texts, np.ones(len(texts), dtype=np.float32)
+
+    def detect_and_recognise(self, images):
+        rgb_images = [cv2.cvtColor(image, cv2.COLOR_BGR2RGB) for image in images]
+        results = []
+        for predictions in self.pipeline.recognize(rgb_images):
+            results.append(
+                OCRResult(
+                    to_boxes([box for _, box in predictions]),
+                    [text for text, _ in predictions],
+                    np.ones(len(predictions), dtype=np.float32),
+                )
+            )
+        return results
 
 # Function to detect handwritten text using Keras-OCR
 def detect_kerasocr_text(image, aruco_mask):
@@ -15,9 +48,12 @@ def detect_kerasocr_text(image, aruco_mask):
     masked_image = cv2.bitwise_and(rgb_image, rgb_image, mask=~aruco_mask)
 
     # Convert OpenCV image to a format compatible with Keras-OCR
+    import keras_ocr
+
     keras_image = keras_ocr.tools.read(masked_image)
 
     # Perform OCR detection and recognition on the masked image
+    pipeline = get_backend("kerasocr").pipeline
     predictions = pipeline.recognize([keras_image])[0]
 
     # Draw bounding boxes and text on the image
@@ -35,6 +71,7 @@ def detect_kerasocr_text(image, aruco_mask):
 
 def test_detection(image):
     image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    pipeline = get_backend("kerasocr").pipeline
     predictions = pipeline.recognize([image_rgb])[0]
     detected_text = ' '.join([text for text, _ in predictions])
     return detected_text
\ No newline at end of file
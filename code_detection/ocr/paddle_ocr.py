@@ -1,41 +1,62 @@
 import cv2
 import cv2.aruco as aruco
 import numpy as np
-from paddleocr import PaddleOCR
-
-# Initialise PaddleOCR (with angle classification disabled)
-ocr = PaddleOCR(use_angle_cls=False, lang="en")
+from code_detection.ocr.backend import BaseOCRBackend, OCRResult, blend_mask, to_boxes
+from code_detection.ocr.registry import get_backend
+
+
+class PaddleOCRBackend(BaseOCRBackend):
+    name = "paddleocr"
+
+    def __init__(self):
+        from paddleocr import PaddleOCR
+
+        # Angle classification disabled, the board is always upright after warping
+        self.ocr = PaddleOCR(use_angle_cls=False, lang="en")
+
+    def detect(self, images):
+        boxes = []
+        for image in images:
+            # PaddleOCR is used with RGB images throughout this project
+            rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+            result = self.ocr.ocr(rgb_image, rec=False, cls=False)
+            boxes.append(to_boxes(result[0] if result else None))
+        return boxes
+
+    def recognise(self, crops):
+        if len(crops) == 0:
+            return [], np.zeros(0, dtype=np.float32)
+
+        # The text recogniser batches crops internally (rec_batch_num)
+        rgb_crops = [cv2.cvtColor(crop, cv2.COLOR_BGR2RGB) for crop in crops]
+        predictions, _ = self.ocr.text_recognizer(rgb_crops)
+        texts = [text for text, _ in predictions]
+        confidences = np.array([score for _, score in predictions], dtype=np.float32)
+        return texts, confidences
+
+    def detect_and_recognise(self, images):
+        results = []
+        for image in images:
+            rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+            lines = self.ocr.ocr(rgb_image, cls=False)
+            if not lines or not lines[0]:
+                results.append(OCRResult.empty())
+                continue
+            boxes = to_boxes([box for box, _ in lines[0]])
+            texts = [text for _, (text, _) in lines[0]]
+            confidences = np.array(
+                [score for _, (_, score) in lines[0]], dtype=np.float32
+            )
+            results.append(OCRResult(boxes, texts, confidences))
+        return results
 
 
 def detect_paddleocr_text(image, aruco_mask):
-    # Convert image to RGB (PaddleOCR expects RGB format)
-    rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-
-    # Mean colour of the image
-    mean_colour = np.mean(rgb_image, axis=(0, 1))
-
-    # Create a background image filled with the mean colour
-    background = np.full(rgb_image.shape, mean_colour, dtype=np.uint8)
-    
-    # Blend masked regions with the background (adjust alpha for transparency)
-    blended_image = rgb_image.copy()
-    blended_image[aruco_mask == 255] = (background[aruco_mask == 255]).astype(np.uint8)
-    
-    # Perform OCR on the blended image
-    results = ocr.ocr(blended_image, cls=True)
-
-    # # Draw bounding boxes and text on the image
-    # for line in results[0]:
-    #     box, text = line  # Unpack the bounding box and text (no confidence in this version)
+    # Blend masked regions with the mean colour of the image
+    blended_image = cv2.cvtColor(blend_mask(image, aruco_mask), cv2.COLOR_BGR2RGB)
 
-    #     startX, startY = int(box[0][0]), int(box[0][1])
-    #     endX, endY = int(box[2][0]), int(box[2][1])
-
-    #     # Draw rectangle around detected text
-    #     cv2.rectangle(image, (startX, startY), (endX, endY), (255, 0, 0), 2)
+    # Perform OCR on the blended image (PaddleOCR is loaded on first use)
+    ocr = get_backend("paddleocr").ocr
+    results = ocr.ocr(blended_image, cls=True)
 
-    #     # Put recognised text above the rectangle
-    #     cv2.putText(image, f"{text}", (startX, startY - 10),
-    #                 cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1, cv2.LINE_AA)
-        
     return image, results
@@ -1,10 +1,71 @@
 import cv2
 import cv2.aruco as aruco
 import numpy as np
-import pytesseract
+from code_detection.ocr.backend import BaseOCRBackend, OCRResult, rect_to_box, to_boxes
+from code_detection.ocr.registry import get_backend
+
+
+class TesseractBackend(BaseOCRBackend):
+    name = "pytesseract"
+
+    def __init__(self):
+        import pytesseract
+
+        # Optional: specify the path if tesseract is not in system variables
+        # pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+        self.pytesseract = pytesseract
+
+    def _read_words(self, image, config):
+        gray_image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        data = self.pytesseract.image_to_data(
+            gray_image, config=config, output_type=self.pytesseract.Output.DICT
+        )
+        # Keep words with a positive confidence (-1 marks layout-only entries)
+        return [
+            i
+            for i in range(len(data["text"]))
+            if float(data["conf"][i]) > 0 and data["text"][i].strip()
+        ], data
+
+    def detect(self, images):
+        return [result.boxes for result in self.detect_and_recognise(images)]
+
+    def recognise(self, crops):
+        texts = []
+        confidences = []
+        for crop in crops:
+            # Treat each crop as a single line of text
+            words, data = self._read_words(crop, r"--oem 3 --psm 7")
+            texts.append(" ".join(data["text"][i] for i in words))
+            confidences.append(
+                min((float(data["conf"][i]) / 100 for i in words), default=0.0)
+            )
+        return texts, np.array(confidences, dtype=np.float32)
+
+    def detect_and_recognise(self, images):
+        results = []
+        for image in images:
+            words, data = self._read_words(image, r"--oem 3 --psm 6")
+            boxes = [
+                rect_to_box(
+                    data["left"][i],
+                    data["top"][i],
+                    data["left"][i] + data["width"][i],
+                    data["top"][i] + data["height"][i],
+                )
+                for i in words
+            ]
+            results.append(
+                OCRResult(
+                    to_boxes(boxes),
+                    [data["text"][i] for i in words],
+                    np.array(
+                        [float(data["conf"][i]) / 100 for i in words], dtype=np.float32
+                    ),
+                )
+            )
+        return results
 
-# Configure pytesseract (optional: specify the path if not in system variables)
-# pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
 
 # Function to detect handwritten text using pytesseract
 def detect_pytesseract_text(image, aruco_mask):
@@ -15,6 +76,7 @@ def detect_pytesseract_text(image, aruco_mask):
     masked_image = cv2.bitwise_and(gray_image, gray_image, mask=~aruco_mask)
 
     # Perform OCR detection and recognition on the masked image
+    pytesseract = get_backend("pytesseract").pytesseract
     custom_config = r'--oem 3 --psm 6'  # Optimize for block text detection
     detected_text = pytesseract.image_to_data(masked_image, config=custom_config, output_type=pytesseract.Output.DICT)
 
@@ -35,6 +97,7 @@ def detect_pytesseract_text(image, aruco_mask):
     return image, detected_text
 
 def test_detection(image):
+    pytesseract = get_backend("pytesseract").pytesseract
     gray_image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
     detected_text = pytesseract.image_to_string(gray_image)
     return detected_text
\ No newline at end of file
@@ -0,0 +1,168 @@
+import threading
+from code_detection.ocr.backend import CompositeBackend
+from settings import settings
+
+
+# Backends are imported inside their factories so that importing the
+# registry never pulls in an OCR library
+
+
+def _create_paddleocr():
+    from code_detection.ocr.paddle_ocr import PaddleOCRBackend
+
+    return PaddleOCRBackend()
+
+
+def _create_easyocr():
+    from code_detection.ocr.easy_ocr import EasyOCRBackend
+
+    return EasyOCRBackend()
+
+
+def _create_kerasocr():
+    from code_detection.ocr.kerasocr import KerasOCRBackend
+
+    return KerasOCRBackend()
+
+
+def _create_pytesseract():
+    from code_detection.ocr.py_tesseract import TesseractBackend
+
+    return TesseractBackend()
+
+
+def _create_trocr():
+    from code_detection.ocr.trocr import TrOCRBackend
+
+    return TrOCRBackend()
+
+
+def _create_remote():
+    from code_detection.ocr.remote import RemoteOCRBackend
+
+    return RemoteOCRBackend(
+        settings["OCR_SERVER"], compress=settings["OCR_SERVER_COMPRESS"]
+    )
+
+
+# Factories for each OCR backend, only called the first time it is needed
+_factories = {
+    "paddleocr": _create_paddleocr,
+    "easyocr": _create_easyocr,
+    "kerasocr": _create_kerasocr,
+    "pytesseract": _create_pytesseract,
+    "trocr": _create_trocr,
+    "remote": _create_remote,
+}
+
+# Backends that can only read text, so need a detector in front of them
+_recognise_only = {"trocr"}
+
+_instances = {}
+_warm_up_threads = {}
+_lock = threading.Lock()
+
+# Held while a backend is being constructed, by name, so that loading one
+# backend never blocks lookups of another
+_construction_locks = {}
+
+
+def register_backend(name, factory, recognise_only=False):
+    """Register a factory that builds the OCR backend called name.
+
+    recognise_only backends can only be used as the second half of a
+    "detector+recogniser" name.
+    """
+    with _lock:
+        _factories[name] = factory
+        _instances.pop(name, None)
+        if recognise_only:
+            _recognise_only.add(name)
+        else:
+            _recognise_only.discard(name)
+
+
+def available_backends():
+    return sorted(_factories)
+
+
+def check_backend(name):
+    """Raise ValueError unless name can be used as the OCR_BACKEND setting."""
+    detector_name, _, recogniser_name = name.partition("+")
+    for part in filter(None, (detector_name, recogniser_name)):
+        if part not in _factories:
+            raise ValueError(f"Unknown OCR backend: {part}")
+    if detector_name in _recognise_only:
+        raise ValueError(
+            f"OCR backend '{detector_name}' cannot detect text, "
+            f"compose it with a detector, e.g. 'paddleocr+{detector_name}'"
+        )
+
+
+def get_backend(name=None):
+    """Return the OCR backend called name, constructing it on first use.
+
+    Defaults to the backend selected by the OCR_BACKEND setting, which is
+    checked with check_backend. A name of the form "detector+recogniser"
+    composes two backends. Concurrent callers wait for a single construction
+    rather than loading it twice.
+    """
+    if name is None:
+        name = settings["OCR_BACKEND"]
+        check_backend(name)
+
+    if "+" in name:
+        detector_name, recogniser_name = name.split("+", 1)
+        detector = get_backend(detector_name)
+        recogniser = get_backend(recogniser_name)
+        factory = lambda: CompositeBackend(detector, recogniser)
+    else:
+        factory = None
+
+    with _lock:
+        if name in _instances:
+            return _instances[name]
+        if factory is None:
+            if name not in _factories:
+                raise ValueError(f"Unknown OCR backend: {name}")
+            factory = _factories[name]
+        construction_lock = _construction_locks.setdefault(name, threading.Lock())
+
+    # Construct outside _lock, as loading a model can take a long time
+    with construction_lock:
+        with _lock:
+            if name in _instances:
+                return _instances[name]
+        instance = factory()
+        with _lock:
+            _instances[name] = instance
+        return instance
+
+
+def warm_up(name=None):
+    """Load the OCR backend in a background thread so it is ready by the first run.
+
+    Raises ValueError straight away if the backend cannot be used on its own.
+    """
+    if name is None:
+        name = settings["OCR_BACKEND"]
+    check_backend(name)
+
+    with _lock:
+        if name in _instances:
+            return None
+        thread = _warm_up_threads.get(name)
+        if thread is not None and thread.is_alive():
+            return thread
+
+        def load():
+            try:
+                get_backend(name)
+                print(f"OCR backend '{name}' loaded.")
+            except Exception as e:
+                print(f"Failed to load OCR backend '{name}': {e}")
+
+        thread = threading.Thread(target=load, daemon=True)
+        _warm_up_threads[name] = thread
+        thread.start()
+        return thread
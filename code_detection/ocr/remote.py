@@ -0,0 +1,74 @@
+import itertools
+import threading
+import numpy as np
+from code_detection.ocr.backend import BaseOCRBackend
+from code_detection.ocr.server import (
+    connect,
+    encode_images,
+    parse_address,
+    recv_message,
+    send_message,
+    server_authkey,
+)
+
+
+class RemoteOCRBackend(BaseOCRBackend):
+    """OCR backend that forwards requests to a shared OCR server.
+
+    Each thread gets its own connection, so concurrent Detector threads
+    are batched together by the server like separate clients. With
+    compress, images are sent PNG encoded, which is worth it over a
+    network but not to a server on the same machine.
+    """
+
+    name = "remote"
+    thread_safe = True  # Each thread has its own connection
+
+    def __init__(self, address="127.0.0.1:6010", authkey=None, compress=False):
+        self.address = parse_address(address) if isinstance(address, str) else address
+        self.authkey = authkey if authkey is not None else server_authkey()
+        self.compress = compress
+        self._local = threading.local()
+        self._request_ids = itertools.count()
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = connect(self.address, self.authkey)
+        return connection
+
+    def _request(self, kind, images=()):
+        request_id = next(self._request_ids)
+        try:
+            connection = self._connection()
+            send_message(
+                connection, (request_id, kind, encode_images(images, self.compress))
+            )
+            reply_id, result, error = recv_message(connection)
+        except (EOFError, OSError):
+            # Reconnect on the next request, e.g. after a server restart
+            connection = getattr(self._local, "connection", None)
+            if connection is not None:
+                connection.close()
+            self._local.connection = None
+            raise
+        if reply_id != request_id:
+            raise RuntimeError("OCR server reply does not match the request")
+        if error is not None:
+            raise RuntimeError(f"OCR server error: {error}")
+        return result
+
+    def detect(self, images):
+        return self._request("detect", images)
+
+    def recognise(self, crops):
+        if len(crops) == 0:
+            return [], np.zeros(0, dtype=np.float32)
+        return self._request("recognise", crops)
+
+    def detect_and_recognise(self, images):
+        return self._request("detect_and_recognise", images)
+
+    def metrics(self):
+        """The server's queue depth, batch size and latency metrics."""
+        return self._request("metrics")
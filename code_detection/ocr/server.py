@@ -0,0 +1,483 @@
+"""Shared OCR inference server for several pipeline instances.
+
+One process loads the OCR model and serves every classroom PC over a
+socket, so each machine no longer needs its own copy of the model.
+Requests arriving close together are gathered into one batch, up to
+max_batch images or crops, waiting at most max_delay after the first.
+Text detection and recognition run as separate stages when the backend
+supports it, so crops from every client are read in a single batch. Each
+client is served on its own thread, so a slow or silent client never holds
+up the others.
+
+    python -m code_detection.ocr.server --backend paddleocr --port 6010
+
+Pipelines use it by setting OCR_BACKEND to "remote" and OCR_SERVER to the
+server's host:port. Requests are pickled, so anyone who can connect can run
+code in the server. Both ends read a shared secret key from the
+OCR_SERVER_AUTHKEY environment variable. Without one the server only
+listens on a loopback address:
+
+    OCR_SERVER_AUTHKEY=<secret> python -m code_detection.ocr.server --host 0.0.0.0
+"""
+
+import argparse
+import hashlib
+import hmac
+import ipaddress
+import os
+import pickle
+import queue
+import socket
+import struct
+import threading
+import time
+from collections import Counter, deque
+from multiprocessing import AuthenticationError
+import cv2
+import numpy as np
+from code_detection.ocr.backend import OCRResult, crop_box
+
+DEFAULT_PORT = 6010
+
+# Seconds a new connection has to complete the key exchange
+HANDSHAKE_TIMEOUT = 5.0
+
+NONCE_BYTES = 32
+DIGEST_BYTES = hashlib.sha256().digest_size
+
+
+def parse_address(address):
+    """Turn "host:port" (or just "host") into a (host, port) tuple."""
+    host, _, port = address.rpartition(":")
+    if not host:
+        return port, DEFAULT_PORT
+    return host, int(port)
+
+
+def server_authkey():
+    """The shared key from OCR_SERVER_AUTHKEY, or None if it is not set."""
+    authkey = os.getenv("OCR_SERVER_AUTHKEY")
+    return authkey.encode() if authkey else None
+
+
+def is_loopback(host):
+    """Whether host only accepts connections from this machine."""
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, None)}
+    except OSError:
+        return False
+    return bool(addresses) and all(
+        ipaddress.ip_address(address).is_loopback for address in addresses
+    )
+
+
+def _recv_exactly(sock, size):
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:])
+        if count == 0:
+            raise EOFError("Connection closed")
+        received += count
+    return bytes(buffer)
+
+
+def send_message(sock, message):
+    """Send a pickled message with a length prefix."""
+    data = pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL)
+    sock.sendall(struct.pack("!Q", len(data)) + data)
+
+
+def recv_message(sock):
+    """Receive a message sent with send_message."""
+    (size,) = struct.unpack("!Q", _recv_exactly(sock, 8))
+    return pickle.loads(_recv_exactly(sock, size))
+
+
+def _digest(authkey, nonce):
+    return hmac.new(authkey, nonce, "sha256").digest()
+
+
+def accept_handshake(sock, authkey):
+    """Server side of the key exchange, each end proves it knows the key.
+
+    The server first sends b"N" if it has no key, otherwise b"A" and a
+    challenge. The client answers with its digest and its own challenge.
+    """
+    if authkey is None:
+        sock.sendall(b"N")
+        return
+    nonce = os.urandom(NONCE_BYTES)
+    sock.sendall(b"A" + nonce)
+    reply = _recv_exactly(sock, DIGEST_BYTES + NONCE_BYTES)
+    if not hmac.compare_digest(reply[:DIGEST_BYTES], _digest(authkey, nonce)):
+        raise AuthenticationError("client key does not match")
+    sock.sendall(_digest(authkey, reply[DIGEST_BYTES:]))
+
+
+def connect_handshake(sock, authkey):
+    """Client side of the key exchange, see accept_handshake."""
+    mode = _recv_exactly(sock, 1)
+    if mode == b"N":
+        if authkey is not None:
+            raise AuthenticationError("OCR server does not use OCR_SERVER_AUTHKEY")
+        return
+    if authkey is None:
+        raise AuthenticationError("OCR server needs OCR_SERVER_AUTHKEY to be set")
+    nonce = _recv_exactly(sock, NONCE_BYTES)
+    client_nonce = os.urandom(NONCE_BYTES)
+    sock.sendall(_digest(authkey, nonce) + client_nonce)
+    if not hmac.compare_digest(
+        _recv_exactly(sock, DIGEST_BYTES), _digest(authkey, client_nonce)
+    ):
+        raise AuthenticationError("OCR server key does not match")
+
+
+def connect(address, authkey):
+    """Open an authenticated connection to an OCR server."""
+    sock = socket.create_connection(address, timeout=HANDSHAKE_TIMEOUT)
+    try:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        connect_handshake(sock, authkey)
+    except BaseException:
+        sock.close()
+        raise
+    sock.settimeout(None)
+    return sock
+
+
+def encode_images(images, compress):
+    """Images as sent over the connection, optionally PNG compressed."""
+    if not compress:
+        return [np.ascontiguousarray(image) for image in images]
+    return [cv2.imencode(".png", image)[1].tobytes() for image in images]
+
+
+def decode_images(images):
+    return [
+        cv2.imdecode(np.frombuffer(image, np.uint8), cv2.IMREAD_UNCHANGED)
+        if isinstance(image, bytes)
+        else image
+        for image in images
+    ]
+
+
+class _Request:
+    def __init__(self, connection, request_id, kind, images):
+        self.connection = connection
+        self.request_id = request_id
+        self.kind = kind
+        self.images = images
+        self.enqueued = time.perf_counter()
+
+
+class _ClientConnection:
+    def __init__(self, sock):
+        self.sock = sock
+        self.send_lock = threading.Lock()
+
+    def send(self, message):
+        with self.send_lock:
+            try:
+                send_message(self.sock, message)
+            except OSError:
+                pass  # The client went away, nobody to tell
+
+
+class OCRServer:
+    """Serve an OCR backend to many clients with dynamic batching."""
+
+    def __init__(
+        self,
+        backend,
+        address=("127.0.0.1", DEFAULT_PORT),
+        authkey=None,
+        max_batch=16,
+        max_delay=0.02,
+        split_stages=True,
+    ):
+        self.backend = backend
+        self.address = address
+        self.authkey = authkey if authkey is not None else server_authkey()
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.split_stages = split_stages
+
+        self.pending = queue.Queue()
+        self.listener = None
+        self.backlog = 64
+        self.running = threading.Event()
+        self.threads = []
+
+        # Metrics
+        self.metrics_lock = threading.Lock()
+        self.request_count = 0
+        self.image_count = 0
+        self.crop_count = 0
+        self.batch_sizes = Counter()
+        self.max_queue_depth = 0
+        self.latencies = deque(maxlen=1000)
+        self.clients = 0
+
+    def start(self):
+        """Start serving on background threads and return immediately.
+
+        Raises ValueError if asked to listen beyond this machine without a key.
+        """
+        if self.authkey is None and not is_loopback(self.address[0]):
+            raise ValueError(
+                f"Refusing to serve OCR on {self.address[0]} without a key, "
+                "set OCR_SERVER_AUTHKEY or listen on 127.0.0.1"
+            )
+        family = socket.AF_INET6 if ":" in self.address[0] else socket.AF_INET
+        self.listener = socket.create_server(
+            self.address, family=family, backlog=self.backlog
+        )
+        # Wake regularly to notice stop
+        self.listener.settimeout(0.5)
+        self.address = self.listener.getsockname()[:2]
+        self.running.set()
+        for target in (self._accept_loop, self._batch_loop):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        print(f"OCR server for '{self.backend.name}' listening on {self.address}")
+        return self
+
+    def serve_forever(self):
+        self.start()
+        try:
+            while self.running.is_set():
+                time.sleep(0.5)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def stop(self):
+        if not self.running.is_set():
+            return
+        self.running.clear()
+        self.pending.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.listener.close()
+
+    def metrics(self):
+        """Queue depth, batch size and latency figures since the server started."""
+        with self.metrics_lock:
+            batches = sum(self.batch_sizes.values())
+            items = sum(size * count for size, count in self.batch_sizes.items())
+            latencies = np.array(self.latencies) * 1000
+            return {
+                "backend": self.backend.name,
+                "clients": self.clients,
+                "requests": self.request_count,
+                "images": self.image_count,
+                "crops": self.crop_count,
+                "batches": batches,
+                "mean_batch_size": items / batches if batches else 0.0,
+                "batch_sizes": dict(sorted(self.batch_sizes.items())),
+                "queue_depth": self.pending.qsize(),
+                "max_queue_depth": self.max_queue_depth,
+                "p50_latency_ms": float(np.percentile(latencies, 50))
+                if len(latencies)
+                else 0.0,
+                "p95_latency_ms": float(np.percentile(latencies, 95))
+                if len(latencies)
+                else 0.0,
+            }
+
+    def _accept_loop(self):
+        while self.running.is_set():
+            try:
+                sock, peer = self.listener.accept()
+            except socket.timeout:
+                continue
+            except OSError as e:
+                if self.running.is_set():
+                    print(f"OCR server failed to accept a connection: {e}")
+                continue
+            # The key exchange happens on the client's own thread, so a
+            # client that never answers cannot hold up the others
+            thread = threading.Thread(
+                target=self._serve_client, args=(sock, peer), daemon=True
+            )
+            thread.start()
+
+    def _serve_client(self, sock, peer):
+        try:
+            sock.settimeout(HANDSHAKE_TIMEOUT)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            accept_handshake(sock, self.authkey)
+            sock.settimeout(None)
+        except (OSError, EOFError, AuthenticationError) as e:
+            print(f"OCR server rejected a connection from {peer[0]}: {e}")
+            sock.close()
+            return
+
+        client = _ClientConnection(sock)
+        with self.metrics_lock:
+            self.clients += 1
+        try:
+            while self.running.is_set():
+                try:
+                    request_id, kind, images = recv_message(sock)
+                except (EOFError, OSError):
+                    return
+
+                if kind == "metrics":
+                    client.send((request_id, self.metrics(), None))
+                elif kind in ("detect", "recognise", "detect_and_recognise"):
+                    self.pending.put(
+                        _Request(client, request_id, kind, decode_images(images))
+                    )
+                    with self.metrics_lock:
+                        self.request_count += 1
+                        self.max_queue_depth = max(
+                            self.max_queue_depth, self.pending.qsize()
+                        )
+                else:
+                    client.send((request_id, None, f"Unknown request: {kind}"))
+        finally:
+            with self.metrics_lock:
+                self.clients -= 1
+            sock.close()
+
+    def _batch_loop(self):
+        while True:
+            request = self.pending.get()
+            if request is None:
+                return
+
+            # Gather more requests until the batch is full or the first
+            # request has waited max_delay
+            batch = [request]
+            size = len(request.images)
+            deadline = request.enqueued + self.max_delay
+            while size < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self.pending.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if request is None:
+                    self.pending.put(None)  # Stop after this batch
+                    break
+                batch.append(request)
+                size += len(request.images)
+
+            self._run_batch(batch)
+
+    def _run_batch(self, batch):
+        by_kind = {}
+        for request in batch:
+            by_kind.setdefault(request.kind, []).append(request)
+
+        for kind, requests in by_kind.items():
+            images = [image for request in requests for image in request.images]
+            try:
+                results = self._infer(kind, images)
+                error = None
+            except Exception as e:
+                results, error = None, f"{type(e).__name__}: {e}"
+
+            done = time.perf_counter()
+            with self.metrics_lock:
+                self.batch_sizes[len(images)] += 1
+                if kind == "recognise":
+                    self.crop_count += len(images)
+                else:
+                    self.image_count += len(images)
+                self.latencies.extend(done - request.enqueued for request in requests)
+
+            start = 0
+            for request in requests:
+                end = start + len(request.images)
+                if error is None:
+                    reply = results[start:end]
+                    if kind == "recognise":
+                        reply = (results[0][start:end], results[1][start:end])
+                else:
+                    reply = None
+                request.connection.send((request.request_id, reply, error))
+                start = end
+
+    def _infer(self, kind, images):
+        if kind == "detect":
+            return self.backend.detect(images)
+        if kind == "recognise":
+            texts, confidences = self.backend.recognise(images)
+            return list(texts), np.asarray(confidences, dtype=np.float32)
+        if self.split_stages:
+            try:
+                return self._detect_then_recognise(images)
+            except NotImplementedError:
+                # The backend only works end to end
+                self.split_stages = False
+        return self.backend.detect_and_recognise(images)
+
+    def _detect_then_recognise(self, images):
+        # Detect in every image, then read all the crops in one batch
+        all_boxes = self.backend.detect(images)
+        crops, owners = [], []
+        for index, (image, boxes) in enumerate(zip(images, all_boxes)):
+            crops.extend(crop_box(image, box) for box in boxes)
+            owners.extend([index] * len(boxes))
+        texts, confidences = self.backend.recognise(crops) if crops else ([], [])
+        with self.metrics_lock:
+            self.crop_count += len(crops)
+
+        owners = np.asarray(owners, dtype=int)
+        confidences = np.asarray(confidences, dtype=np.float32)
+        results = []
+        for index, boxes in enumerate(all_boxes):
+            if len(boxes) == 0:
+                results.append(OCRResult.empty())
+                continue
+            mask = owners == index
+            results.append(
+                OCRResult(
+                    boxes,
+                    [text for text, keep in zip(texts, mask) if keep],
+                    confidences[mask],
+                )
+            )
+        return results
+
+
+def main():
+    from code_detection.ocr.registry import get_backend
+
+    parser = argparse.ArgumentParser(description="Shared OCR inference server.")
+    parser.add_argument("--backend", default="paddleocr")
+    parser.add_argument(
+        "--host",
+        default="127.0.0.1",
+        help="address to listen on, anything but loopback needs OCR_SERVER_AUTHKEY",
+    )
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--max-batch", type=int, default=16)
+    parser.add_argument("--max-delay-ms", type=float, default=20.0)
+    parser.add_argument(
+        "--end-to-end",
+        action="store_true",
+        help="use the backend's own detect_and_recognise instead of batching crops",
+    )
+    args = parser.parse_args()
+
+    server = OCRServer(
+        get_backend(args.backend),
+        address=(args.host, args.port),
+        max_batch=args.max_batch,
+        max_delay=args.max_delay_ms / 1000,
+        split_stages=not args.end_to_end,
+    )
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,45 @@
 import cv2
 import cv2.aruco as aruco
 import numpy as np
-from transformers import TrOCRProcessor, VisionEncoderDecoderModel
 from PIL import Image
+from code_detection.ocr.backend import BaseOCRBackend
+from code_detection.ocr.registry import get_backend
 
-# Initialize TrOCR processor and model
-processor = TrOCRProcessor.from_pretrained("microsoft/trocr-base-handwritten")
-model = VisionEncoderDecoderModel.from_pretrained("microsoft/trocr-base-handwritten")
+
+class TrOCRBackend(BaseOCRBackend):
+    """Recognition only, compose with a detector (e.g. "paddleocr+trocr")."""
+
+    name = "trocr"
+
+    def __init__(self):
+        from transformers import TrOCRProcessor, VisionEncoderDecoderModel
+
+        self.processor = TrOCRProcessor.from_pretrained(
+            "microsoft/trocr-base-handwritten"
+        )
+        self.model = VisionEncoderDecoderModel.from_pretrained(
+            "microsoft/trocr-base-handwritten"
+        )
+
+    def recognise(self, crops):
+        if len(crops) == 0:
+            return [], np.zeros(0, dtype=np.float32)
+
+        pil_images = [
+            Image.fromarray(cv2.cvtColor(crop, cv2.COLOR_BGR2RGB)) for crop in crops
+        ]
+        pixel_values = self.processor(pil_images, return_tensors="pt").pixel_values
+        output = self.model.generate(
+            pixel_values, output_scores=True, return_dict_in_generate=True
+        )
+        texts = self.processor.batch_decode(output.sequences, skip_special_tokens=True)
+
+        # Confidence is the mean token probability of each decoded sequence
+        scores = self.model.compute_transition_scores(
+            output.sequences, output.scores, normalize_logits=True
+        )
+        confidences = scores.exp().mean(dim=1).cpu().numpy().astype(np.float32)
+        return texts, confidences
 
 # Function to detect handwritten text using TrOCR
 def detect_trocr_text(image, aruco_mask):
@@ -20,6 +53,8 @@ def detect_trocr_text(image, aruco_mask):
     pil_image = Image.fromarray(masked_image)
 
     # Perform OCR detection using TrOCR
+    backend = get_backend("trocr")
+    processor, model = backend.processor, backend.model
     pixel_values = processor(pil_image, return_tensors="pt").pixel_values
     generated_ids = model.generate(pixel_values)
     recognized_text = processor.batch_decode(generated_ids, skip_special_tokens=True)[0]
@@ -35,6 +70,8 @@ def test_detection(image):
     pil_image = Image.fromarray(image)  # Assuming image is a NumPy array
     
     # Preprocess the image and convert it to tensor format
+    backend = get_backend("trocr")
+    processor, model = backend.processor, backend.model
     pixel_values = processor(pil_image, return_tensors="pt").pixel_values
     
     # Generate text from the image using the model
@@ -6,28 +6,35 @@ import traceback
 
 
 def get_overall_bounds(bounds: List[List[Tuple[int, int]]]):
-    flat_bounds = []
-
+    # Collect the points of every non-empty box, including the (4, 2)
+    # corner arrays of BoxSet tokens
+    points = []
     for box in bounds:
-        # Ensure box is a list or tuple and has at least one valid point
-        if isinstance(box, (list, tuple)) and len(box) > 0:
-            for point in box:
-                if (
-                    isinstance(point, (list, tuple))
-                    and len(point) == 2
-                    and all(isinstance(coord, (int, float)) for coord in point)
-                ):
-                    flat_bounds.append(point)
-
-    if not flat_bounds:
+        if isinstance(box, np.ndarray):
+            if box.ndim == 2 and box.shape[1] == 2:
+                points.append(box)
+        elif isinstance(box, (list, tuple)) and len(box) > 0:
+            valid = [
+                point
+                for point in box
+                if isinstance(point, (list, tuple, np.ndarray))
+                and len(point) == 2
+                and all(isinstance(coord, (int, float, np.number)) for coord in point)
+            ]
+            if valid:
+                points.append(np.asarray(valid, dtype=np.float64))
+
+    if not points:
         return [(0, 0), (0, 0), (0, 0), (0, 0)]
 
-    xs, ys = zip(*flat_bounds)
+    points = np.concatenate(points)
+    min_x, min_y = points.min(axis=0).tolist()
+    max_x, max_y = points.max(axis=0).tolist()
     return [
-        (min(xs), min(ys)),
-        (max(xs), min(ys)),
-        (max(xs), max(ys)),
-        (min(xs), max(ys)),
+        (min_x, min_y),
+        (max_x, min_y),
+        (max_x, max_y),
+        (min_x, max_y),
     ]
 
 
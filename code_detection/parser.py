@@ -1,9 +1,43 @@
 from code_detection.parse_code import parse_code
+from code_detection.astnodes.argument import Argument
+from code_detection.astnodes.expr import Expr
+from code_detection.astnodes.node import Node
 import unicodedata
 from typing import Dict
 import re
 
 
+def _child_statements(node):
+    # Statement-like children of a node, in the order they are printed
+    children = []
+    pending = list(vars(node).values())
+    while pending:
+        value = pending.pop(0)
+        if isinstance(value, (list, tuple)):
+            pending[:0] = value
+        elif isinstance(value, Node) and not isinstance(value, (Expr, Argument)):
+            children.append(value)
+    return children
+
+
+def line_bounds(node):
+    """Bounds of the innermost statement printed on each line of node's code."""
+    lines = node.python_print().rstrip().split("\n")
+    bounds = [node.bounds] * len(lines)
+    start = 0
+    for child in _child_statements(node):
+        child_lines = child.python_print().rstrip().split("\n")
+        child_lines = [line.strip() for line in child_lines]
+        # Children are printed in order, indented inside their parent
+        for i in range(start, len(lines) - len(child_lines) + 1):
+            window = [line.strip() for line in lines[i : i + len(child_lines)]]
+            if window == child_lines:
+                bounds[i : i + len(child_lines)] = line_bounds(child)
+                start = i + len(child_lines)
+                break
+    return bounds
+
+
 class Parser:
     def __init__(self, tokens):
         self.tokens = tokens
@@ -11,6 +45,7 @@ class Parser:
         self.python_code = None
         self.error_message = None
         self.error_box = None
+        self.line_bounds = []  # Board bounds of each line of python_code
 
     def normalise_python_code(self, ocr_code: str) -> str:
         """Normalise Python code extracted from OCR text."""
@@ -133,4 +168,5 @@ class Parser:
         if self.python_code is None:
             return self.program, None, "Error: Character normalisation failed", None
 
+        self.line_bounds = line_bounds(self.program)
         return self.program, self.python_code, None, None
@@ -1,5 +1,6 @@
 from collections import deque
 import numpy as np
+from code_detection.boxset import as_boxset
 
 
 class Tokeniser:
@@ -10,15 +11,12 @@ class Tokeniser:
 
     def convert_boxes_to_tokens(self):
         tokens = deque()
-        lines = []  # List of lines, each line is a list of (text, coordinates)
+        lines = []  # List of lines, each line is a list of box indices
+        line_centres = []  # Vertical centres of the boxes in each line
 
-        # Process each text box
-        for item in self.boxes:
-            coordinates = item[0]  # Bounding box (numpy array of shape (4,2))
-            text = item[1]  # Extract the text directly (string)
-
-            # Filter out unwanted labels
-            if text in [
+        # Filter out unwanted labels
+        boxes = as_boxset(self.boxes).with_texts(
+            [
                 "PYTHON",
                 "RESULTS",
                 "Bottom Left",
@@ -26,95 +24,60 @@ class Tokeniser:
                 "Top Right",
                 "Top Left",
                 "UNKNOWN",
-            ]:
-                continue
-
-            # Calculate the height of the bounding box
-            height = max(point[1] for point in coordinates) - min(
-                point[1] for point in coordinates
-            )
+            ],
+            exclude=True,
+        )
 
-            # Calculate the vertical centre of the bounding box
-            top_y = min(point[1] for point in coordinates)
-            bottom_y = max(point[1] for point in coordinates)
-            centre_y = (top_y + bottom_y) / 2  # Vertical centre
+        # Vertical centre and dynamic line threshold of every box at once
+        centres_y = boxes.centres[:, 1]
+        thresholds = boxes.sizes[:, 1] * self.scale_factor
 
-            # Calculate the dynamic line threshold
-            line_threshold = height * self.scale_factor
+        # Process each text box
+        line_threshold = 0
+        for i in range(len(boxes)):
+            centre_y = centres_y[i]
+            line_threshold = thresholds[i]
 
             # Find the most appropriate line for the current box
             best_line = None
-            for i, line in enumerate(lines):
-                line_centre_y = np.mean(
-                    [
-                        (
-                            (min(pt[1] for pt in box[1]) + max(pt[1] for pt in box[1]))
-                            / 2
-                        )
-                        for box in line
-                    ]
-                )
-                if abs(centre_y - line_centre_y) <= line_threshold:
+            for line, centres in zip(lines, line_centres):
+                if abs(centre_y - np.mean(centres)) <= line_threshold:
                     best_line = line
                     break
 
             if best_line is not None:
-                best_line.append((text, coordinates))
+                best_line.append(i)
+                centres.append(centre_y)
             else:
-                lines.append([(text, coordinates)])
+                lines.append([i])
+                line_centres.append([centre_y])
 
         # Merge lines if necessary (when lines are too close)
         merged_lines = []
-        for line in lines:
+        merged_centres = []
+        for line, centres in zip(lines, line_centres):
             if (
                 merged_lines
-                and abs(
-                    np.mean(
-                        [
-                            (
-                                (
-                                    min(pt[1] for pt in box[1])
-                                    + max(pt[1] for pt in box[1])
-                                )
-                                / 2
-                            )
-                            for box in line
-                        ]
-                    )
-                    - np.mean(
-                        [
-                            (
-                                (
-                                    min(pt[1] for pt in box[1])
-                                    + max(pt[1] for pt in box[1])
-                                )
-                                / 2
-                            )
-                            for box in merged_lines[-1]
-                        ]
-                    )
-                )
+                and abs(np.mean(centres) - np.mean(merged_centres[-1]))
                 <= line_threshold
             ):
                 merged_lines[-1].extend(line)
+                merged_centres[-1].extend(centres)
             else:
                 merged_lines.append(line)
+                merged_centres.append(centres)
 
         # Sort lines top-to-bottom
-        merged_lines.sort(
-            key=lambda line: np.mean(
-                [
-                    (min(pt[1] for pt in box[1]) + max(pt[1] for pt in box[1])) / 2
-                    for box in line
-                ]
-            )
+        order = sorted(
+            range(len(merged_lines)), key=lambda j: np.mean(merged_centres[j])
         )
 
         # Sort left-to-right and append to tokens
-        for line in merged_lines:
-            line.sort(key=lambda item: min(point[0] for point in item[1]))  # Sort by x
-            for token in line:
-                tokens.append(token)
+        lefts = boxes.mins[:, 0]
+        for j in order:
+            line = sorted(merged_lines[j], key=lambda i: lefts[i])  # Sort by x
+            for i in line:
+                tokens.append((boxes.texts[i], boxes.corners[i]))
             tokens.append(("LineBreak", []))  # Separate lines
 
         self.tokens = tokens
@@ -0,0 +1,80 @@
+import cv2
+from concurrent.futures import ProcessPoolExecutor
+from input.shared_frames import attach_pool, get_pool
+from settings import settings
+
+# The Detector of each worker process, created by _init_worker
+_detector = None
+
+
+def _init_worker(pool_spec, lock, worker_settings, aruco_dict_type):
+    global _detector
+    from code_detection.detector import Detector
+
+    settings.update(worker_settings)
+    cv2.setNumThreads(1)
+    attach_pool(pool_spec, lock)
+    _detector = Detector([], aruco_dict_type)
+
+
+def _detect(handle, image_id):
+    pool = get_pool(handle)
+    try:
+        return _detector.detect_from_image(pool.view(handle), image_id)
+    finally:
+        pool.release(handle)
+
+
+class DetectionWorkers:
+    """Process pool running Detector.detect_from_image on shared frames.
+
+    Frames live in a SharedFramePool and only their handles are sent to the
+    workers, so the cost of handing a frame over does not depend on its
+    size. Each task holds its own reference to the frame until it finishes.
+    The boxes found are small and are pickled back.
+    """
+
+    def __init__(
+        self, frame_pool, processes=2, aruco_dict_type=cv2.aruco.DICT_6X6_50
+    ):
+        self.frame_pool = frame_pool
+        self.executor = ProcessPoolExecutor(
+            max_workers=processes,
+            initializer=_init_worker,
+            initargs=(
+                frame_pool.spec(),
+                frame_pool.lock,
+                dict(settings),
+                aruco_dict_type,
+            ),
+        )
+
+    def submit(self, handle, image_id):
+        """Start detection on one frame, returning a future of its BoxSet."""
+        self.frame_pool.retain(handle)
+        try:
+            return self.executor.submit(_detect, handle, image_id)
+        except Exception:
+            self.frame_pool.release(handle)
+            raise
+
+    def detect(self, handles, cancel_event=None):
+        """BoxSets of every frame, in order.
+
+        Returns None if cancel_event is set before every frame is done. Frames
+        not yet started are then dropped.
+        """
+        futures = [self.submit(handle, i) for i, handle in enumerate(handles)]
+        results = []
+        for future in futures:
+            if cancel_event is not None and cancel_event.is_set():
+                for handle, pending in zip(handles, futures):
+                    # A cancelled task never runs, so give back its reference
+                    if pending.cancel():
+                        self.frame_pool.release(handle)
+                return None
+            results.append(future.result())
+        return results
+
+    def shutdown(self):
+        self.executor.shutdown(cancel_futures=True)
@@ -9,11 +9,18 @@ from settings import settings
 
 
 class Executor:
-    def __init__(self, whiteboard_code):
+    def __init__(self, whiteboard_code, line_bounds=None):
+        """line_bounds optionally gives the board bounds of each whiteboard
+        code line (see Parser.line_bounds), used to set error_box."""
         self.whiteboard_code = whiteboard_code
+        self.line_bounds = line_bounds or []
         self.helper_code = settings.get("HELPER_CODE", "")
         self.output = None
         self.error_message = None
+        self.error_box = None
+        self.full_code = None
+        self.code_object = None
+        self.line_origins = []
 
     def _detect_inserts(self):
         """Detects occurrences of # INSERT X in the helper code"""
@@ -29,68 +36,127 @@ class Executor:
         return insert_set
 
     def _split_whiteboard_code(self):
-        """Split the whiteboard code based on the # INSERT comments"""
+        """Split the whiteboard code based on the # INSERT comments.
+
+        Returns the segments and the whiteboard line number each one starts at.
+        """
         segments = {}
+        starts = {}
         current_key = ""
         current_segment = []
-        for line in self.whiteboard_code.splitlines():
+        current_start = 1
+        for line_number, line in enumerate(self.whiteboard_code.splitlines(), 1):
             if line.startswith("# INSERT"):
                 rest_of_line = line[len("# INSERT") :].strip()
                 next_key = rest_of_line if rest_of_line else ""
 
                 if current_segment:
                     segments[current_key] = "\n".join(current_segment)
+                    starts[current_key] = current_start
 
                 current_key = next_key
                 current_segment = []
+                current_start = line_number + 1
             else:
                 current_segment.append(line)
         if current_segment:
             segments[current_key] = "\n".join(current_segment)
+            starts[current_key] = current_start
+
+        return segments, starts
 
-        return segments
+    def _replace_with_indentation(self, insert_str, lines, whiteboard_code, start):
+        """Replace a line matching insert_str with properly-indented whiteboard code.
 
-    def _replace_with_indentation(self, insert_str, helper_code, whiteboard_code):
-        """Replace a line matching insert_str with properly-indented whiteboard code"""
-        lines = helper_code.splitlines(keepends=True)
+        lines is a list of (line, origin) pairs, where origin records the
+        helper or whiteboard line each line of the full program came from.
+        """
         new_lines = []
         inserted = False
 
-        for line in lines:
-            stripped_line = line.strip()
+        for line, origin in lines:
+            stripped_line = line.strip().replace("#INSERT", "# INSERT")
             if not inserted and stripped_line == insert_str.strip():
                 indent = line[: len(line) - len(line.lstrip())]
-                for w_line in whiteboard_code.splitlines():
+                for offset, w_line in enumerate(whiteboard_code.splitlines()):
+                    w_origin = ("whiteboard", start + offset)
                     if w_line.strip():
-                        new_lines.append(indent + w_line + "\n")
+                        new_lines.append((indent + w_line + "\n", w_origin))
                     else:
-                        new_lines.append("\n")
+                        new_lines.append(("\n", w_origin))
                 inserted = True
             else:
-                new_lines.append(line)
+                new_lines.append((line, origin))
 
-        return "".join(new_lines)
+        return new_lines
 
     def _insert_whiteboard_code(self):
         """Inserts the whiteboard code into the helper code at the # INSERT positions"""
-        segments = self._split_whiteboard_code()
+        segments, starts = self._split_whiteboard_code()
         insert_set = self._detect_inserts()
-        current_code = self.helper_code
+        lines = [
+            (line, ("helper", line_number))
+            for line_number, line in enumerate(
+                self.helper_code.splitlines(keepends=True), 1
+            )
+        ]
 
         for key in insert_set:
             insert_marker = "# INSERT" if key == "" else f"# INSERT {key}"
             if key in segments:
                 segment = segments[key]
-                current_code = self._replace_with_indentation(
-                    insert_marker, current_code, segment + "\n"
+                lines = self._replace_with_indentation(
+                    insert_marker, lines, segment + "\n", starts[key]
                 )
 
-        return current_code
+        self.line_origins = [origin for _, origin in lines]
+        return "".join(line for line, _ in lines)
+
+    def _describe_line(self, line_number):
+        """Describe where a line of the full program came from"""
+        if line_number is None or not 0 < line_number <= len(self.line_origins):
+            return "in the generated code"
+        source, source_line = self.line_origins[line_number - 1]
+        if source == "whiteboard":
+            lines = self.whiteboard_code.splitlines()
+            return f"on whiteboard line {source_line}: {lines[source_line - 1].strip()}"
+        return f"on line {source_line} of the helper code"
+
+    def _error_box(self, line_number):
+        """Board bounds of a line of the full program, if it is whiteboard code"""
+        if line_number is None or not 0 < line_number <= len(self.line_origins):
+            return None
+        source, source_line = self.line_origins[line_number - 1]
+        if source != "whiteboard" or source_line > len(self.line_bounds):
+            return None
+        return self.line_bounds[source_line - 1]
+
+    def validate(self):
+        """Compiles the full program without running it.
+
+        Returns None if it compiles, otherwise an error message pointing at
+        the offending whiteboard line, whose bounds are put in error_box. The
+        code object is kept for execute_locally.
+        """
+        self.full_code = self._insert_whiteboard_code()
+        self.code_object = None
+        self.error_box = None
+        try:
+            self.code_object = compile(self.full_code, "<whiteboard>", "exec")
+        except (SyntaxError, ValueError) as e:
+            line_number = getattr(e, "lineno", None)
+            message = getattr(e, "msg", str(e))
+            self.error_box = self._error_box(line_number)
+            return f"Error: Syntax error {self._describe_line(line_number)} ({message})"
+        return None
 
     def execute_locally(self):
         """Executes the code locally without sandboxing"""
-        # Combine the helper code and whiteboard code
-        full_code = self._insert_whiteboard_code()
+        # Combine the helper code and whiteboard code, reusing any validated code
+        if self.code_object is None:
+            self.error_message = self.validate()
+            if self.error_message is not None:
+                return None, self.error_message
         self.output = None
         self.error_message = None
 
@@ -99,7 +165,7 @@ class Executor:
         sys.stdout = output_capture
 
         try:
-            exec(full_code, {})
+            exec(self.code_object, {})
         except Exception as e:
             self.error_message = str(e)
 
@@ -112,10 +178,10 @@ class Executor:
         self.output = output_capture.getvalue()
         return self.output, None
 
-    def execute_in_sandbox(self):
-        """Executes the code in a Docker sandbox"""
-        # Combine the helper code and whiteboard code
-        full_code = self._insert_whiteboard_code()
+    def execute_in_sandbox(self, cancel_event=None):
+        """Executes the code in a Docker sandbox, stopping early if cancel_event is set"""
+        # Combine the helper code and whiteboard code, reusing any validated code
+        full_code = self.full_code or self._insert_whiteboard_code()
         full_code = full_code.replace('\"', '"').replace("\'", "'")
 
         self.output = None
@@ -135,7 +201,7 @@ class Executor:
             container_name = f"code-sandbox-{uuid.uuid4().hex[:8]}"
 
             # Build Docker run command
-            result = subprocess.run(
+            process = subprocess.Popen(
                 [
                     "docker",
                     "run",
@@ -160,10 +226,26 @@ class Executor:
                 text=True,
             )
 
+            # Wait for the container, checking regularly for cancellation
+            while True:
+                try:
+                    stdout, stderr = process.communicate(timeout=0.1)
+                    break
+                except subprocess.TimeoutExpired:
+                    if cancel_event is not None and cancel_event.is_set():
+                        subprocess.run(
+                            ["docker", "kill", container_name],
+                            stdout=subprocess.DEVNULL,
+                            stderr=subprocess.DEVNULL,
+                        )
+                        process.kill()
+                        process.communicate()
+                        raise Exception("Run cancelled")
+
             # Capture outputs
-            self.output = result.stdout
-            if result.returncode != 0:
-                self.error_message = result.stderr
+            self.output = stdout
+            if process.returncode != 0:
+                self.error_message = stderr
 
         except Exception as e:
             self.error_message = str(e)
@@ -0,0 +1,118 @@
+import queue
+import threading
+import traceback
+
+
+class RunCancelled(Exception):
+    pass
+
+
+class RunJob:
+    """Handle passed to a job function for reporting progress and cancellation."""
+
+    def __init__(self, job_id, messages):
+        self.job_id = job_id
+        self._messages = messages
+        self._cancelled = threading.Event()
+
+    @property
+    def cancel_event(self):
+        return self._cancelled
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def check_cancelled(self):
+        """Raise RunCancelled if the job has been cancelled."""
+        if self._cancelled.is_set():
+            raise RunCancelled()
+
+    def progress(self, message):
+        """Post a progress message back to the main loop."""
+        self._messages.put((self.job_id, "progress", message))
+
+
+class RunWorker(threading.Thread):
+    """Runs pipeline jobs in the background so the UI loop never blocks.
+
+    Jobs are functions taking a RunJob plus arguments. Progress, results and
+    errors are posted to a queue that the main loop drains with poll.
+    Messages from cancelled or superseded jobs are dropped.
+    """
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self._jobs = queue.Queue()
+        self._messages = queue.Queue()
+        self._current = None
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    @property
+    def busy(self):
+        with self._lock:
+            return self._current is not None
+
+    def submit(self, function, *args):
+        """Queue a job, cancelling any job that is still running."""
+        with self._lock:
+            if self._current is not None:
+                self._current.cancel()
+            self._next_id += 1
+            job = RunJob(self._next_id, self._messages)
+            self._current = job
+        self._jobs.put((job, function, args))
+        return job
+
+    def cancel(self):
+        """Cancel the current job, if any."""
+        with self._lock:
+            if self._current is not None:
+                self._current.cancel()
+                self._current = None
+
+    def stop(self):
+        self.cancel()
+        self._jobs.put(None)
+
+    def poll(self):
+        """Return (kind, payload) messages for the current job, oldest first.
+
+        kind is "progress", "result" or "error".
+        """
+        messages = []
+        while True:
+            try:
+                job_id, kind, payload = self._messages.get_nowait()
+            except queue.Empty:
+                return messages
+
+            with self._lock:
+                current = self._current
+                if current is None or current.job_id != job_id:
+                    continue
+                if kind in ("result", "error"):
+                    self._current = None
+            messages.append((kind, payload))
+
+    def run(self):
+        while True:
+            item = self._jobs.get()
+            if item is None:
+                return
+
+            job, function, args = item
+            if job.cancelled:
+                continue
+            try:
+                result = function(job, *args)
+                self._messages.put((job.job_id, "result", result))
+            except RunCancelled:
+                print(f"Run {job.job_id} cancelled.")
+            except Exception as e:
+                traceback.print_exc()
+                self._messages.put((job.job_id, "error", e))
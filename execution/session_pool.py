@@ -0,0 +1,198 @@
+import queue
+import threading
+import time
+import traceback
+from collections import deque
+import numpy as np
+from execution.run_worker import RunCancelled, RunJob
+
+
+class SessionWorker:
+    """One board session's view of a SessionPool.
+
+    It has the same submit, cancel, poll and busy interface as RunWorker, so
+    a session's main loop code is the same whether it has a worker thread
+    to itself or shares a pool. Submitting a job cancels the session's
+    previous job.
+    """
+
+    def __init__(self, pool, name):
+        self.pool = pool
+        self.name = name
+        self._messages = queue.Queue()
+        self._current = None  # Newest job, whose messages poll returns
+        self._pending = None  # (job, function, args, submit time) not yet started
+        self._running = None  # Job being run by a pool thread
+        self._next_id = 0
+
+        # Seconds waiting for a pool thread and running, per finished job
+        self.waits = deque(maxlen=100)
+        self.run_times = deque(maxlen=100)
+
+    @property
+    def busy(self):
+        with self.pool._cond:
+            return self._current is not None
+
+    def submit(self, function, *args):
+        """Queue a job, cancelling any job of this session still queued or running."""
+        with self.pool._cond:
+            if self._current is not None:
+                self._current.cancel()
+            self._next_id += 1
+            job = RunJob(self._next_id, self._messages)
+            self._current = job
+            self._pending = (job, function, args, time.perf_counter())
+            self.pool._mark_ready(self)
+        return job
+
+    def cancel(self):
+        """Cancel the current job, if any."""
+        with self.pool._cond:
+            if self._current is not None:
+                self._current.cancel()
+                self._current = None
+            self._pending = None
+
+    def stop(self):
+        self.cancel()
+
+    def poll(self):
+        """Return (kind, payload) messages for the current job, oldest first.
+
+        kind is "progress", "result" or "error".
+        """
+        messages = []
+        while True:
+            try:
+                job_id, kind, payload = self._messages.get_nowait()
+            except queue.Empty:
+                return messages
+
+            with self.pool._cond:
+                current = self._current
+                if current is None or current.job_id != job_id:
+                    continue
+                if kind in ("result", "error"):
+                    self._current = None
+            messages.append((kind, payload))
+
+    def metrics(self):
+        """Job count and median and 95th percentile wait, run and total times in ms."""
+        with self.pool._cond:
+            waits = np.array(self.waits) * 1000
+            run_times = np.array(self.run_times) * 1000
+
+        summary = {"jobs": len(waits)}
+        for name, values in (
+            ("wait", waits),
+            ("run", run_times),
+            ("total", waits + run_times),
+        ):
+            for percentile in (50, 95):
+                summary[f"p{percentile}_{name}_ms"] = (
+                    round(float(np.percentile(values, percentile)), 1)
+                    if len(values)
+                    else 0.0
+                )
+        return summary
+
+
+class SessionPool:
+    """Worker threads running the jobs of several board sessions.
+
+    Each session runs at most one job at a time. Free threads take jobs in
+    the order sessions became ready, and a session goes to the back of the
+    line after each job. A busy board can therefore never starve the
+    others, and each board's latency is tracked separately.
+    """
+
+    def __init__(self, workers=2):
+        self._cond = threading.Condition()
+        self._sessions = {}
+        self._ready = deque()
+        self._stopping = False
+        self._threads = [
+            threading.Thread(target=self._run, daemon=True) for _ in range(workers)
+        ]
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+
+    def session_worker(self, name):
+        """The SessionWorker for a named session, created on first use."""
+        with self._cond:
+            if name not in self._sessions:
+                self._sessions[name] = SessionWorker(self, name)
+            return self._sessions[name]
+
+    def metrics(self):
+        """Per-session latency metrics, by session name."""
+        with self._cond:
+            sessions = dict(self._sessions)
+        return {name: session.metrics() for name, session in sessions.items()}
+
+    def stop(self):
+        with self._cond:
+            self._stopping = True
+            for session in self._sessions.values():
+                if session._current is not None:
+                    session._current.cancel()
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
+
+    def _mark_ready(self, session):
+        # Called with _cond held
+        if session not in self._ready:
+            self._ready.append(session)
+        self._cond.notify()
+
+    def _take_job(self):
+        # Called with _cond held. The first ready session not already running
+        # a job gets the thread.
+        for session in self._ready:
+            if session._pending is not None and session._running is None:
+                self._ready.remove(session)
+                job, function, args, submitted = session._pending
+                session._pending = None
+                session._running = job
+                return session, job, function, args, submitted
+        return None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stopping:
+                    taken = self._take_job()
+                    if taken is not None:
+                        break
+                    self._cond.wait()
+                else:
+                    return
+            session, job, function, args, submitted = taken
+
+            started = time.perf_counter()
+            completed = False
+            if not job.cancelled:
+                try:
+                    result = function(job, *args)
+                    session._messages.put((job.job_id, "result", result))
+                    completed = True
+                except RunCancelled:
+                    print(f"{session.name}: run {job.job_id} cancelled.")
+                except Exception as e:
+                    traceback.print_exc()
+                    session._messages.put((job.job_id, "error", e))
+            finished = time.perf_counter()
+
+            with self._cond:
+                session._running = None
+                if completed:
+                    session.waits.append(started - submitted)
+                    session.run_times.append(finished - started)
+                # The session may have queued its next job meanwhile
+                if session._pending is not None:
+                    self._mark_ready(session)
+                self._cond.notify_all()
@@ -0,0 +1,188 @@
+import os
+import threading
+import time
+import numpy as np
+from code_detection.ocr.backend import blend_rectangles
+from preprocessing.change_detection import (
+    ChangeDetector,
+    changed_fraction,
+    frame_signature,
+)
+from preprocessing.pipeline import warp_frame
+
+
+def mask_projected_box(image, box, output_size, padding=0.02):
+    """Hide the part of a warped image covered by a projected box.
+
+    The box is in projection coordinates. It is scaled to the image the same
+    way Projector scales detected boxes, with some padding on every side.
+    """
+    height, width = image.shape[:2]
+    scale = np.array([width / output_size[0], height / output_size[1]])
+    points = np.asarray(box, dtype=np.float32) * scale
+    pad = padding * np.array([width, height])
+    x_min, y_min = np.maximum(points.min(axis=0) - pad, 0).astype(int)
+    x_max, y_max = (points.max(axis=0) + pad).astype(int)
+
+    return blend_rectangles(image, [(x_min, y_min, x_max + 1, y_max + 1)])
+
+
+class SpeculativeDetector(threading.Thread):
+    """Detects and parses the board in the background while idle.
+
+    Whenever the board changes and then settles, fresh images are captured
+    and analysed, so that a run can reuse the result and go straight to
+    execution. capture returns a list of warped images and analyse(images,
+    cancel_event) turns them into the tuple returned by analyse_images,
+    stopping early once cancel_event is set. mask_box returns the
+    projected box to hide from detection, e.g. the helper code shown while
+    idle.
+
+    With frame_pool (a SharedFramePool), capture returns frame handles of
+    that pool, which are released once masked. The masked images are put
+    back in the pool and analyse is given their handles to release.
+    """
+
+    def __init__(
+        self,
+        preview,
+        capture,
+        analyse,
+        mask_box,
+        output_size,
+        interval=0.2,
+        settle_time=1.0,
+        threshold=0.002,
+        frame_pool=None,
+    ):
+        super().__init__(daemon=True)
+        self.preview = preview
+        self.capture = capture
+        self.analyse = analyse
+        self.frame_pool = frame_pool
+        self.mask_box = mask_box
+        self.output_size = output_size
+        self.interval = interval
+        self.threshold = threshold
+
+        self.changes = ChangeDetector(threshold, settle_time)
+        self._active = threading.Event()
+        self._stop_flag = threading.Event()
+        self._analysing = threading.Lock()
+        self._result_lock = threading.Lock()
+        self._result = None
+        self._signature = None
+        self._cancel = threading.Event()  # Of the analysis in flight
+
+    def resume(self):
+        """Start watching the board, e.g. on entering IDLE."""
+        self.changes.reset()
+        self._active.set()
+
+    def pause(self):
+        """Stop watching the board and cancel any analysis in flight."""
+        self._active.clear()
+        self._cancel.set()
+
+    def stop(self):
+        self._stop_flag.set()
+        self._active.set()  # Wake the thread so it can exit
+
+    def _signature_of(self, warped_image):
+        masked = mask_projected_box(warped_image, self.mask_box(), self.output_size)
+        return masked, frame_signature(masked)
+
+    def _speculate(self):
+        with self._analysing:
+            cancel = self._cancel = threading.Event()
+            if not self._active.is_set():
+                return
+            captured = self.capture()
+            try:
+                if not captured or cancel.is_set():
+                    return
+                warped_images = captured
+                if self.frame_pool is not None:
+                    warped_images = [self.frame_pool.view(h) for h in captured]
+                masked_images = [
+                    self._signature_of(warped_image)[0]
+                    for warped_image in warped_images
+                ]
+            finally:
+                if self.frame_pool is not None:
+                    for handle in captured or []:
+                        self.frame_pool.release(handle)
+            signature = frame_signature(masked_images[0])
+            if cancel.is_set():
+                return
+
+            if self.frame_pool is not None:
+                masked_images = self._share(masked_images)
+            result = self.analyse(masked_images, cancel)
+            if cancel.is_set():
+                print("Speculative detection cancelled.")
+                return
+            with self._result_lock:
+                self._result = result
+                self._signature = signature
+            print("Speculative detection updated.")
+
+    def _share(self, images):
+        # Copy images into the frame pool, releasing them all if one fails
+        handles = []
+        try:
+            for image in images:
+                handles.append(self.frame_pool.put(image))
+        except Exception:
+            for handle in handles:
+                self.frame_pool.release(handle)
+            raise
+        return handles
+
+    def validated_result(self):
+        """Return the cached analysis if the board still matches it, else None.
+
+        A single new frame is warped and compared against the images the
+        analysis was made from.
+        """
+        with self._result_lock:
+            result, signature = self._result, self._signature
+        if result is None:
+            return None
+
+        with self.preview.lease_frame() as frame:
+            if frame is None:
+                return None
+            warped_image = warp_frame(frame)
+        if warped_image is None:
+            return None
+
+        _, current = self._signature_of(warped_image)
+        difference = changed_fraction(signature, current)
+        if difference > self.threshold:
+            print(f"Board changed since speculative detection ({difference:.3f}).")
+            return None
+        return result
+
+    def run(self):
+        # Lower this thread's priority where the platform supports it
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 10)
+        except (AttributeError, OSError):
+            pass
+
+        while not self._stop_flag.is_set():
+            if not self._active.wait(timeout=1.0) or self._stop_flag.is_set():
+                continue
+
+            with self.preview.lease_frame() as frame:
+                settled = frame is not None and self.changes.update(frame)
+            if self.changes.changed:
+                with self._result_lock:
+                    self._result = None
+            if settled:
+                try:
+                    self._speculate()
+                except Exception as e:
+                    print(f"Speculative detection failed: {e}")
+            time.sleep(self.interval)
@@ -1,13 +1,33 @@
+import queue
+import time
+from collections import defaultdict, deque
 from threading import Lock
 from .states import SystemState, Event
 
+# Events that are dropped if they repeat within the debounce interval
+DEBOUNCED_EVENTS = {Event.START_RUN}
+
 
 class SystemFSM:
-    def __init__(self):
+    def __init__(self, debounce=1.0, history_size=100):
         self.state = SystemState.IDLE
         self.lock = Lock()
         self._initialise_transitions()
 
+        # Events posted from other threads, handled by process_events
+        self.events = queue.Queue()
+        self.debounce = debounce
+        self._last_posted = {}
+
+        # Callbacks run when a state is entered or exited
+        self._enter_listeners = defaultdict(list)
+        self._exit_listeners = defaultdict(list)
+
+        # Timestamped transitions and total time spent in each state
+        self.entered_at = time.monotonic()
+        self.history = deque(maxlen=history_size)
+        self.time_in_state = defaultdict(float)
+
     def _initialise_transitions(self):
         """Initialise the state transitions for the FSM."""
         self.transitions = {
@@ -35,12 +55,72 @@ class SystemFSM:
             },
         }
 
+    def on_enter(self, state, callback):
+        """Call callback(previous_state, event) whenever state is entered."""
+        self._enter_listeners[state].append(callback)
+
+    def on_exit(self, state, callback):
+        """Call callback(event, next_state) whenever state is left."""
+        self._exit_listeners[state].append(callback)
+
+    def post(self, event):
+        """Queue an event from any thread, to be handled by process_events.
+
+        Repeats of debounced events (e.g. START_RUN from both voice and
+        keyboard) within the debounce interval are dropped.
+        """
+        now = time.monotonic()
+        with self.lock:
+            if event in DEBOUNCED_EVENTS:
+                last = self._last_posted.get(event)
+                if last is not None and now - last < self.debounce:
+                    print(f"Ignoring repeated event: {event}")
+                    return False
+            self._last_posted[event] = now
+        self.events.put(event)
+        return True
+
+    def process_events(self):
+        """Handle all queued events in order, on the calling thread.
+
+        Consecutive duplicates are coalesced into a single transition.
+        Returns the number of transitions made.
+        """
+        count = 0
+        previous = None
+        while True:
+            try:
+                event = self.events.get_nowait()
+            except queue.Empty:
+                return count
+            if event == previous:
+                continue
+            previous = event
+            if self.transition(event):
+                count += 1
+
+    def time_in_current_state(self):
+        return time.monotonic() - self.entered_at
+
     def transition(self, event):
         """Transition to the next state based on the current state and event."""
         with self.lock:
             print(f"Current state: {self.state}, Event: {event}")
-            if event in self.transitions[self.state]:
-                self.state = self.transitions[self.state][event]
-                print(f"Transitioned to {self.state} state.")
-                return True
-            return False
+            if event not in self.transitions.get(self.state, {}):
+                return False
+
+            now = time.monotonic()
+            previous_state = self.state
+            self.state = self.transitions[self.state][event]
+            self.time_in_state[previous_state] += now - self.entered_at
+            self.entered_at = now
+            self.history.append((now, previous_state, event, self.state))
+            new_state = self.state
+            print(f"Transitioned to {self.state} state.")
+
+        # Run listeners outside the lock so they can post or transition
+        for callback in self._exit_listeners[previous_state]:
+            callback(event, new_state)
+        for callback in self._enter_listeners[new_state]:
+            callback(previous_state, event)
+        return True
@@ -1,20 +1,35 @@
-import cv2
 import threading
 import time
+from contextlib import contextmanager
+from input.capture_backends import open_camera
+from input.frame_buffer import FrameRingBuffer
 
 
 class CameraPreviewThread(threading.Thread):
     def __init__(
-        self, source=0, resolution=(3840, 2160), fps=10, window_name="Camera Feed"
+        self,
+        source=0,
+        resolution=(3840, 2160),
+        fps=10,
+        window_name="Camera Feed",
+        buffer_size=4,
+        capture_factory=open_camera,
+        recorder=None,
     ):
+        """capture_factory(source, resolution, fps) opens the capture device.
+
+        If recorder is given (see input.replay.FrameRecorder) every captured
+        frame is also passed to its record method.
+        """
         super().__init__()
         self.source = source
         self.resolution = resolution
         self.fps = fps
         self.window_name = window_name
+        self.capture_factory = capture_factory
+        self.recorder = recorder
 
-        self._lock = threading.Lock()
-        self._frame = None
+        self.frames = FrameRingBuffer(buffer_size)
         self._running = threading.Event()
         self._running.set()
         self._update_settings_event = threading.Event()
@@ -28,10 +43,7 @@ class CameraPreviewThread(threading.Thread):
         if self.capture is not None:
             self.capture.release()
 
-        self.capture = cv2.VideoCapture(self.source, cv2.CAP_DSHOW)
-        self.capture.set(cv2.CAP_PROP_FRAME_WIDTH, self.resolution[0])
-        self.capture.set(cv2.CAP_PROP_FRAME_HEIGHT, self.resolution[1])
-        self.capture.set(cv2.CAP_PROP_FPS, self.fps)
+        self.capture = self.capture_factory(self.source, self.resolution, self.fps)
         time.sleep(0.5)
 
     def update_settings(self, source, resolution, fps):
@@ -50,19 +62,82 @@ class CameraPreviewThread(threading.Thread):
                     self._init_camera()
                     self._update_settings_event.clear()
 
-            ret, frame = self.capture.read()
+            # Read straight into the next ring buffer slot
+            slot = self.frames.begin_write()
+            if slot is not None:
+                ret, frame = self.capture.read(slot)
+            else:
+                ret, frame = self.capture.read()
             if not ret:
+                self.frames.abort_write()
+                if not self.capture.isOpened():
+                    # Camera unplugged or replay finished, wait for new settings
+                    time.sleep(0.1)
+                    continue
                 print("Warning: Frame capture failed.")
                 continue
 
-            with self._lock:
-                self._frame = frame.copy()
+            if not self.frames.commit_write(frame):
+                continue  # Every slot is pinned, drop the frame
+            if self.recorder is not None:
+                self.recorder.record(frame)
 
         self.capture.release()
+        if self.recorder is not None:
+            self.recorder.close()
 
     def get_frame(self):
-        with self._lock:
-            return self._frame.copy() if self._frame is not None else None
+        """Return a copy of the latest frame, or None."""
+        with self.lease_frame() as frame:
+            return frame.copy() if frame is not None else None
+
+    @contextmanager
+    def lease_frame(self):
+        """Context manager giving a read-only view of the latest frame, or None.
+
+        The frame is pinned in the ring buffer until the block exits, so the
+        capture thread cannot overwrite it while it is in use.
+        """
+        frame = self.frames.acquire_latest()
+        try:
+            yield frame.image if frame is not None else None
+        finally:
+            if frame is not None:
+                self.frames.release(frame.seq)
+
+    def get_latest(self, n=1):
+        """Return up to n of the most recent frames, oldest first.
+
+        The frames are pinned and must be handed back with release_frame.
+        """
+        return self.frames.get_latest(n)
+
+    def get_frames_since(self, seq):
+        """Return all buffered frames captured after sequence number seq.
+
+        The frames are pinned and must be handed back with release_frame.
+        """
+        return self.frames.get_frames_since(seq)
+
+    def burst(self, count, timeout=1.0):
+        """Yield up to count unique frames as soon as they are captured.
+
+        The burst starts from the newest frame already captured. Each frame is
+        pinned in the ring buffer when yielded and must be handed back with
+        release_frame. The burst ends early if no new frame arrives within
+        timeout seconds.
+        """
+        last_seq = max(self.frames.latest_seq, 0) - 1
+        for _ in range(count):
+            frame = self.frames.wait_for_frame(last_seq, timeout=timeout, pin=True)
+            if frame is None:
+                return
+            last_seq = frame.seq
+            yield frame
+
+    def release_frame(self, frame):
+        """Release a frame pinned by burst, get_latest or get_frames_since."""
+        self.frames.release(frame.seq)
 
     def stop(self):
         self._running.clear()
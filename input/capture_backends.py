@@ -0,0 +1,167 @@
+import sys
+import time
+import cv2
+import numpy as np
+
+BACKENDS = {
+    "any": cv2.CAP_ANY,
+    "dshow": cv2.CAP_DSHOW,
+    "msmf": cv2.CAP_MSMF,
+    "v4l2": cv2.CAP_V4L2,
+    "avfoundation": cv2.CAP_AVFOUNDATION,
+}
+
+# Uncompressed YUYV needs 2 bytes per pixel. Above this many bytes per
+# second a USB 2 camera drops its frame rate, so ask for MJPG instead.
+RAW_BANDWIDTH_LIMIT = 24_000_000
+
+
+def platform_backend():
+    """The native capture backend for this platform."""
+    if sys.platform.startswith("win"):
+        return cv2.CAP_DSHOW
+    if sys.platform.startswith("linux"):
+        return cv2.CAP_V4L2
+    if sys.platform == "darwin":
+        return cv2.CAP_AVFOUNDATION
+    return cv2.CAP_ANY
+
+
+def resolve_backend(name="auto"):
+    if name in (None, "auto"):
+        return platform_backend()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown capture backend: {name}")
+    return BACKENDS[name]
+
+
+def choose_fourcc(resolution, fps, fourcc="auto"):
+    """FOURCC to request, or None to keep the driver default.
+
+    With "auto", MJPG is used for modes too large to stream uncompressed.
+    """
+    if fourcc != "auto":
+        return fourcc or None
+    raw_bandwidth = resolution[0] * resolution[1] * 2 * max(fps, 1)
+    return "MJPG" if raw_bandwidth > RAW_BANDWIDTH_LIMIT else None
+
+
+def decode_fourcc(value):
+    value = int(value)
+    return "".join(chr((value >> (8 * i)) & 0xFF) for i in range(4))
+
+
+def open_camera(
+    source, resolution, fps, backend="auto", fourcc="auto", buffer_size=1
+):
+    """Open a camera with the platform backend and a fresh-frame configuration.
+
+    The FOURCC is set before the size, since V4L2 drivers pick the available
+    modes from the pixel format. A one-frame driver buffer stops frames
+    queueing up inside the driver while the pipeline is busy.
+    """
+    capture = cv2.VideoCapture(source, resolve_backend(backend))
+
+    requested_fourcc = choose_fourcc(resolution, fps, fourcc)
+    if requested_fourcc:
+        capture.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*requested_fourcc))
+    capture.set(cv2.CAP_PROP_FRAME_WIDTH, resolution[0])
+    capture.set(cv2.CAP_PROP_FRAME_HEIGHT, resolution[1])
+    capture.set(cv2.CAP_PROP_FPS, fps)
+    if buffer_size:
+        capture.set(cv2.CAP_PROP_BUFFERSIZE, buffer_size)
+
+    # Report when the driver didn't give us what we asked for
+    if capture.isOpened():
+        actual_fourcc = decode_fourcc(capture.get(cv2.CAP_PROP_FOURCC))
+        if requested_fourcc and actual_fourcc != requested_fourcc:
+            print(
+                f"Warning: Camera is using {actual_fourcc!r} instead of {requested_fourcc!r}."
+            )
+        actual = (
+            int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        )
+        if actual != tuple(resolution):
+            print(f"Warning: Camera resolution is {actual} instead of {tuple(resolution)}.")
+    else:
+        print(f"Warning: Could not open camera {source}.")
+
+    return capture
+
+
+class FakeVideoCapture:
+    """Stand-in for cv2.VideoCapture that replays a list of images.
+
+    Images can be arrays or file paths. Frames are served at the fps set with
+    CAP_PROP_FPS (0 means as fast as they are read) and loop forever unless
+    loop is False, after which read fails like an unplugged camera.
+    """
+
+    def __init__(self, images, fps=0, loop=True):
+        self.images = [
+            cv2.imread(image) if isinstance(image, str) else image for image in images
+        ]
+        if any(image is None for image in self.images):
+            raise ValueError("FakeVideoCapture could not load every image")
+        self.fps = fps
+        self.loop = loop
+        self.index = 0
+        self.opened = len(self.images) > 0
+        self.last_read = None
+        self.properties = {}
+
+    def isOpened(self):
+        return self.opened
+
+    def read(self, image=None):
+        if not self.loop and self.index >= len(self.images):
+            self.opened = False  # Out of images, like an unplugged camera
+        if not self.opened:
+            return False, None
+
+        # Pace frames like a real camera
+        if self.fps > 0 and self.last_read is not None:
+            delay = self.last_read + 1.0 / self.fps - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        self.last_read = time.perf_counter()
+
+        frame = self.images[self.index % len(self.images)]
+        self.index += 1
+        if image is not None and image.shape == frame.shape and image.dtype == frame.dtype:
+            np.copyto(image, frame)
+            return True, image
+        return True, frame.copy()
+
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_FPS:
+            self.fps = value
+        self.properties[prop] = value
+        return True
+
+    def get(self, prop):
+        if not self.images:
+            return 0.0
+        height, width = self.images[0].shape[:2]
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(width)
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(height)
+        if prop == cv2.CAP_PROP_FPS:
+            return float(self.fps)
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return float(self.index)
+        return float(self.properties.get(prop, 0.0))
+
+    def release(self):
+        self.opened = False
+
+
+def fake_capture_factory(images, loop=True):
+    """A capture_factory for CameraPreviewThread that replays images."""
+
+    def factory(source, resolution, fps):
+        return FakeVideoCapture(images, fps=fps, loop=loop)
+
+    return factory
@@ -0,0 +1,190 @@
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+# A captured frame as handed to readers: sequence number, monotonic
+# capture timestamp and a read-only view onto the ring buffer slot
+Frame = namedtuple("Frame", ["seq", "timestamp", "image"])
+
+
+class FrameSlot:
+    def __init__(self):
+        self.image = None
+        self.seq = -1
+        self.timestamp = 0.0
+        self.pins = 0
+
+
+class FrameRingBuffer:
+    """Preallocated ring of frame slots shared between the capture thread
+    and its readers.
+
+    The writer reads each frame straight into a slot, so no copy is made per
+    frame. Readers receive read-only views that stay valid until the slot is
+    recycled, which takes at least ``size - 1`` further frames. Readers that
+    need a frame for longer should pin it with ``lease`` (or ``acquire`` and
+    ``release``), and the writer will skip pinned slots. If every slot is
+    pinned, new frames are dropped until one is released.
+    """
+
+    def __init__(self, size=4):
+        if size < 2:
+            raise ValueError("Frame ring buffer needs at least 2 slots.")
+        self.size = size
+        self._slots = [FrameSlot() for _ in range(size)]
+        self._cond = threading.Condition()
+        self._next_seq = 0
+        self._write_index = 0
+        self._writing = None
+        self._writing_seq = -1
+
+    @property
+    def latest_seq(self):
+        """Sequence number of the newest complete frame, or -1 if none."""
+        with self._cond:
+            return self._next_seq - 1
+
+    def begin_write(self):
+        """Claim the next free slot and return its buffer for the writer.
+
+        The returned array may be None (first frame, or every slot pinned) or
+        of a stale shape; the writer should pass whatever it ends up with to
+        ``commit_write``.
+        """
+        with self._cond:
+            for offset in range(self.size):
+                index = (self._write_index + offset) % self.size
+                if self._slots[index].pins == 0:
+                    break
+            else:
+                # Every slot is pinned, so this frame will be dropped
+                self._writing = None
+                return None
+
+            slot = self._slots[index]
+            self._writing_seq = slot.seq
+            slot.seq = -1  # Hide the slot from readers while it is written
+            self._writing = index
+            self._write_index = (index + 1) % self.size
+            return slot.image
+
+    def commit_write(self, image):
+        """Publish the frame written into the slot claimed by ``begin_write``.
+
+        Returns False if the frame was dropped because every slot was pinned.
+        """
+        with self._cond:
+            if self._writing is None:
+                return False
+            slot = self._slots[self._writing]
+            slot.image = image
+            slot.timestamp = time.monotonic()
+            slot.seq = self._next_seq
+            self._next_seq += 1
+            self._writing = None
+            self._cond.notify_all()
+            return True
+
+    def abort_write(self):
+        """Give back the slot claimed by ``begin_write`` without publishing.
+
+        The frame the slot held before is made visible again.
+        """
+        with self._cond:
+            if self._writing is not None:
+                self._slots[self._writing].seq = self._writing_seq
+            self._writing = None
+
+    def _frame(self, slot):
+        view = slot.image.view()
+        view.flags.writeable = False
+        return Frame(slot.seq, slot.timestamp, view)
+
+    def _ready_slots(self):
+        # Complete slots ordered oldest to newest
+        slots = [slot for slot in self._slots if slot.seq >= 0]
+        return sorted(slots, key=lambda slot: slot.seq)
+
+    def _pin_all(self, slots):
+        for slot in slots:
+            slot.pins += 1
+        return [self._frame(slot) for slot in slots]
+
+    def get_latest(self, n=1):
+        """Pin and return up to ``n`` most recent frames, oldest first.
+
+        Each frame must be handed back with ``release``.
+        """
+        with self._cond:
+            return self._pin_all(self._ready_slots()[-n:] if n > 0 else [])
+
+    def get_frames_since(self, seq):
+        """Pin and return all buffered frames newer than ``seq``, oldest first.
+
+        Each frame must be handed back with ``release``.
+        """
+        with self._cond:
+            return self._pin_all(
+                [slot for slot in self._ready_slots() if slot.seq > seq]
+            )
+
+    def wait_for_frame(self, after_seq=-1, timeout=None, pin=False):
+        """Block until a frame newer than ``after_seq`` is available.
+
+        Returns the oldest such frame still in the buffer, or None if the
+        timeout expires first. With ``pin`` the frame is pinned atomically and
+        must be handed back with ``release``.
+        """
+        with self._cond:
+            if not self._cond.wait_for(
+                lambda: any(slot.seq > after_seq for slot in self._slots),
+                timeout=timeout,
+            ):
+                return None
+            slot = min(
+                (slot for slot in self._slots if slot.seq > after_seq),
+                key=lambda slot: slot.seq,
+            )
+            if pin:
+                slot.pins += 1
+            return self._frame(slot)
+
+    def acquire(self, seq):
+        """Pin the slot holding frame ``seq`` so it is not recycled.
+
+        Returns the frame, or None if it has already been overwritten.
+        """
+        with self._cond:
+            for slot in self._slots:
+                if slot.seq == seq:
+                    slot.pins += 1
+                    return self._frame(slot)
+            return None
+
+    def acquire_latest(self):
+        """Pin the newest complete frame and return it, or None if there is none."""
+        with self._cond:
+            slots = self._ready_slots()
+            if not slots:
+                return None
+            slots[-1].pins += 1
+            return self._frame(slots[-1])
+
+    def release(self, seq):
+        """Unpin a frame previously pinned with ``acquire``."""
+        with self._cond:
+            for slot in self._slots:
+                if slot.seq == seq and slot.pins > 0:
+                    slot.pins -= 1
+                    return
+
+    @contextmanager
+    def lease(self, seq):
+        """Context manager pinning frame ``seq`` for the duration of the block."""
+        frame = self.acquire(seq)
+        try:
+            yield frame
+        finally:
+            if frame is not None:
+                self.release(seq)
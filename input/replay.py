@@ -0,0 +1,240 @@
+import json
+import os
+import queue
+import threading
+import time
+import cv2
+import numpy as np
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff")
+
+
+def recording_paths(path):
+    """Stream and index file names of the recording at path (with or without extension)."""
+    base, extension = os.path.splitext(path)
+    if extension not in (".mjpeg", ".jsonl"):
+        base = path
+    return base + ".mjpeg", base + ".jsonl"
+
+
+class FrameRecorder:
+    """Record camera frames as an MJPEG stream with a JSON lines index.
+
+    Each index line holds the frame number, capture time in seconds since
+    the first frame, and the byte offset and length of its JPEG in the
+    stream. Frames are encoded and written on a background thread. If it
+    falls behind, frames are dropped rather than stalling the camera.
+    """
+
+    def __init__(self, path, quality=90, max_pending=8):
+        self.stream_path, self.index_path = recording_paths(path)
+        directory = os.path.dirname(self.stream_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.quality = quality
+        self.pending = queue.Queue(maxsize=max_pending)
+        self.start_time = None
+        self.frame_count = 0
+        self.dropped = 0
+
+        self.stream = open(self.stream_path, "wb")
+        self.index = open(self.index_path, "w")
+        self.thread = threading.Thread(target=self._write_frames, daemon=True)
+        self.thread.start()
+
+    def record(self, image, timestamp=None):
+        """Queue a copy of image for writing. Returns False if it was dropped."""
+        timestamp = time.monotonic() if timestamp is None else timestamp
+        if self.start_time is None:
+            self.start_time = timestamp
+        try:
+            self.pending.put_nowait((timestamp - self.start_time, image.copy()))
+        except queue.Full:
+            self.dropped += 1
+            return False
+        return True
+
+    def _write_frames(self):
+        while True:
+            item = self.pending.get()
+            if item is None:
+                return
+            elapsed, image = item
+            ok, encoded = cv2.imencode(
+                ".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, self.quality]
+            )
+            if not ok:
+                print("Warning: Could not encode recorded frame.")
+                continue
+
+            offset = self.stream.tell()
+            self.stream.write(encoded.tobytes())
+            entry = {
+                "frame": self.frame_count,
+                "time": round(elapsed, 6),
+                "offset": offset,
+                "length": len(encoded),
+            }
+            self.index.write(json.dumps(entry) + "\n")
+            self.frame_count += 1
+
+    def close(self):
+        """Write out the queued frames and close the files."""
+        self.pending.put(None)
+        self.thread.join()
+        self.stream.close()
+        self.index.close()
+        if self.dropped:
+            print(f"Recorder dropped {self.dropped} frames.")
+
+
+class ReplayCapture:
+    """Stand-in for cv2.VideoCapture that plays back recorded footage.
+
+    source can be a directory of images, a video file, or a recording made
+    by FrameRecorder (either of its files, or the shared base name). With
+    realtime, frames are served at their original timestamps, or at fps
+    for image directories. Otherwise they are served as fast as they are
+    read. After the last frame, read fails like an unplugged camera, unless
+    loop is set.
+    """
+
+    def __init__(self, source, realtime=True, loop=False, fps=10):
+        self.source = source
+        self.realtime = realtime
+        self.loop = loop
+        self.fps = fps
+        self.opened = True
+
+        self.video = None
+        self.stream = None
+        self.paths = None
+        self.entries = None
+
+        stream_path, index_path = recording_paths(source)
+        if os.path.isdir(source):
+            self.paths = sorted(
+                os.path.join(source, name)
+                for name in os.listdir(source)
+                if name.lower().endswith(IMAGE_EXTENSIONS)
+            )
+            self.opened = len(self.paths) > 0
+        elif os.path.exists(index_path) and os.path.exists(stream_path):
+            with open(index_path) as index:
+                self.entries = [json.loads(line) for line in index if line.strip()]
+            self.stream = open(stream_path, "rb")
+            self.opened = len(self.entries) > 0
+        else:
+            self.video = cv2.VideoCapture(source)
+            self.opened = self.video.isOpened()
+            video_fps = self.video.get(cv2.CAP_PROP_FPS)
+            if video_fps > 0:
+                self.fps = video_fps
+
+        self.position = 0
+        self.start_time = None
+
+    @property
+    def frame_count(self):
+        if self.paths is not None:
+            return len(self.paths)
+        if self.entries is not None:
+            return len(self.entries)
+        return int(self.video.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    def _frame_time(self, position):
+        """Seconds from the start of playback at which frame position is due."""
+        if self.entries is not None:
+            return self.entries[position]["time"]
+        return position / self.fps if self.fps > 0 else 0.0
+
+    def _read_frame(self, position):
+        if self.paths is not None:
+            return cv2.imread(self.paths[position])
+        if self.entries is not None:
+            entry = self.entries[position]
+            self.stream.seek(entry["offset"])
+            data = np.frombuffer(self.stream.read(entry["length"]), dtype=np.uint8)
+            return cv2.imdecode(data, cv2.IMREAD_COLOR)
+        ret, frame = self.video.read()
+        return frame if ret else None
+
+    def _rewind(self):
+        self.position = 0
+        self.start_time = None
+        if self.video is not None:
+            self.video.set(cv2.CAP_PROP_POS_FRAMES, 0)
+
+    def isOpened(self):
+        return self.opened
+
+    def read(self, image=None):
+        if not self.opened:
+            return False, None
+        if self.position >= self.frame_count and self.loop:
+            self._rewind()
+        if self.position >= self.frame_count and self.video is None:
+            self.opened = False  # Out of footage
+            return False, None
+
+        due = self._frame_time(self.position)
+        frame = self._read_frame(self.position)
+        if frame is None:
+            if self.loop and self.position > 0:
+                self._rewind()
+                return self.read(image)
+            self.opened = False
+            return False, None
+        self.position += 1
+
+        # Wait until the frame's original capture time
+        if self.realtime:
+            now = time.perf_counter()
+            if self.start_time is None:
+                self.start_time = now - due
+            delay = self.start_time + due - now
+            if delay > 0:
+                time.sleep(delay)
+
+        if image is not None and image.shape == frame.shape and image.dtype == frame.dtype:
+            np.copyto(image, frame)
+            return True, image
+        return True, frame
+
+    def set(self, prop, value):
+        # The footage decides the size and frame rate
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            self.position = int(value)
+            self.start_time = None
+            if self.video is not None:
+                self.video.set(prop, value)
+            return True
+        return False
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return float(self.position)
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return float(self.frame_count)
+        if prop == cv2.CAP_PROP_FPS:
+            return float(self.fps)
+        if self.video is not None:
+            return self.video.get(prop)
+        return 0.0
+
+    def release(self):
+        self.opened = False
+        if self.video is not None:
+            self.video.release()
+        if self.stream is not None:
+            self.stream.close()
+
+
+def replay_capture_factory(realtime=True, loop=False):
+    """A capture_factory for CameraPreviewThread that replays footage from source."""
+
+    def factory(source, resolution, fps):
+        return ReplayCapture(source, realtime=realtime, loop=loop, fps=fps)
+
+    return factory
@@ -6,6 +6,7 @@ from tkinter import ttk, messagebox
 import sounddevice as sd
 import cv2
 from settings import settings, save_settings
+from code_detection.ocr.registry import available_backends, check_backend
 from input.voice_commands import VoiceCommandThread
 import os
 import json
@@ -380,6 +381,17 @@ class SettingsMenu:
         self.num_valid_images.grid(row=row, column=1, columnspan=4, sticky="ew", pady=2)
         row += 1
 
+        # OCR backend, also accepts "detector+recogniser" names
+        ttk.Label(main_frame, text="OCR Backend:").grid(
+            row=row, column=0, sticky="w", pady=2
+        )
+        self.ocr_backend = ttk.Combobox(
+            main_frame, values=available_backends(), width=50
+        )
+        self.ocr_backend.set(settings["OCR_BACKEND"])
+        self.ocr_backend.grid(row=row, column=1, columnspan=4, sticky="ew", pady=2)
+        row += 1
+
         # Code Save Path
         ttk.Label(main_frame, text="Code Save Path:").grid(
             row=row, column=0, sticky="w", pady=2
@@ -549,6 +561,13 @@ class SettingsMenu:
                 )
                 return
 
+            ocr_backend = self.ocr_backend.get().strip()
+            try:
+                check_backend(ocr_backend)
+            except ValueError as e:
+                messagebox.showerror("Error", str(e))
+                return
+
             # Save device settings
             settings.update(
                 {
@@ -562,6 +581,7 @@ class SettingsMenu:
                     "CORNER_MARKER_SIZE": corner_size,
                     "VOICE_COMMANDS": self.voice_commands_var.get(),
                     "NUM_VALID_IMAGES": num_images,
+                    "OCR_BACKEND": ocr_backend,
                     "HELPER_CODE": self.helper_text.get("1.0", "end-1c"),
                     "CODE_SAVE_PATH": self.code_save_path.get(),
                 }
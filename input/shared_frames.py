@@ -0,0 +1,192 @@
+import multiprocessing
+import time
+from collections import namedtuple
+from multiprocessing import shared_memory
+import numpy as np
+
+# A reference to a frame in a SharedFramePool. It is a few bytes to pickle,
+# whatever the frame size. generation guards against using a handle after its
+# slot has been recycled for another frame.
+FrameHandle = namedtuple("FrameHandle", ["pool_name", "index", "generation"])
+
+# Metadata header kept in shared memory for each slot
+SLOT_HEADER = np.dtype(
+    [
+        ("refs", "<i4"),
+        ("height", "<i4"),
+        ("width", "<i4"),
+        ("channels", "<i4"),
+        ("generation", "<i8"),
+        ("seq", "<i8"),
+        ("timestamp", "<f8"),
+        ("dtype", "S8"),
+    ]
+)
+
+# Pools opened in this process, by shared memory name
+_pools = {}
+
+
+def _align(size, alignment=64):
+    return (size + alignment - 1) // alignment * alignment
+
+
+def _open_shared_memory(name):
+    # Only the creating process should unlink the block. Python 3.13 can be
+    # told not to track it, older versions share the parent's tracker.
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+class SharedFramePool:
+    """Fixed-size frame slots in shared memory, usable from several processes.
+
+    Frames are written once into a free slot and passed between processes
+    as FrameHandles, so no image data is pickled. Each slot holds a
+    reference count. put and reserve hand out one reference, retain adds
+    one for every extra holder, and the slot is reused once every holder
+    has called release.
+
+    The creating process owns the memory. Other processes attach with
+    attach_pool(pool.spec(), pool.lock), typically in a pool initializer,
+    and must not outlive the owner.
+    """
+
+    def __init__(self, slot_count=8, slot_bytes=1920 * 1080 * 3, _attach=None):
+        if _attach is None:
+            self.slot_count = slot_count
+            self.slot_bytes = _align(slot_bytes)
+            self.header_bytes = _align(slot_count * SLOT_HEADER.itemsize)
+            self.memory = shared_memory.SharedMemory(
+                create=True, size=self.header_bytes + slot_count * self.slot_bytes
+            )
+            self.lock = multiprocessing.Lock()
+            self.owner = True
+        else:
+            spec, lock = _attach
+            name, self.slot_count, self.slot_bytes = spec
+            self.header_bytes = _align(self.slot_count * SLOT_HEADER.itemsize)
+            self.memory = _open_shared_memory(name)
+            self.lock = lock
+            self.owner = False
+
+        self.name = self.memory.name
+        self.headers = np.ndarray(
+            (self.slot_count,), dtype=SLOT_HEADER, buffer=self.memory.buf
+        )
+        if self.owner:
+            self.headers[:] = np.zeros(self.slot_count, dtype=SLOT_HEADER)
+        self._next_index = 0
+        _pools[self.name] = self
+
+    def spec(self):
+        """Picklable description of the pool for attach_pool."""
+        return self.name, self.slot_count, self.slot_bytes
+
+    def _slot_array(self, index, shape, dtype):
+        offset = self.header_bytes + index * self.slot_bytes
+        return np.ndarray(shape, dtype=dtype, buffer=self.memory.buf, offset=offset)
+
+    def reserve(self, shape, dtype=np.uint8, seq=-1, timestamp=None):
+        """Claim a free slot for a frame of the given shape.
+
+        Returns the handle, holding one reference, and a writable array to
+        fill in. Raises RuntimeError if every slot is in use.
+        """
+        dtype = np.dtype(dtype)
+        shape = tuple(int(s) for s in shape)
+        if int(np.prod(shape)) * dtype.itemsize > self.slot_bytes:
+            raise ValueError(f"Frame of shape {shape} does not fit in a slot.")
+
+        with self.lock:
+            for offset in range(self.slot_count):
+                index = (self._next_index + offset) % self.slot_count
+                if self.headers[index]["refs"] == 0:
+                    break
+            else:
+                raise RuntimeError("All shared frame slots are in use.")
+
+            header = self.headers[index]
+            header["refs"] = 1
+            header["generation"] += 1
+            header["height"], header["width"] = shape[:2]
+            header["channels"] = shape[2] if len(shape) > 2 else 0
+            header["seq"] = seq
+            header["timestamp"] = time.monotonic() if timestamp is None else timestamp
+            header["dtype"] = dtype.str.encode()
+            generation = int(header["generation"])
+            self._next_index = (index + 1) % self.slot_count
+
+        handle = FrameHandle(self.name, index, generation)
+        return handle, self._slot_array(index, shape, dtype)
+
+    def put(self, image, seq=-1, timestamp=None):
+        """Copy image into a free slot and return its handle."""
+        handle, slot = self.reserve(image.shape, image.dtype, seq, timestamp)
+        np.copyto(slot, image)
+        return handle
+
+    def _check(self, handle):
+        header = self.headers[handle.index]
+        if header["generation"] != handle.generation or header["refs"] <= 0:
+            raise ValueError("Shared frame handle refers to a recycled slot.")
+        return header
+
+    def view(self, handle):
+        """Read-only array for the frame, valid while a reference is held."""
+        header = self._check(handle)
+        shape = (int(header["height"]), int(header["width"]))
+        if header["channels"]:
+            shape += (int(header["channels"]),)
+        dtype = np.dtype(header["dtype"].decode())
+        array = self._slot_array(handle.index, shape, dtype)
+        array.flags.writeable = False
+        return array
+
+    def info(self, handle):
+        """Sequence number and capture timestamp stored with the frame."""
+        header = self._check(handle)
+        return int(header["seq"]), float(header["timestamp"])
+
+    def retain(self, handle):
+        """Add a reference, e.g. before handing the frame to another process."""
+        with self.lock:
+            self._check(handle)["refs"] += 1
+
+    def release(self, handle):
+        """Drop a reference, recycling the slot once none are left."""
+        with self.lock:
+            header = self.headers[handle.index]
+            if header["generation"] == handle.generation and header["refs"] > 0:
+                header["refs"] -= 1
+
+    def in_use(self):
+        with self.lock:
+            return int(np.count_nonzero(self.headers["refs"]))
+
+    def close(self):
+        """Detach from the shared memory, freeing it if this process owns it."""
+        _pools.pop(self.name, None)
+        # Drop the numpy views first, the buffer can't close while exported
+        self.headers = None
+        try:
+            self.memory.close()
+        except BufferError:
+            pass  # Frames still viewed elsewhere, the mapping goes with them
+        if self.owner:
+            self.memory.unlink()
+
+
+def attach_pool(spec, lock):
+    """Open a pool created by another process, reusing it if already open."""
+    pool = _pools.get(spec[0])
+    if pool is None:
+        pool = SharedFramePool(_attach=(spec, lock))
+    return pool
+
+
+def get_pool(handle):
+    """The pool, already open in this process, that a handle belongs to."""
+    return _pools[handle.pool_name]
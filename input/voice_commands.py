@@ -136,7 +136,7 @@ class VoiceCommandThread(threading.Thread):
                             print(f"Recognised command: {command}")
                             event = self._process_command(command)
                             if event:
-                                self.fsm.transition(event)
+                                self.fsm.post(event)
                         except sr.UnknownValueError:
                             print("Could not understand audio")
                         except sr.RequestError as e:
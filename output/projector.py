@@ -1,8 +1,10 @@
 import cv2
 import numpy as np
 import textwrap
+from code_detection.boxset import as_boxset
 from code_detection.markers.keywords import ALL_KEYWORDS, ALL_CORNER_MARKERS
 from settings import settings
+from tracing import tracer
 
 
 class Projector:
@@ -59,12 +61,7 @@ class Projector:
         scale_x = self.output_size[0] / self.input_size[0]
         scale_y = self.output_size[1] / self.input_size[1]
 
-        scaled_boxes = []
-        for box, text in boxes:
-            scaled_box = (box * [scale_x, scale_y]).astype(int)
-            scaled_boxes.append((scaled_box, text))
-
-        return scaled_boxes
+        return as_boxset(boxes).scaled(scale_x, scale_y)
 
     def get_colour(self, text):
         if text in ALL_KEYWORDS:
@@ -224,19 +221,14 @@ class Projector:
 
     def find_boxes(self):
         # Find the markers for "PYTHON" and "RESULTS"
-        python_marker = None
-        output_marker = None
-        existing_boxes = []
-
         if self.boxes is None or len(self.boxes) == 0:
             return None, None
 
-        for corners, text in self.boxes:
-            if text == "PYTHON":
-                python_marker = corners
-            elif text == "RESULTS":
-                output_marker = corners
-            existing_boxes.append(corners)
+        boxes = as_boxset(self.boxes)
+        python_marker = boxes.find("PYTHON")
+        output_marker = boxes.find("RESULTS")
+        existing_boxes = boxes.corners
+        existing_extents = boxes.extents.tolist()
 
         # Get the bounding box coordinates for a set of corners
         def get_bbox_extents(corners):
@@ -246,10 +238,10 @@ class Projector:
             min_y, max_y = min(y_coords), max(y_coords)
             return (min_x, min_y, max_x, max_y)
 
-        # Check if two bounding boxes overlap
-        def boxes_overlap(box1, box2):
-            box1_min_x, box1_min_y, box1_max_x, box1_max_y = get_bbox_extents(box1)
-            box2_min_x, box2_min_y, box2_max_x, box2_max_y = get_bbox_extents(box2)
+        # Check if two sets of bounding box extents overlap
+        def extents_overlap(extents1, extents2):
+            box1_min_x, box1_min_y, box1_max_x, box1_max_y = extents1
+            box2_min_x, box2_min_y, box2_max_x, box2_max_y = extents2
 
             # Check if one box is to the left of the other
             if box1_max_x < box2_min_x or box2_max_x < box1_min_x:
@@ -259,16 +251,16 @@ class Projector:
                 return False
             return True
 
+        # Check if two bounding boxes overlap
+        def boxes_overlap(box1, box2):
+            return extents_overlap(get_bbox_extents(box1), get_bbox_extents(box2))
+
         # Determine the image boundaries
         if self.output_size is not None:
             image_max_x, image_max_y = self.output_size
         else:
-            all_x = []
-            all_y = []
-            for corners in existing_boxes:
-                for point in corners:
-                    all_x.append(point[0])
-                    all_y.append(point[1])
+            all_x = existing_boxes[:, :, 0].ravel().tolist()
+            all_y = existing_boxes[:, :, 1].ravel().tolist()
             image_max_x = (
                 max(all_x)
                 if all_x
@@ -305,9 +297,9 @@ class Projector:
             ]
 
             # Adjust the Python box to avoid overlapping with existing boxes
-            for box in existing_boxes:
-                if boxes_overlap(py_box, box):
-                    box_min_x, box_min_y, box_max_x, box_max_y = get_bbox_extents(box)
+            for box_extents in existing_extents:
+                if extents_overlap(get_bbox_extents(py_box), box_extents):
+                    box_min_x, box_min_y, box_max_x, box_max_y = box_extents
                     # Adjust py_box to stop before the overlapping box
                     if box_min_y > py_start_y:
                         # The overlapping box is below, adjust the height of py_box
@@ -332,9 +324,9 @@ class Projector:
             ]
 
             # Adjust the Output box to avoid overlapping with existing boxes
-            for box in existing_boxes:
-                if boxes_overlap(out_box, box):
-                    box_min_x, box_min_y, box_max_x, box_max_y = get_bbox_extents(box)
+            for box_extents in existing_extents:
+                if extents_overlap(get_bbox_extents(out_box), box_extents):
+                    box_min_x, box_min_y, box_max_x, box_max_y = box_extents
                     # Adjust out_box to stop before the overlapping box
                     if box_min_y > out_start_y:
                         # The overlapping box is below, adjust the height of out_box
@@ -443,27 +435,62 @@ class Projector:
                 self.error_box, (0, 0, 255, 255), filled=True
             )  # Red for error box
 
+        # Show recent stage timings when debugging
+        if self.debug_mode and tracer.enabled:
+            self.display_trace_summary()
+
         return self.output_image, py_box
 
+    def display_trace_summary(self, font_scale=0.45, thickness=1):
+        # Rolling mean stage timings in the top left corner, below the marker
+        lines = tracer.summary_lines()
+        if not lines:
+            return
+
+        x = self.marker_size + 20
+        y = self.marker_size + 20
+        text_size = cv2.getTextSize("A", cv2.FONT_HERSHEY_SIMPLEX, font_scale, thickness)
+        line_height = int(text_size[0][1] * 1.8)
+        for line in lines:
+            cv2.putText(
+                self.output_image,
+                line,
+                (x, y),
+                cv2.FONT_HERSHEY_SIMPLEX,
+                font_scale,
+                (0, 0, 0, 255),
+                thickness,
+                cv2.LINE_AA,
+            )
+            y += line_height
+
+    def default_code_box(self):
+        # Define coordinates for a box on the right side of the image
+        box_width = int(self.output_size[0] * 0.2)
+        box_height = int(self.output_size[1] * 0.4)
+        box_x = int(self.output_size[0] * 0.8)
+        box_y = int(self.output_size[1] * 0.3)
+        return np.array(
+            [
+                [box_x, box_y],
+                [box_x + box_width, box_y],
+                [box_x + box_width, box_y + box_height],
+                [box_x, box_y + box_height],
+            ],
+            dtype=int,
+        )
+
     def display_idle_projection(self, code_box=None):
         # Reset output_image
         self.load_output_image()
 
         if code_box is None:
-            # Define coordinates for a box on the right side of the image
-            box_width = int(self.output_size[0] * 0.2)
-            box_height = int(self.output_size[1] * 0.4)
-            box_x = int(self.output_size[0] * 0.8)
-            box_y = int(self.output_size[1] * 0.3)
-            code_box = np.array(
-                [
-                    [box_x, box_y],
-                    [box_x + box_width, box_y],
-                    [box_x + box_width, box_y + box_height],
-                    [box_x, box_y + box_height],
-                ],
-                dtype=int,
-            )
+            code_box = self.default_code_box()
+
+        # Speculative detection warps the board while idle, so it needs the
+        # corner markers too
+        if settings["SPECULATIVE_DETECTION"] and settings["PROJECT_CORNERS"]:
+            self.display_corner_aruco_markers()
 
         # Display the helper code in the box
         self.display_text_in_box(
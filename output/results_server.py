@@ -0,0 +1,359 @@
+import asyncio
+import base64
+import hashlib
+import json
+import struct
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+VIEWER_PAGE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>Whiteboard results</title>
+<style>
+body { margin: 0; font-family: sans-serif; background: #111; color: #eee; }
+img { display: block; width: 100%; background: #000; }
+pre { margin: 0; padding: 1em; white-space: pre-wrap; font-size: 1.2em; }
+#status { padding: 0.5em 1em; color: #888; }
+</style>
+</head>
+<body>
+<div id="status">Connecting...</div>
+<img id="projection" alt="">
+<pre id="code"></pre>
+<pre id="output"></pre>
+<script>
+const state = {};
+function render() {
+  document.getElementById("status").textContent = state.state || "";
+  document.getElementById("code").textContent = state.code || "";
+  document.getElementById("output").textContent = state.output || "";
+}
+function connect() {
+  const socket = new WebSocket(`ws://${location.host}/ws`);
+  socket.binaryType = "blob";
+  socket.onmessage = (event) => {
+    if (typeof event.data === "string") {
+      const message = JSON.parse(event.data);
+      if (message.type === "state") {
+        for (const key of Object.keys(state)) delete state[key];
+      }
+      Object.assign(state, message.changes);
+      render();
+    } else {
+      const image = document.getElementById("projection");
+      const previous = image.src;
+      image.src = URL.createObjectURL(event.data);
+      if (previous) URL.revokeObjectURL(previous);
+    }
+  };
+  socket.onclose = () => {
+    document.getElementById("status").textContent = "Reconnecting...";
+    setTimeout(connect, 1000);
+  };
+}
+connect();
+</script>
+</body>
+</html>
+"""
+
+
+def websocket_frame(payload, text):
+    """An unmasked, unfragmented server to client WebSocket frame."""
+    opcode = 0x1 if text else 0x2
+    length = len(payload)
+    if length < 126:
+        header = struct.pack("!BB", 0x80 | opcode, length)
+    elif length < 1 << 16:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+    return header + payload
+
+
+async def read_websocket_frame(reader):
+    """Read one client frame, returning (opcode, payload)."""
+    first, second = await reader.readexactly(2)
+    opcode = first & 0x0F
+    length = second & 0x7F
+    if length == 126:
+        (length,) = struct.unpack("!H", await reader.readexactly(2))
+    elif length == 127:
+        (length,) = struct.unpack("!Q", await reader.readexactly(8))
+    mask = await reader.readexactly(4) if second & 0x80 else None
+    payload = await reader.readexactly(length)
+    if mask is not None:
+        payload = bytes(byte ^ mask[i % 4] for i, byte in enumerate(payload))
+    return opcode, payload
+
+
+class _Viewer:
+    """Outgoing state of one connected viewer.
+
+    Only the newest projection frame is kept, so a slow viewer skips stale
+    frames instead of falling behind. JSON diffs are queued up to a limit.
+    Past that the queue is replaced by one full state message.
+    """
+
+    def __init__(self, writer, max_messages):
+        self.writer = writer
+        self.messages = deque()
+        self.max_messages = max_messages
+        self.frame = None
+        self.resync = True  # Start with the full state
+        self.wake = asyncio.Event()
+        self.dropped_frames = 0
+
+    def queue_message(self, message):
+        if len(self.messages) >= self.max_messages:
+            self.messages.clear()
+            self.resync = True
+        else:
+            self.messages.append(message)
+        self.wake.set()
+
+    def queue_frame(self, frame):
+        if self.frame is not None:
+            self.dropped_frames += 1
+        self.frame = frame
+        self.wake.set()
+
+
+class ResultsServer:
+    """HTTP and WebSocket server streaming run results to browsers.
+
+    Serves a viewer page at /, the current state at /state.json, the latest
+    projection at /projection.jpg, and live updates on /ws. The updates are
+    JSON diffs of the state (code, output and FSM state) and compressed
+    projection frames. The server runs an asyncio loop on its own thread.
+    Frames are encoded on a worker thread, so publish never blocks the
+    caller.
+    """
+
+    def __init__(
+        self,
+        host="0.0.0.0",
+        port=8765,
+        image_format="jpg",
+        quality=80,
+        max_messages=32,
+    ):
+        self.host = host
+        self.port = port
+        self.image_format = image_format
+        self.quality = quality
+        self.max_messages = max_messages
+
+        self.state = {}
+        self.frame = None
+        self.viewers = set()
+        self.connections = set()
+        self.loop = None
+        self.server = None
+        self.thread = None
+        self.ready = threading.Event()
+
+        self.encoder = ThreadPoolExecutor(max_workers=1)
+        self.encode_lock = threading.Lock()
+        self.latest_generation = 0
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        self.ready.wait()
+        print(f"Results server on http://{self.host}:{self.port}/")
+        return self
+
+    def stop(self):
+        if self.loop is not None:
+            # Close every connection before the loop stops, so none is left
+            # pending when it is closed
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop).result()
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+        self.encoder.shutdown(wait=False, cancel_futures=True)
+
+    def publish(self, projection=None, **fields):
+        """Send changed fields (e.g. code, output, state) and a new projection.
+
+        Safe to call from any thread. Returns immediately.
+        """
+        if self.loop is None:
+            return
+        if fields:
+            self.loop.call_soon_threadsafe(self._update_state, fields)
+        if projection is not None:
+            with self.encode_lock:
+                self.latest_generation += 1
+                generation = self.latest_generation
+            self.encoder.submit(self._encode, projection, generation)
+
+    def _encode(self, projection, generation):
+        # Skip frames already replaced by a newer one
+        if generation != self.latest_generation:
+            return
+        if self.image_format == "webp":
+            extension, params = ".webp", [cv2.IMWRITE_WEBP_QUALITY, self.quality]
+        else:
+            extension, params = ".jpg", [cv2.IMWRITE_JPEG_QUALITY, self.quality]
+        if projection.ndim == 3 and projection.shape[2] == 4:
+            projection = cv2.cvtColor(projection, cv2.COLOR_BGRA2BGR)
+        ok, encoded = cv2.imencode(extension, projection, params)
+        if ok and generation == self.latest_generation:
+            self.loop.call_soon_threadsafe(self._update_frame, encoded.tobytes())
+
+    def _update_state(self, fields):
+        changes = {
+            key: value for key, value in fields.items() if self.state.get(key) != value
+        }
+        if not changes:
+            return
+        self.state.update(changes)
+        message = json.dumps({"type": "diff", "changes": changes})
+        for viewer in self.viewers:
+            viewer.queue_message(message)
+
+    def _update_frame(self, frame):
+        self.frame = frame
+        for viewer in self.viewers:
+            viewer.queue_frame(frame)
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.server = self.loop.run_until_complete(
+            asyncio.start_server(self._handle_connection, self.host, self.port)
+        )
+        # Pick up the real port if 0 was asked for
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.ready.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.close()
+
+    async def _shutdown(self):
+        self.server.close()
+        connections = list(self.connections)
+        for connection in connections:
+            connection.cancel()
+        await asyncio.gather(*connections, return_exceptions=True)
+        await self.server.wait_closed()
+
+    async def _handle_connection(self, reader, writer):
+        connection = asyncio.current_task()
+        self.connections.add(connection)
+        try:
+            request_line = await reader.readline()
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            parts = request_line.decode("latin-1").split()
+            path = parts[1] if len(parts) > 1 else "/"
+            if path == "/ws" and headers.get("upgrade", "").lower() == "websocket":
+                await self._serve_websocket(reader, writer, headers)
+            else:
+                await self._serve_http(writer, path)
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            self.connections.discard(connection)
+            writer.close()
+
+    async def _serve_http(self, writer, path):
+        if path == "/":
+            status, content_type, body = "200 OK", "text/html", VIEWER_PAGE.encode()
+        elif path == "/state.json":
+            status, content_type, body = (
+                "200 OK",
+                "application/json",
+                json.dumps(self.state).encode(),
+            )
+        elif path == "/projection.jpg" and self.frame is not None:
+            status, content_type, body = "200 OK", f"image/{self.image_format}", self.frame
+        else:
+            status, content_type, body = "404 Not Found", "text/plain", b"Not found"
+
+        writer.write(
+            (
+                f"HTTP/1.1 {status}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                "Cache-Control: no-cache\r\n"
+                "Connection: close\r\n\r\n"
+            ).encode()
+            + body
+        )
+        await writer.drain()
+
+    async def _serve_websocket(self, reader, writer, headers):
+        key = headers.get("sec-websocket-key", "")
+        accept = base64.b64encode(
+            hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()
+        ).decode()
+        writer.write(
+            (
+                "HTTP/1.1 101 Switching Protocols\r\n"
+                "Upgrade: websocket\r\n"
+                "Connection: Upgrade\r\n"
+                f"Sec-WebSocket-Accept: {accept}\r\n\r\n"
+            ).encode()
+        )
+        await writer.drain()
+
+        viewer = _Viewer(writer, self.max_messages)
+        viewer.frame = self.frame
+        self.viewers.add(viewer)
+        # Send the current state and projection right away
+        viewer.wake.set()
+        sender = asyncio.ensure_future(self._send_updates(viewer))
+        try:
+            # Only control frames are expected from viewers
+            while True:
+                opcode, payload = await read_websocket_frame(reader)
+                if opcode == 0x8:  # Close
+                    writer.write(b"\x88\x00")
+                    await writer.drain()
+                    return
+                if opcode == 0x9:  # Ping
+                    writer.write(bytes([0x8A, len(payload)]) + payload)
+        finally:
+            self.viewers.discard(viewer)
+            sender.cancel()
+            await asyncio.gather(sender, return_exceptions=True)
+
+    async def _send_updates(self, viewer):
+        writer = viewer.writer
+        try:
+            while True:
+                await viewer.wake.wait()
+                viewer.wake.clear()
+
+                if viewer.resync:
+                    viewer.resync = False
+                    viewer.messages.clear()
+                    message = json.dumps({"type": "state", "changes": self.state})
+                    writer.write(websocket_frame(message.encode(), text=True))
+                while viewer.messages:
+                    message = viewer.messages.popleft()
+                    writer.write(websocket_frame(message.encode(), text=True))
+                if viewer.frame is not None:
+                    frame, viewer.frame = viewer.frame, None
+                    writer.write(websocket_frame(frame, text=False))
+                # Waits here while the viewer's socket is full. Newer frames
+                # replace viewer.frame meanwhile, so stale ones are dropped.
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
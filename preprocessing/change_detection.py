@@ -0,0 +1,64 @@
+import time
+import cv2
+import numpy as np
+
+# Width of the downscaled image compared between frames
+SIGNATURE_WIDTH = 160
+
+# Grey level difference for a pixel to count as changed
+PIXEL_THRESHOLD = 25
+
+
+def frame_signature(image, width=SIGNATURE_WIDTH):
+    """Small blurred greyscale copy of an image, cheap to compare."""
+    height = max(1, round(image.shape[0] * width / image.shape[1]))
+    small = cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+    if small.ndim == 3:
+        small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    return cv2.GaussianBlur(small, (5, 5), 0)
+
+
+def changed_fraction(signature, other, pixel_threshold=PIXEL_THRESHOLD):
+    """Fraction of pixels that differ noticeably between two signatures."""
+    if signature is None or other is None:
+        return 1.0
+    if other.shape != signature.shape:
+        # Warped images can differ by a pixel or two in size between frames
+        other = cv2.resize(other, (signature.shape[1], signature.shape[0]))
+    difference = cv2.absdiff(signature, other)
+    return np.count_nonzero(difference > pixel_threshold) / difference.size
+
+
+class ChangeDetector:
+    """Detects when the board has changed and then stayed still.
+
+    Feed it camera frames with update. It returns True once for each change
+    that has settled for settle_time seconds, e.g. after a student finishes
+    writing a line. The first frame counts as a change.
+    """
+
+    def __init__(self, threshold=0.002, settle_time=1.0):
+        self.threshold = threshold
+        self.settle_time = settle_time
+        self.previous = None
+        self.changed = True
+        self.last_change = time.monotonic()
+
+    def reset(self):
+        """Treat the next settled frame as a new change."""
+        self.previous = None
+        self.changed = True
+        self.last_change = time.monotonic()
+
+    def update(self, image, now=None):
+        now = time.monotonic() if now is None else now
+        signature = frame_signature(image)
+        if changed_fraction(signature, self.previous) > self.threshold:
+            self.changed = True
+            self.last_change = now
+        self.previous = signature
+
+        if self.changed and now - self.last_change >= self.settle_time:
+            self.changed = False
+            return True
+        return False
@@ -0,0 +1,204 @@
+import json
+import threading
+import numpy as np
+from collections import defaultdict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from preprocessing.preprocessor import Preprocessor
+from settings import settings
+from tracing import tracer
+
+# Settings read by create_preprocessor, which can differ between cameras
+WARP_SETTINGS = [
+    "WARP_REMAP",
+    "WARP_REMAP_TOLERANCE",
+    "WARP_RESOLUTION",
+    "CAMERA_CALIBRATION",
+    "OCR_MARKER_HEIGHT",
+]
+
+# Idle Preprocessors by camera and warp settings, reused across frames and
+# runs as each caches the remap tables of its board. A Preprocessor is taken
+# out while it warps, so concurrent warps never share one.
+_preprocessors = defaultdict(list)
+_preprocessors_lock = threading.Lock()
+
+
+def create_preprocessor(profile=settings):
+    """Create a Preprocessor configured from the warp settings of a profile.
+
+    CAMERA_CALIBRATION is an optional .npz file holding camera_matrix and
+    dist_coeffs arrays, as saved after cv2.calibrateCamera.
+    """
+    camera_matrix = dist_coeffs = None
+    if profile["CAMERA_CALIBRATION"]:
+        calibration = np.load(profile["CAMERA_CALIBRATION"])
+        camera_matrix = calibration["camera_matrix"]
+        dist_coeffs = calibration["dist_coeffs"]
+
+    return Preprocessor(
+        None,
+        use_remap=profile["WARP_REMAP"],
+        remap_tolerance=profile["WARP_REMAP_TOLERANCE"],
+        output_size=profile["WARP_RESOLUTION"],
+        camera_matrix=camera_matrix,
+        dist_coeffs=dist_coeffs,
+        ocr_marker_height=profile["OCR_MARKER_HEIGHT"],
+    )
+
+
+@contextmanager
+def borrow_preprocessor(profile=settings):
+    """Context manager lending a Preprocessor for the camera of a profile."""
+    key = json.dumps([profile["CAMERA"]] + [profile[name] for name in WARP_SETTINGS])
+    with _preprocessors_lock:
+        idle = _preprocessors[key]
+        preprocessor = idle.pop() if idle else None
+    if preprocessor is None:
+        preprocessor = create_preprocessor(profile)
+    try:
+        yield preprocessor
+    finally:
+        with _preprocessors_lock:
+            _preprocessors[key].append(preprocessor)
+
+
+def warp_frame(image, frame_pool=None, profile=settings):
+    """Warp a single frame using a Preprocessor from borrow_preprocessor.
+
+    profile holds the camera and warp settings, see BoardSession. With a
+    frame_pool (an input.shared_frames.SharedFramePool) the frame is
+    warped straight into a shared slot and its handle is returned instead.
+    Slots need room for a frame of the source size, see
+    Preprocessor.output_dimensions.
+    """
+    with borrow_preprocessor(profile) as preprocessor:
+        handles = []
+        if frame_pool is not None:
+
+            def allocate(shape, dtype):
+                handle, slot = frame_pool.reserve(shape, dtype)
+                handles.append(handle)
+                return slot
+
+            preprocessor.allocate_output = allocate
+
+        warped_image = None
+        with tracer.span("warp"):
+            preprocessor.set_image(image)
+            try:
+                warped_image = preprocessor.preprocess_image()
+            finally:
+                preprocessor.set_image(None)  # Don't keep the frame alive
+                preprocessor.allocate_output = None
+                # Free every reserved slot but the one holding the warp, also
+                # when the warp failed or raised
+                kept = handles.pop() if warped_image is not None and handles else None
+                for handle in handles:
+                    frame_pool.release(handle)
+
+        if frame_pool is None or warped_image is None:
+            return warped_image
+        return kept
+
+
+def iter_warped_frames(
+    preview,
+    max_attempts=50,
+    max_workers=2,
+    timeout=1.0,
+    frame_pool=None,
+    profile=settings,
+):
+    """Warp frames from a camera burst while further frames are captured.
+
+    Frames are taken from preview.burst as soon as they arrive and warped on
+    a small thread pool, so capture and warping overlap. Yields
+    (seq, warped_image) for each valid frame, in the order warps finish.
+    With a frame_pool, shared frame handles are yielded instead of images.
+    """
+    in_flight = {}
+    attempts = 0
+    frames = preview.burst(max_attempts, timeout=timeout)
+
+    def harvest(done):
+        # A generator, so futures not yet reached stay in in_flight if the
+        # caller stops early
+        nonlocal attempts
+        for future in done:
+            seq = in_flight.pop(future)
+            attempts += 1
+            warped_image = future.result()
+            if warped_image is None:
+                print(
+                    f"Attempt {attempts}/{max_attempts}: Not all corner markers detected."
+                )
+            else:
+                yield seq, warped_image
+
+    # Warps are traced as part of the caller's run
+    run = tracer.current_run()
+
+    def warp_and_release(frame):
+        try:
+            with tracer.attach(run):
+                return warp_frame(frame.image, frame_pool, profile)
+        finally:
+            preview.release_frame(frame)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        try:
+            exhausted = False
+            while True:
+                if not exhausted and len(in_flight) < max_workers:
+                    frame = next(frames, None)
+                    if frame is None:
+                        exhausted = True
+                    else:
+                        in_flight[pool.submit(warp_and_release, frame)] = frame.seq
+                        done = [future for future in in_flight if future.done()]
+                        yield from harvest(done)
+                        continue
+
+                if not in_flight:
+                    return
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                yield from harvest(done)
+        finally:
+            frames.close()
+            # Free the shared slots of warps that will never be yielded
+            if frame_pool is not None:
+                for future in in_flight:
+                    handle = future.result() if future.exception() is None else None
+                    if handle is not None:
+                        frame_pool.release(handle)
+
+
+def collect_warped_frames(
+    preview,
+    num_required,
+    max_attempts=50,
+    max_workers=2,
+    timeout=1.0,
+    frame_pool=None,
+    profile=settings,
+):
+    """Collect num_required warped frames, see iter_warped_frames.
+
+    Returns up to num_required warped images (or shared frame handles) in
+    capture order.
+    """
+    valid_images = []
+    warped_frames = iter_warped_frames(
+        preview, max_attempts, max_workers, timeout, frame_pool, profile
+    )
+    for seq, warped_image in warped_frames:
+        valid_images.append((seq, warped_image))
+        print(f"Captured valid image {len(valid_images)} of {num_required}")
+        if len(valid_images) >= num_required:
+            break
+    warped_frames.close()
+
+    # Warps finish out of order, but quality scoring compares neighbours
+    valid_images.sort(key=lambda item: item[0])
+    return [warped_image for _, warped_image in valid_images]
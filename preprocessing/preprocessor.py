@@ -3,8 +3,41 @@ import cv2
 from code_detection.markers.keywords import get_keyword
 
 
+def distort_points(points, camera_matrix, dist_coeffs):
+    """Map undistorted pixel coordinates to where they appear in the raw image.
+
+    Uses the same radial and tangential model as OpenCV's calibration.
+    points is an (..., 2) float32 array.
+    """
+    k = np.zeros(5, dtype=np.float32)
+    coeffs = np.asarray(dist_coeffs, dtype=np.float32).ravel()[:5]
+    k[: len(coeffs)] = coeffs
+    k1, k2, p1, p2, k3 = k
+
+    fx, fy = camera_matrix[0, 0], camera_matrix[1, 1]
+    cx, cy = camera_matrix[0, 2], camera_matrix[1, 2]
+    x = (points[..., 0] - cx) / fx
+    y = (points[..., 1] - cy) / fy
+
+    r2 = x * x + y * y
+    radial = 1 + k1 * r2 + k2 * r2 * r2 + k3 * r2 * r2 * r2
+    x_distorted = x * radial + 2 * p1 * x * y + p2 * (r2 + 2 * x * x)
+    y_distorted = y * radial + p1 * (r2 + 2 * y * y) + 2 * p2 * x * y
+    return np.stack([x_distorted * fx + cx, y_distorted * fy + cy], axis=-1)
+
+
 class Preprocessor:
-    def __init__(self, image, aruco_dict_type=cv2.aruco.DICT_6X6_50):
+    def __init__(
+        self,
+        image,
+        aruco_dict_type=cv2.aruco.DICT_6X6_50,
+        use_remap=False,
+        remap_tolerance=2.0,
+        output_size=None,
+        camera_matrix=None,
+        dist_coeffs=None,
+        ocr_marker_height=None,
+    ):
         self.original_image = image
         self.aruco_dict_type = aruco_dict_type
         self.aruco_dict = cv2.aruco.getPredefinedDictionary(self.aruco_dict_type)
@@ -14,6 +47,32 @@ class Preprocessor:
         self.corners = None
         self.ids = None
 
+        # Remap tables reused while the corner markers stay within
+        # remap_tolerance pixels. Lens undistortion, if a calibration is
+        # given, is folded into the same tables.
+        self.use_remap = use_remap or camera_matrix is not None
+        self.remap_tolerance = remap_tolerance
+        self.output_size = tuple(output_size) if output_size else None
+        self.camera_matrix = (
+            np.asarray(camera_matrix, dtype=np.float32)
+            if camera_matrix is not None
+            else None
+        )
+        self.dist_coeffs = dist_coeffs
+        self.remap_points = None
+        self.remap_shape = None
+        self.remap_maps = None
+
+        # Shrink the warped board so markers are about ocr_marker_height
+        # pixels tall, which is all the OCR needs. warp_scale records the
+        # factor from full camera resolution to the warped image.
+        self.ocr_marker_height = ocr_marker_height
+        self.warp_scale = 1.0
+
+        # Optional allocate(shape, dtype) returning the array to warp into,
+        # e.g. a slot of a SharedFramePool
+        self.allocate_output = None
+
     def warp_image(self, image, margin=0.01):
         """Warp the image to a rectangle defined by the corner markers."""
 
@@ -39,14 +98,20 @@ class Preprocessor:
         if src_points is None:
             return None, "Error: Could not find corner markers!"
 
-        # Calculate width and height based on source points
-        width_top = np.linalg.norm(src_points[0] - src_points[1])
-        width_bottom = np.linalg.norm(src_points[3] - src_points[2])
-        width = int(max(width_top, width_bottom))
+        # Correct the marker positions for lens distortion
+        if self.camera_matrix is not None:
+            src_points = cv2.undistortPoints(
+                src_points.reshape(-1, 1, 2),
+                self.camera_matrix,
+                self.dist_coeffs,
+                P=self.camera_matrix,
+            ).reshape(4, 2)
 
-        height_left = np.linalg.norm(src_points[0] - src_points[3])
-        height_right = np.linalg.norm(src_points[1] - src_points[2])
-        height = int(max(height_left, height_right))
+        if self.use_remap:
+            return self.remap_image(image, src_points, margin), None
+
+        # Calculate width and height based on source points
+        width, height = self.output_dimensions(src_points, image.shape)
 
         # Add 1% margin
         margin_x = int(margin * width)
@@ -68,9 +133,119 @@ class Preprocessor:
 
         # Apply perspective transformation
         H = cv2.getPerspectiveTransform(src_points, dst_points)
-        warped = cv2.warpPerspective(image, H, (full_width, full_height))
+        warped = cv2.warpPerspective(
+            image,
+            H,
+            (full_width, full_height),
+            dst=self.output_buffer(image, (full_width, full_height)),
+        )
         return warped, None
 
+    def output_dimensions(self, src_points, image_shape):
+        """Size of the warped image, fixed if output_size was given.
+
+        Otherwise it is the distance between the corner markers, reduced
+        so the markers come out ocr_marker_height pixels tall if set. It is
+        never larger than the source image in either direction, however
+        strong the perspective, so warps fit in buffers sized for a frame.
+        """
+        if self.output_size is not None:
+            return self.output_size
+
+        width_top = np.linalg.norm(src_points[0] - src_points[1])
+        width_bottom = np.linalg.norm(src_points[3] - src_points[2])
+        height_left = np.linalg.norm(src_points[0] - src_points[3])
+        height_right = np.linalg.norm(src_points[1] - src_points[2])
+        width = max(width_top, width_bottom)
+        height = max(height_left, height_right)
+
+        image_height, image_width = image_shape[:2]
+        self.warp_scale = min(
+            self.ocr_scale(), image_width / max(width, 1), image_height / max(height, 1)
+        )
+        return int(width * self.warp_scale), int(height * self.warp_scale)
+
+    def marker_height(self):
+        """Median side length in pixels of the detected markers."""
+        corners = np.asarray(self.corners, dtype=np.float32).reshape(-1, 4, 2)
+        sides = np.linalg.norm(corners - np.roll(corners, 1, axis=1), axis=2)
+        return float(np.median(sides))
+
+    def ocr_scale(self):
+        """Factor that brings the markers down to ocr_marker_height, never above 1."""
+        if not self.ocr_marker_height or self.corners is None:
+            return 1.0
+        height = self.marker_height()
+        if height <= 0:
+            return 1.0
+        return min(1.0, self.ocr_marker_height / height)
+
+    def remap_is_valid(self, src_points, image_shape):
+        # The tables hold while the image size is the same and no corner
+        # has moved by more than the tolerance
+        return (
+            self.remap_maps is not None
+            and self.remap_shape == image_shape
+            and np.abs(src_points - self.remap_points).max() <= self.remap_tolerance
+        )
+
+    def build_remap(self, src_points, image_shape, margin=0.01):
+        """Turn the homography for src_points into fixed-point remap tables."""
+        width, height = self.output_dimensions(src_points, image_shape)
+        margin_x = int(margin * width)
+        margin_y = int(margin * height)
+        dst_points = np.array(
+            [
+                [margin_x, margin_y],
+                [width - 1 - margin_x, margin_y],
+                [width - 1 - margin_x, height - 1 - margin_y],
+                [margin_x, height - 1 - margin_y],
+            ],
+            dtype=np.float32,
+        )
+
+        # Source position of every output pixel
+        H = cv2.getPerspectiveTransform(dst_points, src_points)
+        xs, ys = np.meshgrid(
+            np.arange(width, dtype=np.float32), np.arange(height, dtype=np.float32)
+        )
+        w = H[2, 0] * xs + H[2, 1] * ys + H[2, 2]
+        map_x = (H[0, 0] * xs + H[0, 1] * ys + H[0, 2]) / w
+        map_y = (H[1, 0] * xs + H[1, 1] * ys + H[1, 2]) / w
+        points = np.stack([map_x, map_y], axis=-1).astype(np.float32)
+
+        # Look up the undistorted positions in the raw camera image
+        if self.camera_matrix is not None:
+            points = distort_points(points, self.camera_matrix, self.dist_coeffs)
+
+        self.remap_maps = cv2.convertMaps(
+            points[..., 0].astype(np.float32),
+            points[..., 1].astype(np.float32),
+            cv2.CV_16SC2,
+        )
+        self.remap_points = src_points.copy()
+        self.remap_shape = image_shape
+
+    def remap_image(self, image, src_points, margin=0.01):
+        """Warp the image with cached remap tables, rebuilding them if needed."""
+        if not self.remap_is_valid(src_points, image.shape):
+            self.build_remap(src_points, image.shape, margin)
+        map1, map2 = self.remap_maps
+        size = (map1.shape[1], map1.shape[0])
+        return cv2.remap(
+            image,
+            map1,
+            map2,
+            cv2.INTER_LINEAR,
+            dst=self.output_buffer(image, size),
+        )
+
+    def output_buffer(self, image, size):
+        """Array for a warped image of the given (width, height), or None."""
+        if self.allocate_output is None:
+            return None
+        return self.allocate_output((size[1], size[0]) + image.shape[2:], image.dtype)
+
     def get_corner_markers(self):
         marker_map = {
             "Top Left": None,
@@ -0,0 +1,69 @@
+import cv2
+import numpy as np
+
+# Width that frames are reduced to before measuring sharpness
+SHARPNESS_WIDTH = 640
+# Thumbnail size used to measure motion between consecutive frames
+MOTION_SIZE = (160, 90)
+# Mean grey level change treated as one unit of motion penalty
+MOTION_SCALE = 8.0
+
+
+def _downscale_gray(image):
+    gray = image if len(image.shape) == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    if gray.shape[1] > SHARPNESS_WIDTH:
+        height = int(gray.shape[0] * SHARPNESS_WIDTH / gray.shape[1])
+        gray = cv2.resize(
+            gray, (SHARPNESS_WIDTH, height), interpolation=cv2.INTER_AREA
+        )
+    return gray
+
+
+def score_frames(images, motion_weight=1.0):
+    """Score warped frames in capture order, higher is better.
+
+    Sharpness is the variance of the Laplacian, normalised to the sharpest
+    frame in the burst. Motion is the mean absolute difference to the
+    neighbouring frames, which penalises frames taken while someone walks
+    past or the camera shakes.
+    """
+    if len(images) == 0:
+        return np.array([], dtype=np.float32)
+
+    grays = [_downscale_gray(image) for image in images]
+
+    sharpness = np.array(
+        [cv2.Laplacian(gray, cv2.CV_32F).var() for gray in grays], dtype=np.float32
+    )
+    sharpness /= max(float(sharpness.max()), 1e-6)
+
+    # Warped frames may differ in size by a pixel or two, so compare thumbnails
+    thumbs = np.stack(
+        [cv2.resize(gray, MOTION_SIZE, interpolation=cv2.INTER_AREA) for gray in grays]
+    ).astype(np.float32)
+    diffs = np.abs(np.diff(thumbs, axis=0)).mean(axis=(1, 2))
+
+    # Average each frame's difference to its previous and next frames
+    motion = np.zeros(len(images), dtype=np.float32)
+    neighbours = np.zeros(len(images), dtype=np.float32)
+    motion[1:] += diffs
+    motion[:-1] += diffs
+    neighbours[1:] += 1
+    neighbours[:-1] += 1
+    motion /= np.maximum(neighbours, 1)
+
+    return sharpness - motion_weight * motion / MOTION_SCALE
+
+
+def best_frame_indices(images, count, motion_weight=1.0):
+    """Indices of the count highest scoring frames, in capture order."""
+    if len(images) <= count:
+        return list(range(len(images)))
+
+    scores = score_frames(images, motion_weight)
+    return np.sort(np.argsort(-scores, kind="stable")[:count]).tolist()
+
+
+def select_best_frames(images, count, motion_weight=1.0):
+    """Return the count highest scoring frames, keeping capture order."""
+    return [images[i] for i in best_frame_indices(images, count, motion_weight)]
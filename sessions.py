@@ -0,0 +1,140 @@
+import cv2
+from fsm.state_machine import SystemFSM
+from fsm.states import SystemState, Event
+from input.camera_preview import CameraPreviewThread
+from output.projector import Projector
+from settings import settings
+
+
+class BoardSession:
+    """One whiteboard: its camera, projector output, FSM and settings profile.
+
+    The profile is a dict of settings overriding the global ones for this
+    board, e.g. CAMERA, CAMERA_RESOLUTION, CAMERA_CALIBRATION,
+    WARP_RESOLUTION, PROJECTION_RESOLUTION or NUM_VALID_IMAGES.
+    OUTPUT_POSITION optionally places the output window on the board's
+    projector before it goes full screen. Runs are submitted to a
+    SessionWorker, so several sessions can share one worker pool. They also
+    share the OCR backend, which runs one inference at a time.
+
+    capture_factory(source, resolution, fps, profile) opens the camera, like
+    open_capture, so capture settings such as CAMERA_BACKEND can also be set
+    per board. run_function(job, preview, speculative, profile) is called on
+    the worker and returns (projection, event, python_code, code_box,
+    code_output), like detect_and_run_code.
+    """
+
+    def __init__(self, name, profile, worker, run_function, capture_factory):
+        self.name = name
+        self.profile = dict(settings)
+        self.profile.update(profile)
+        self.worker = worker
+        self.run_function = run_function
+
+        self.fsm = SystemFSM()
+        self.preview = CameraPreviewThread(
+            source=self.profile["CAMERA"],
+            resolution=tuple(self.profile["CAMERA_RESOLUTION"]),
+            fps=self.profile["CAMERA_FPS"],
+            window_name=f"Camera {name}",
+            capture_factory=lambda source, resolution, fps: capture_factory(
+                source, resolution, fps, self.profile
+            ),
+        )
+        self.camera_window = f"Camera {name}"
+        self.output_window = f"Output {name}"
+
+        self.python_code = None
+        self.code_box = None
+
+        self.fsm.on_enter(SystemState.IDLE, self.show_idle)
+        self.fsm.on_enter(SystemState.RUNNING, self.start_run)
+
+    def start(self):
+        self.preview.start()
+
+        cv2.namedWindow(self.camera_window, cv2.WINDOW_NORMAL)
+        cv2.resizeWindow(self.camera_window, 640, 360)
+        cv2.namedWindow(self.output_window, cv2.WINDOW_NORMAL)
+        position = self.profile.get("OUTPUT_POSITION")
+        if position:
+            cv2.moveWindow(self.output_window, *position)
+        cv2.setWindowProperty(
+            self.output_window, cv2.WND_PROP_FULLSCREEN, cv2.WINDOW_FULLSCREEN
+        )
+        self.show_idle()
+
+    def blank_projector(self):
+        return Projector(
+            None,
+            None,
+            None,
+            None,
+            None,
+            output_size=tuple(self.profile["PROJECTION_RESOLUTION"]),
+            marker_size=self.profile["CORNER_MARKER_SIZE"],
+            debug_mode=False,
+        )
+
+    def error_projection(self, message):
+        return Projector(
+            None,
+            None,
+            message,
+            None,
+            None,
+            output_size=tuple(self.profile["PROJECTION_RESOLUTION"]),
+            marker_size=self.profile["CORNER_MARKER_SIZE"],
+            debug_mode=self.profile["PROJECT_IMAGE"],
+        ).display_error_projection()
+
+    def show_idle(self, *_):
+        self.worker.cancel()  # In case a run was cleared before it finished
+        projection = self.blank_projector().display_idle_projection(self.code_box)
+        cv2.imshow(self.output_window, projection)
+
+    def start_run(self, *_):
+        # Show the corner markers while capturing
+        projection = self.blank_projector().display_minimal_projection()
+        cv2.imshow(self.output_window, projection)
+        self.worker.submit(self.run_function, self.preview, None, self.profile)
+
+    def update(self):
+        """Show the camera feed and handle FSM events and finished runs.
+
+        Called once per main loop iteration. Returns False once the session
+        has exited.
+        """
+        if self.fsm.state == SystemState.EXITING:
+            return False
+
+        with self.preview.lease_frame() as frame:
+            if frame is not None:
+                cv2.imshow(self.camera_window, frame)
+
+        if cv2.getWindowProperty(self.output_window, cv2.WND_PROP_VISIBLE) < 1:
+            self.fsm.transition(Event.EXIT)
+            return False
+
+        self.fsm.process_events()
+
+        for kind, payload in self.worker.poll():
+            if kind == "progress":
+                print(f"{self.name}: {payload}")
+            elif kind == "result":
+                projection, event, python_code, code_box, _ = payload
+                self.python_code = python_code
+                self.code_box = code_box
+                cv2.imshow(self.output_window, projection)
+                self.fsm.transition(event)
+            else:
+                cv2.imshow(self.output_window, self.error_projection(str(payload)))
+                self.fsm.transition(Event.ERROR_OCCURRED)
+        return self.fsm.state != SystemState.EXITING
+
+    def stop(self):
+        self.worker.stop()
+        self.preview.stop()
+        self.preview.join()
+        cv2.destroyWindow(self.camera_window)
+        cv2.destroyWindow(self.output_window)
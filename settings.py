@@ -7,9 +7,16 @@ SETTINGS_FILE = "settings.json"
 default_settings = {
     "PROJECT_IMAGE": False,
     "NUM_VALID_IMAGES": 3,
+    "NUM_CANDIDATE_IMAGES": 5,
+    "ADAPTIVE_CAPTURE": False,
+    "MAX_VALID_IMAGES": 6,
     "CAMERA": 0,
     "CAMERA_RESOLUTION": [1920, 1080],
     "CAMERA_FPS": 10,
+    "CAMERA_BACKEND": "auto",
+    "CAMERA_FOURCC": "auto",
+    "REPLAY_REALTIME": True,
+    "RECORD_PATH": None,
     "VOICE_COMMANDS": False,
     "MICROPHONE": 0,
     "PROJECTION_RESOLUTION": [1280, 790],
@@ -17,6 +24,25 @@ default_settings = {
     "CORNER_MARKER_SIZE": 35,
     "HELPER_CODE": "# Write helper functions here\n# Whiteboard code will be inserted at #INSERT\n#INSERT",
     "CODE_SAVE_PATH": "code.py",
+    "OCR_BACKEND": "paddleocr",
+    "OCR_SERVER": "127.0.0.1:6010",
+    "OCR_SERVER_COMPRESS": False,
+    "TRACING": False,
+    "TRACE_FILE": "trace.json",
+    "SPECULATIVE_DETECTION": False,
+    "DETECTION_PROCESSES": 0,
+    "BOARD_SESSIONS": [],
+    "SESSION_WORKERS": 2,
+    "RESULTS_SERVER": False,
+    "RESULTS_SERVER_HOST": "0.0.0.0",
+    "RESULTS_SERVER_PORT": 8765,
+    "RESULTS_IMAGE_FORMAT": "jpg",
+    "RESULTS_IMAGE_QUALITY": 80,
+    "WARP_REMAP": False,
+    "WARP_REMAP_TOLERANCE": 2.0,
+    "WARP_RESOLUTION": None,
+    "OCR_MARKER_HEIGHT": None,
+    "CAMERA_CALIBRATION": None,
 }
 
 settings = default_settings.copy()
@@ -0,0 +1,186 @@
+import json
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from settings import settings
+
+
+class Span:
+    def __init__(self, name, parent=None):
+        self.name = name
+        self.parent = parent
+        self.children = []
+        self.thread_id = threading.get_ident()
+        self.start = time.perf_counter()
+        self.end = None
+
+    @property
+    def duration(self):
+        end = self.end if self.end is not None else time.perf_counter()
+        return end - self.start
+
+    def walk(self, depth=0):
+        """Yield (depth, span) for this span and all nested spans."""
+        yield depth, self
+        for child in self.children:
+            yield from child.walk(depth + 1)
+
+
+class _NullSpan:
+    # Shared no-op context manager returned while tracing is disabled
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _ActiveSpan:
+    def __init__(self, tracer, name):
+        self.tracer = tracer
+        self.name = name
+        self.span = None
+
+    def __enter__(self):
+        self.span = self.tracer._open(self.name)
+        return self.span
+
+    def __exit__(self, *exc):
+        self.tracer._close(self.span)
+        return False
+
+
+class Tracer:
+    """Records nested, timed spans for each pipeline run.
+
+    A run is started with ``run`` and every ``span`` opened on that thread
+    while it is active is attached to its tree. Runs on different threads,
+    e.g. of several boards, are recorded separately. Helper threads join the
+    run of the thread that started them with ``attach``. The most recent
+    runs are kept in a ring buffer. While disabled, ``span`` returns a
+    shared no-op context manager so instrumented code costs almost nothing.
+    """
+
+    def __init__(self, enabled=False, history=20):
+        self.enabled = enabled
+        self.runs = deque(maxlen=history)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def current_run(self):
+        """The root span of the calling thread's run, or None."""
+        return getattr(self._local, "run", None)
+
+    @contextmanager
+    def attach(self, run):
+        """Attach spans opened by the calling thread to run, from current_run."""
+        previous = self.current_run()
+        self._local.run = run
+        try:
+            yield run
+        finally:
+            self._local.run = previous
+
+    def _open(self, name):
+        stack = self._stack()
+        parent = stack[-1] if stack else self.current_run()
+        span = Span(name, parent)
+        if parent is not None:
+            with self._lock:
+                parent.children.append(span)
+        stack.append(span)
+        return span
+
+    def _close(self, span):
+        span.end = time.perf_counter()
+        stack = self._stack()
+        if stack and stack[-1] is span:
+            stack.pop()
+
+    def span(self, name):
+        """Context manager timing a stage of the current run."""
+        if not self.enabled or self.current_run() is None:
+            return _NULL_SPAN
+        return _ActiveSpan(self, name)
+
+    @contextmanager
+    def run(self, name="run"):
+        """Context manager grouping all spans of one pipeline run."""
+        if not self.enabled:
+            yield None
+            return
+
+        root = Span(name)
+        try:
+            with self.attach(root):
+                yield root
+        finally:
+            root.end = time.perf_counter()
+            with self._lock:
+                self.runs.append(root)
+
+    def summary(self):
+        """Mean duration of each span name over the recorded runs, in ms."""
+        with self._lock:
+            runs = list(self.runs)
+
+        totals = defaultdict(float)
+        counts = defaultdict(int)
+        order = []
+        for run in runs:
+            for depth, span in run.walk():
+                key = (depth, span.name)
+                if key not in totals:
+                    order.append(key)
+                totals[key] += span.duration
+                counts[key] += 1
+
+        return [
+            (depth, name, 1000 * totals[(depth, name)] / counts[(depth, name)])
+            for depth, name in order
+        ]
+
+    def summary_lines(self):
+        """The rolling summary formatted for display, one line per span."""
+        return [
+            f"{'  ' * depth}{name}: {ms:.1f} ms" for depth, name, ms in self.summary()
+        ]
+
+    def export_chrome_trace(self, path):
+        """Write the recorded runs as a Chrome trace (chrome://tracing) file."""
+        with self._lock:
+            runs = list(self.runs)
+
+        events = []
+        for run in runs:
+            for _, span in run.walk():
+                if span.end is None:
+                    continue
+                events.append(
+                    {
+                        "name": span.name,
+                        "ph": "X",
+                        "ts": (span.start - self._origin) * 1e6,
+                        "dur": (span.end - span.start) * 1e6,
+                        "pid": 1,
+                        "tid": span.thread_id,
+                    }
+                )
+
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        print(f"Trace saved to {path}")
+
+
+tracer = Tracer(enabled=settings["TRACING"])